@@ -1,22 +1,38 @@
 const express = require('express');
-const { loadModel, predictStockPrice } = require('./model');
+const { loadModel, predictStockPrice, predictBatch, allocatePortfolio } = require('./model');
+const metrics = require('./metrics');
 
 const router = express.Router();
 
+router.use(metrics.httpMetrics);
+
+// Per-stage worker timings are added to meta when asked for with `timings: true` or ?timings=1
+function wantsTimings(req) {
+  return Boolean((req.body && req.body.timings) || req.query.timings === '1' || req.query.timings === 'true');
+}
+
+// GET /metrics — Prometheus text exposition
+router.get('/metrics', (req, res) => {
+  res.set('Content-Type', 'text/plain; version=0.0.4');
+  res.send(metrics.render());
+});
+
 // POST /api/predict
-// Body: { data: number[] } where data is historical price series
+// Body: { data: number[] } where data is historical price series, optional horizon (days)
+// and uncertainty (true or a Monte Carlo dropout sample count) for prediction bands.
+// deadlineMs shortens the time the caller is willing to wait (429/503 when it cannot be met)
 router.post('/api/predict', async (req, res) => {
   try {
-    const { data, ticker } = req.body || {};
+    const { data, ticker, horizon, uncertainty, deadlineMs } = req.body || {};
     
     // Ensure model is loaded (will throw with clear error if missing)
     await loadModel();
 
     let result;
     if (ticker) {
-      result = await predictStockPrice(null, ticker);
+      result = await predictStockPrice(null, ticker, { horizon, uncertainty, deadlineMs });
     } else if (Array.isArray(data) && data.length > 0) {
-      result = await predictStockPrice(data);
+      result = await predictStockPrice(data, null, { horizon, uncertainty, deadlineMs });
     } else {
       return res.status(400).json({ 
         error: 'ERROR_INVALID_INPUT: Body must include either ticker symbol or non-empty array of historical prices.' 
@@ -27,47 +43,175 @@ router.post('/api/predict', async (req, res) => {
       meta: { 
         normalizedPred: result.normalizedPred, 
         timesteps: result.timesteps,
-        lastClose: result.lastClose
+        lastClose: result.lastClose,
+        modelVersion: result.modelVersion || null,
+        // 'ensemble' / 'baseline' (overload fallback) with per-model closes when the version blends baselines
+        model: result.model || 'lstm',
+        components: result.components || null,
+        // Why `uncertainty` is null although it was requested (overload fallback)
+        uncertaintyUnavailable: result.uncertaintyUnavailable || null,
+        cache: result.cache || null,
+        ...(wantsTimings(req) ? { timings: result.timings || null } : {})
       },
       // Forward raw series when available for frontend visualization
       series: (result.series ? {
         close: result.series.close || null,
         rsi: result.series.rsi || null,
         macd: result.series.macd || null,
-      } : null)
+      } : null),
+      // Predicted close/rsi/macd for each future day when horizon > 1
+      path: result.path || null,
+      // Monte Carlo dropout mean/std/quantiles when uncertainty was requested
+      uncertainty: result.uncertainty || null
     });
   } catch (err) {
-    // Parse the error message to determine the appropriate status code
-    const errorMessage = err.message || 'Prediction failed.';
-    let statusCode = 500;
-
-    // If the model layer attached a python traceback, surface it as a 500 with details
-    if (err && err.pythonTraceback) {
-      return res.status(500).json({
-        error: err.pythonMessage || 'Critical Python crash',
-        traceback: err.pythonTraceback,
-        code: '500_CRITICAL_PYTHON_CRASH'
+    return sendError(res, err);
+  }
+});
+
+// POST /api/predict/batch
+// Body: { tickers: string[] } and/or { series: number[][] }, optional includeSeries, horizon, uncertainty
+// and deadlineMs; runs in the batch lane, behind interactive requests
+router.post('/api/predict/batch', async (req, res) => {
+  try {
+    const { tickers, series, includeSeries, horizon, uncertainty, deadlineMs } = req.body || {};
+    const items = [
+      ...(Array.isArray(tickers) ? tickers.filter(t => typeof t === 'string' && t.trim()) : []),
+      ...(Array.isArray(series) ? series : []),
+    ];
+    if (items.length === 0) {
+      return res.status(400).json({
+        error: 'ERROR_INVALID_INPUT: Body must include a non-empty tickers array or series array.'
       });
     }
 
-    if (errorMessage.startsWith('ERROR_DATA_FETCH:') || 
-        errorMessage.startsWith('ERROR_INVALID_INPUT:') ||
-        errorMessage.startsWith('ERROR_DATA_PARSE:')) {
-      statusCode = 400; // Bad Request
-    } else if (errorMessage.startsWith('ERROR_PYTHON_FAILURE:')) {
-      statusCode = 500; // Internal Server Error
+    await loadModel();
+    const result = await predictBatch(items, { includeSeries: Boolean(includeSeries), horizon, uncertainty, deadlineMs });
+
+    return res.json({
+      count: result.count,
+      failed: result.failed,
+      // Batch timings cover the whole request; fetch/indicator stages are summed over items
+      ...(wantsTimings(req) ? { timings: result.timings || null } : {}),
+      results: result.results.map(item => {
+        if (item.error) {
+          const { code, message } = splitErrorCode(item.error);
+          return { ticker: item.ticker, index: item.index, error: message, code };
+        }
+        return {
+          ticker: item.ticker,
+          index: item.index,
+          prediction: item.predicted,
+          meta: {
+            normalizedPred: item.normalizedPred,
+            timesteps: item.timesteps,
+            lastClose: item.lastClose,
+            modelVersion: item.modelVersion || null,
+            model: item.model || 'lstm',
+            components: item.components || null,
+            uncertaintyUnavailable: item.uncertaintyUnavailable || null,
+            cache: item.cache || null
+          },
+          series: item.series || null,
+          path: item.path || null,
+          uncertainty: item.uncertainty || null
+        };
+      })
+    });
+  } catch (err) {
+    return sendError(res, err);
+  }
+});
+
+// POST /api/portfolio
+// Body: { tickers: string[] } plus optional method ('mean-variance' | 'risk-parity'), horizon,
+// uncertainty (adds the prediction spread to the risk model), riskAversion, maxWeight, lookback,
+// current (held weights by ticker), band (no-trade band), maxTurnover and deadlineMs.
+// Runs in the batch lane like /api/predict/batch
+router.post('/api/portfolio', async (req, res) => {
+  try {
+    const { tickers, method, horizon, uncertainty, riskAversion, maxWeight, current, band, maxTurnover, lookback,
+            deadlineMs } = req.body || {};
+    if (!Array.isArray(tickers) || tickers.length === 0) {
+      return res.status(400).json({
+        error: 'ERROR_INVALID_INPUT: Body must include a non-empty tickers array.'
+      });
     }
 
-    // Remove the error code prefix for client display
-    const clientMessage = errorMessage.includes(':') ? 
-      errorMessage.split(':')[1].trim() : 
-      errorMessage;
+    await loadModel();
+    const result = await allocatePortfolio(tickers, { method, horizon, uncertainty, riskAversion, maxWeight, current,
+                                                      band, maxTurnover, lookback, deadlineMs });
 
-    return res.status(statusCode).json({ 
-      error: clientMessage,
-      code: errorMessage.split(':')[0]
+    return res.json({
+      method: result.method,
+      assets: result.assets,
+      horizon: result.horizon,
+      expectedReturn: result.expectedReturn,
+      volatility: result.volatility,
+      turnover: result.turnover,
+      weights: result.weights,
+      trades: result.trades,
+      riskContributions: result.riskContributions,
+      expected: result.expected,
+      // Tickers left out of the allocation, with the reason
+      failed: Object.entries(result.failed || {}).map(([ticker, error]) => {
+        const { code, message } = splitErrorCode(error);
+        return { ticker, error: message, code };
+      }),
+      meta: {
+        shrinkage: result.shrinkage,
+        iterations: result.iterations,
+        converged: result.converged
+      },
+      ...(wantsTimings(req) ? { timings: result.timings || null } : {})
     });
+  } catch (err) {
+    return sendError(res, err);
   }
 });
 
+function splitErrorCode(errorMessage) {
+  // Remove the error code prefix for client display
+  const message = errorMessage.includes(':') ?
+    errorMessage.split(':')[1].trim() :
+    errorMessage;
+  return { code: errorMessage.split(':')[0], message };
+}
+
+function sendError(res, err) {
+  // Parse the error message to determine the appropriate status code
+  const errorMessage = err.message || 'Prediction failed.';
+  let statusCode = 500;
+
+  // If the model layer attached a python traceback, surface it as a 500 with details
+  if (err && err.pythonTraceback) {
+    return res.status(500).json({
+      error: err.pythonMessage || 'Critical Python crash',
+      traceback: err.pythonTraceback,
+      code: '500_CRITICAL_PYTHON_CRASH'
+    });
+  }
+
+  if (errorMessage.startsWith('ERROR_DATA_FETCH:') ||
+      errorMessage.startsWith('ERROR_INVALID_INPUT:') ||
+      errorMessage.startsWith('ERROR_DATA_PARSE:')) {
+    statusCode = 400; // Bad Request
+  } else if (errorMessage.startsWith('ERROR_PYTHON_FAILURE:')) {
+    statusCode = 500; // Internal Server Error
+  } else if (errorMessage.startsWith('ERROR_OVERLOADED:')) {
+    statusCode = 429; // Too Many Requests: the priority lane's queue is full
+    res.set('Retry-After', '1');
+  } else if (errorMessage.startsWith('ERROR_DEADLINE_EXCEEDED:') ||
+             errorMessage.startsWith('ERROR_TIMEOUT:')) {
+    statusCode = 503; // Service Unavailable: shed before or while running
+    res.set('Retry-After', '1');
+  }
+
+  const { code, message } = splitErrorCode(errorMessage);
+  return res.status(statusCode).json({
+    error: message,
+    code
+  });
+}
+
 module.exports = router;
\ No newline at end of file
@@ -0,0 +1,280 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from featurize import load_ticker_series, TRAIN_DATA_SOURCE
+from windows import window_index, iter_window_batches
+from predict import normalize_features, open_registry, ENGINES, DEFAULT_ENGINE
+from model_registry import REGISTRY_DIR
+
+# Walk-forward backtest: every trading day in the evaluation period is predicted from the
+# 60 bars before it, exactly as the serving path would have done on that day. Windows are
+# strided views over each ticker's feature matrix and inference runs in large batches
+# across all tickers, so years x hundreds of tickers is a handful of forward passes.
+
+LOOK_BACK = 60
+TRADING_DAYS = 252
+RESULTS_PATH = os.path.join(os.path.dirname(__file__), 'results', 'backtest.json')
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'model', 'model.keras')
+# Fallback scaler for models trained before scaler.json existed (same values as model.js)
+FALLBACK_SCALER = (50.694803, 199.957651)
+
+
+def legacy_scaler(model_path=MODEL_PATH):
+    """close_min/close_max from the scaler.json written next to the legacy model"""
+    try:
+        with open(os.path.join(os.path.dirname(model_path), 'scaler.json')) as f:
+            params = json.load(f)
+        return float(params['close_min']), float(params['close_max'])
+    except (OSError, ValueError, KeyError):
+        return FALLBACK_SCALER
+
+
+def load_histories(tickers, years, workers=None, source_spec=TRAIN_DATA_SOURCE):
+    """{ticker: (dates, [n, 3] features)} fetched and featurized in a process pool"""
+    histories = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for ticker, dates, features, error in pool.map(load_ticker_series, tickers, [years] * len(tickers),
+                                                       [source_spec] * len(tickers)):
+            if error:
+                print(f"Skipping {ticker}: {error}", file=sys.stderr)
+                continue
+            histories[ticker] = (dates, features)
+    return histories
+
+
+def evaluation_index(histories, tickers, start):
+    """(series_id, window_start) for every window whose target bar falls on or after `start`"""
+    index = window_index([len(histories[t][1]) for t in tickers], LOOK_BACK)
+    if start is None or len(index) == 0:
+        return index
+    target_dates = np.concatenate([histories[t][0][LOOK_BACK:] for t in tickers])
+    return index[target_dates >= np.datetime64(start)]
+
+
+def run_inference(registry, histories, tickers, index, batch_size=4096):
+    """Predicted next closes for every window in `index`, batched across tickers per model"""
+    series = [histories[t][1] for t in tickers]
+    predictions = np.empty(len(index))
+    handles = [registry.get(t) for t in tickers]
+    # Tickers served by the same model (default or per-ticker) share batches
+    groups = {}
+    for sid, handle in enumerate(handles):
+        groups.setdefault(id(handle), []).append(sid)
+
+    for sids in groups.values():
+        handle = handles[sids[0]]
+        rows = np.nonzero(np.isin(index[:, 0], sids))[0]
+        offset = 0
+        for X, _ in iter_window_batches(series, index[rows], LOOK_BACK, batch_size):
+            normalized = normalize_features(X, handle.scaler_min, handle.scaler_max)
+            y = np.asarray(handle.model.predict_on_batch(normalized), dtype=np.float64)[:, 0]
+            predictions[rows[offset:offset + len(X)]] = y * (handle.scaler_max - handle.scaler_min) + handle.scaler_min
+            offset += len(X)
+    return predictions
+
+
+def strategy_metrics(returns, positions=None):
+    """Performance summary of a daily return series (positions: daily exposure in [0, 1])"""
+    returns = np.asarray(returns, dtype=np.float64)
+    if len(returns) == 0:
+        return {}
+    equity = np.cumprod(1.0 + returns)
+    years = len(returns) / TRADING_DAYS
+    vol = returns.std(ddof=1) * np.sqrt(TRADING_DAYS) if len(returns) > 1 else 0.0
+    annual = equity[-1] ** (1.0 / years) - 1.0 if years > 0 and equity[-1] > 0 else -1.0
+    drawdown = equity / np.maximum.accumulate(np.concatenate([[1.0], equity]))[1:] - 1.0
+    wins, losses = returns[returns > 0], returns[returns < 0]
+    metrics = {
+        'totalReturn': float(equity[-1] - 1.0),
+        'annualReturn': float(annual),
+        'annualVolatility': float(vol),
+        'sharpe': float(returns.mean() / returns.std(ddof=1) * np.sqrt(TRADING_DAYS)) if vol > 0 else 0.0,
+        'maxDrawdown': float(drawdown.min()),
+        'winRate': float(len(wins) / max(1, len(wins) + len(losses))),
+        'avgWin': float(wins.mean()) if len(wins) else 0.0,
+        'avgLoss': float(-losses.mean()) if len(losses) else 0.0,
+        'profitFactor': float(wins.sum() / -losses.sum()) if len(losses) and losses.sum() < 0 else None,
+        'days': int(len(returns)),
+    }
+    if positions is not None:
+        positions = np.asarray(positions, dtype=np.float64)
+        metrics['exposure'] = float(positions.mean())
+        metrics['turnover'] = float(np.abs(np.diff(positions, prepend=0.0)).sum() / years) if years > 0 else 0.0
+    return metrics
+
+
+def evaluate(histories, tickers, index, predictions, cost_bps=10.0):
+    """
+    Error metrics plus a long/flat strategy per ticker (long the next day when the predicted
+    close is above today's close) and its equal-weight portfolio vs equal-weight buy & hold.
+    """
+    series = [histories[t][1] for t in tickers]
+    sid, start = index[:, 0], index[:, 1]
+    last = np.array([series[s][i + LOOK_BACK - 1, 0] for s, i in zip(sid, start)]) if len(index) else np.empty(0)
+    actual = np.array([series[s][i + LOOK_BACK, 0] for s, i in zip(sid, start)]) if len(index) else np.empty(0)
+    dates = np.array([histories[tickers[s]][0][i + LOOK_BACK] for s, i in zip(sid, start)], dtype='datetime64[D]')
+
+    errors = predictions - actual
+    day_return = actual / last - 1.0
+    position = (predictions > last).astype(np.float64)
+    # Trading costs on every position change, per ticker in date order
+    order = np.lexsort((dates, sid))
+    changes = np.zeros(len(index))
+    for s in np.unique(sid):
+        rows = order[sid[order] == s]
+        changes[rows] = np.abs(np.diff(position[rows], prepend=0.0))
+    strategy_return = position * day_return - changes * cost_bps / 10000.0
+
+    # Equal-weight portfolios over the tickers that have a bar on each date
+    calendar, day = np.unique(dates, return_inverse=True)
+    counts = np.bincount(day, minlength=len(calendar))
+    portfolio = np.bincount(day, strategy_return, len(calendar)) / counts
+    benchmark = np.bincount(day, day_return, len(calendar)) / counts
+    exposure = np.bincount(day, position, len(calendar)) / counts
+
+    direction_hit = np.sign(predictions - last) == np.sign(actual - last)
+    per_ticker = []
+    for s, ticker in enumerate(tickers):
+        rows = order[sid[order] == s]
+        if len(rows) == 0:
+            continue
+        per_ticker.append({
+            'ticker': ticker,
+            'days': int(len(rows)),
+            'rmse': float(np.sqrt(np.mean(errors[rows] ** 2))),
+            'mae': float(np.mean(np.abs(errors[rows]))),
+            'directionalAccuracy': float(direction_hit[rows].mean()),
+            'strategyReturn': float(np.prod(1.0 + strategy_return[rows]) - 1.0),
+            'buyHoldReturn': float(np.prod(1.0 + day_return[rows]) - 1.0),
+        })
+
+    return {
+        'errors': {
+            'rmse': float(np.sqrt(np.mean(errors ** 2))),
+            'mae': float(np.mean(np.abs(errors))),
+            'mape': float(np.mean(np.abs(errors / actual))),
+            'directionalAccuracy': float(direction_hit.mean()),
+            'predictions': int(len(index)),
+        },
+        'strategies': {
+            'lstmLongFlat': strategy_metrics(portfolio, exposure),
+            'buyHold': strategy_metrics(benchmark, np.ones(len(benchmark))),
+        },
+        'perTicker': per_ticker,
+        'equity': equity_curves(calendar, portfolio, benchmark),
+    }
+
+
+def equity_curves(calendar, portfolio, benchmark, max_points=500):
+    """Cumulative equity of both portfolios, downsampled to at most `max_points` dates"""
+    keep = np.unique(np.linspace(0, len(calendar) - 1, min(max_points, len(calendar))).astype(int))
+    return {
+        'dates': [str(d) for d in calendar[keep]],
+        'lstmLongFlat': np.round(np.cumprod(1.0 + portfolio)[keep], 5).tolist(),
+        'buyHold': np.round(np.cumprod(1.0 + benchmark)[keep], 5).tolist(),
+    }
+
+
+def _compact(value):
+    # Six significant digits are plenty for a results page and keep the file small
+    if isinstance(value, float):
+        return float(f"{value:.6g}")
+    if isinstance(value, dict):
+        return {k: _compact(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_compact(v) for v in value]
+    return value
+
+
+def write_results(results, path=RESULTS_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(_compact(results), f, separators=(',', ':'))
+    os.replace(tmp, path)
+    return path
+
+
+def run_backtest(tickers, years=5, start=None, data_source=TRAIN_DATA_SOURCE, model_path=MODEL_PATH,
+                 registry_dir=REGISTRY_DIR, engine=DEFAULT_ENGINE, batch_size=4096, cost_bps=10.0, workers=None):
+    timings = {}
+    began = time.perf_counter()
+    tickers = [t.strip().upper() for t in tickers if t.strip()]
+    histories = load_histories(tickers, years, workers, data_source)
+    if not histories:
+        raise RuntimeError("No ticker produced usable history.")
+    tickers = [t for t in tickers if t in histories]
+    timings['load'] = time.perf_counter() - began
+
+    index = evaluation_index(histories, tickers, start)
+    if len(index) == 0:
+        raise RuntimeError("No prediction windows fall inside the evaluation period.")
+
+    step = time.perf_counter()
+    registry = open_registry(model_path, *legacy_scaler(model_path), registry_dir=registry_dir, engine=engine)
+    predictions = run_inference(registry, histories, tickers, index, batch_size)
+    timings['inference'] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    results = evaluate(histories, tickers, index, predictions, cost_bps)
+    timings['evaluate'] = time.perf_counter() - step
+    timings['total'] = time.perf_counter() - began
+
+    results['config'] = {
+        'tickers': tickers,
+        'years': years,
+        'start': str(start) if start else None,
+        'dataSource': data_source,
+        'engine': engine,
+        'modelVersions': sorted({f"{h.name}/{h.version}" for h in (registry.get(t) for t in tickers)}),
+        'costBps': cost_bps,
+        'lookBack': LOOK_BACK,
+    }
+    results['timings'] = timings
+    results['generatedAt'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Walk-forward backtest of the LSTM model over a ticker universe.')
+    parser.add_argument('--tickers', default='AAPL', help='Comma-separated ticker symbols')
+    parser.add_argument('--tickers-file', help='File with one ticker symbol per line (overrides --tickers)')
+    parser.add_argument('--years', type=int, default=5, help='Years of daily history per ticker')
+    parser.add_argument('--start', help='First predicted date (YYYY-MM-DD); defaults to every available window')
+    parser.add_argument('--data-source', default=os.environ.get('TRAIN_DATA_SOURCE', TRAIN_DATA_SOURCE))
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--registry', default=REGISTRY_DIR)
+    parser.add_argument('--engine', choices=ENGINES, default=DEFAULT_ENGINE)
+    parser.add_argument('--batch-size', type=int, default=4096, help='Windows per forward pass')
+    parser.add_argument('--cost-bps', type=float, default=10.0, help='Cost per position change in basis points')
+    parser.add_argument('--workers', type=int, default=None, help='Processes used to fetch and featurize tickers')
+    parser.add_argument('--out', default=RESULTS_PATH)
+    args = parser.parse_args()
+
+    if args.tickers_file:
+        with open(args.tickers_file) as f:
+            tickers = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    else:
+        tickers = args.tickers.split(',')
+
+    results = run_backtest(tickers, years=args.years, start=args.start, data_source=args.data_source,
+                           model_path=args.model, registry_dir=args.registry, engine=args.engine,
+                           batch_size=args.batch_size, cost_bps=args.cost_bps, workers=args.workers)
+    path = write_results(results, args.out)
+    errors, strategy = results['errors'], results['strategies']['lstmLongFlat']
+    print(f"{errors['predictions']} predictions over {len(results['perTicker'])} tickers "
+          f"in {results['timings']['total']:.1f}s (inference {results['timings']['inference']:.1f}s)")
+    print(f"RMSE {errors['rmse']:.2f}  MAE {errors['mae']:.2f}  DA {errors['directionalAccuracy'] * 100:.1f}%")
+    print(f"Long/flat: annual {strategy['annualReturn'] * 100:.1f}%  Sharpe {strategy['sharpe']:.2f}  "
+          f"max DD {strategy['maxDrawdown'] * 100:.1f}%")
+    print(f"Results written to {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import time
+import queue
+import threading
+import numpy as np
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Coalesce feature windows submitted by concurrent requests into one batched forward pass.
+
+    Windows that arrive within `max_wait_ms` of the first queued window (or until
+    `max_batch` windows are waiting) are stacked into a single [B, 60, 3] array and
+    passed to `predict_fn(model, X)`; each caller's Future receives its own rows of the output.
+    A caller may also submit a whole [k, 60, 3] block, which always stays in one batch.
+    Windows bound for different models (e.g. per-ticker models) run as separate passes.
+    `backlog` counts the rows queued and not yet taken into a batch.
+    """
+
+    def __init__(self, predict_fn, max_batch=64, max_wait_ms=5.0):
+        self.predict_fn = predict_fn
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.queue = queue.Queue()
+        self.backlog = 0
+        self._backlog_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self.thread.start()
+
+    def submit(self, window, model=None):
+        """Queue one normalized [60, 3] window; returns a Future resolving to its prediction row"""
+        future = Future()
+        self._put((np.asarray(window, dtype=np.float32)[np.newaxis], future, True, model))
+        return future
+
+    def submit_many(self, windows, model=None):
+        """Queue a [k, 60, 3] block; returns a Future resolving to its k prediction rows"""
+        future = Future()
+        self._put((np.asarray(windows, dtype=np.float32), future, False, model))
+        return future
+
+    def _put(self, item):
+        with self._backlog_lock:
+            self.backlog += len(item[0])
+        self.queue.put(item)
+
+    def predict(self, window, model=None):
+        """Blocking convenience wrapper around submit()"""
+        return self.submit(window, model).result()
+
+    def predict_many(self, windows, model=None):
+        """Blocking convenience wrapper around submit_many()"""
+        return self.submit_many(windows, model).result()
+
+    def _collect(self):
+        # Block for the first block, then wait at most max_wait for company
+        batch = [self.queue.get()]
+        rows = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # Budget spent: still take whatever is already waiting
+                    batch.append(self.queue.get_nowait())
+                else:
+                    batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+            rows += len(batch[-1][0])
+        with self._backlog_lock:
+            self.backlog -= rows
+        return batch
+
+    def _run(self):
+        while True:
+            groups = {}
+            for item in self._collect():
+                groups.setdefault(id(item[3]), []).append(item)
+            for batch in groups.values():
+                self._predict(batch[0][3], batch)
+
+    def _predict(self, model, batch):
+        X = np.concatenate([block for block, _, _, _ in batch])
+        start = time.perf_counter()
+        try:
+            y = np.asarray(self.predict_fn(model, X))
+        except Exception as e:
+            for _, future, _, _ in batch:
+                future.set_exception(e)
+            return
+        compute_ms = (time.perf_counter() - start) * 1000.0
+        offset = 0
+        for block, future, single, _ in batch:
+            rows = y[offset:offset + len(block)]
+            offset += len(block)
+            # Lets callers tell forward-pass time from time spent queued
+            future.compute_ms = compute_ms
+            future.batch_rows = len(X)
+            future.set_result(rows[0] if single else rows)
@@ -0,0 +1,352 @@
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import platform
+import argparse
+import tempfile
+import subprocess
+import statistics
+import urllib.request
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import data_source
+import model_registry
+import predict
+from indicators import IndicatorEngine, compute_features
+from windows import create_sequences
+
+# Reproducible benchmarks for the prediction and training hot paths. Every run writes one
+# JSON file (environment + per-benchmark timing statistics) so two commits can be compared:
+#
+#   python benchmark.py --out before.json
+#   python benchmark.py --out after.json --compare before.json
+#
+# Market data comes from the synthetic source and, unless --model points at a trained
+# model, inference uses a random-weight model of the training architecture.
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_PATH = os.path.join(BACKEND_DIR, 'results', 'benchmark.json')
+SCALER = (50.694803, 199.957651)
+LOOK_BACK = 60
+# LSTM(64, return_sequences) -> LSTM(32) -> Dense(1), as built by data_and_train.py
+SYNTHETIC_UNITS = (64, 32)
+
+
+def measure(fn, repeat=20, warmup=2, items=1):
+    """Timing statistics in milliseconds for `repeat` calls of fn(); `items` per call give a rate"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return summarize(samples, items)
+
+
+def summarize(samples, items=1):
+    samples = sorted(samples)
+    median = statistics.median(samples)
+    return {
+        'n': len(samples),
+        'meanMs': statistics.fmean(samples),
+        'medianMs': median,
+        'p95Ms': samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))],
+        'minMs': samples[0],
+        'maxMs': samples[-1],
+        'stdevMs': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'itemsPerSec': items * 1000.0 / median if median > 0 else None,
+    }
+
+
+def publish_synthetic_model(root, seed=0, features=3):
+    """Publish a random-weight model (NumPy engine format) to a registry at `root`"""
+    rng = np.random.default_rng(seed)
+    specs, arrays = [], {}
+    inputs = features
+    for i, units in enumerate(SYNTHETIC_UNITS):
+        layer = len(specs)
+        specs.append({'type': 'lstm', 'units': units, 'activation': 'tanh', 'recurrent_activation': 'sigmoid',
+                      'return_sequences': i < len(SYNTHETIC_UNITS) - 1})
+        arrays[f"layer{layer}_0"] = rng.normal(0, 1 / np.sqrt(inputs), (inputs, 4 * units))
+        arrays[f"layer{layer}_1"] = rng.normal(0, 1 / np.sqrt(units), (units, 4 * units))
+        arrays[f"layer{layer}_2"] = np.zeros(4 * units)
+        # Same layout as build_lstm_model(), so Monte Carlo dropout can be benchmarked too
+        specs.append({'type': 'dropout', 'rate': 0.2})
+        inputs = units
+    last = len(specs)
+    specs.append({'type': 'dense', 'units': 1, 'activation': 'linear'})
+    arrays[f"layer{last}_0"] = rng.normal(0, 1 / np.sqrt(inputs), (inputs, 1))
+    arrays[f"layer{last}_1"] = np.full(1, 0.5)
+    arrays = {k: v.astype(np.float32) for k, v in arrays.items()}
+    arrays['spec'] = np.array(json.dumps(specs))
+
+    def save_model(path):
+        # Only weights.npz is read by the NumPy engine; model.keras stays absent
+        np.savez(os.path.join(os.path.dirname(path), 'weights.npz'), **arrays)
+
+    scaler = {'close_min': SCALER[0], 'close_max': SCALER[1]}
+    version = model_registry.publish(save_model, scaler=scaler, root=root)
+    return os.path.join(version, model_registry.MODEL_FILE)
+
+
+def worker_args(model_path, registry_dir, engine):
+    return [sys.executable, os.path.join(BACKEND_DIR, 'predict.py'), '--model', model_path, '--registry', registry_dir,
+            '--min', str(SCALER[0]), '--max', str(SCALER[1]), '--engine', engine]
+
+
+def bench_cold_start(model_path, registry_dir, engine, repeat):
+    """Interpreter + imports, and a --serve worker until its ready line"""
+    env = dict(os.environ, DATA_SOURCE='synthetic')
+
+    def import_predict():
+        subprocess.run([sys.executable, '-c', 'import predict'], cwd=BACKEND_DIR, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def worker_ready():
+        proc = subprocess.Popen(worker_args(model_path, registry_dir, engine) + ['--serve'], cwd=BACKEND_DIR,
+                                env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                text=True)
+        try:
+            line = proc.stdout.readline()
+            if not json.loads(line).get('ready'):
+                raise RuntimeError(f"Worker did not start: {line.strip()}")
+        finally:
+            proc.stdin.close()
+            proc.wait()
+
+    return {
+        'cold_start.import_predict': measure(import_predict, repeat, warmup=1),
+        'cold_start.worker_ready': measure(worker_ready, repeat, warmup=1),
+    }
+
+
+def bench_model_load(model_path, engine, repeat):
+    return {f'model_load.{engine}': measure(lambda: predict.load_model(model_path, engine), repeat, warmup=1)}
+
+
+def bench_features(repeat, series_rows):
+    """Ticker indicator path (cold and incremental) and the close-only manual input path"""
+    ticker = 'BENCH'
+    closes = data_source.create_source('synthetic').history(ticker)['Close'].to_numpy()
+
+    def fetch_cold():
+        predict.indicator_engine = IndicatorEngine(window=LOOK_BACK)
+        predict.fetch_stock_data(ticker)
+
+    predict.fetch_stock_data(ticker)
+    manual = closes[-LOOK_BACK:].tolist()
+    long_series = np.resize(closes, series_rows)
+    results = {
+        'features.fetch_stock_data_cold': measure(fetch_cold, repeat),
+        # Same bars again: the engine only has to confirm nothing new arrived
+        'features.fetch_stock_data_warm': measure(lambda: predict.fetch_stock_data(ticker), repeat),
+        'features.manual_close_input': measure(lambda: predict.build_features(manual), repeat),
+        f'features.compute_features_{series_rows}': measure(lambda: compute_features(long_series), repeat,
+                                                             items=series_rows),
+    }
+    predict.indicator_engine = IndicatorEngine(window=LOOK_BACK)
+    return results
+
+
+def bench_sequences(repeat, series_rows):
+    series = np.random.default_rng(0).random((series_rows, 3))
+    windows = series_rows - LOOK_BACK
+    return {f'windows.create_sequences_{series_rows}': measure(lambda: create_sequences(series, LOOK_BACK), repeat,
+                                                              items=windows)}
+
+
+def bench_inference(model_path, engine, repeat, batch_sizes):
+    """One predict_on_batch per window vs one call for the whole batch"""
+    model = predict.load_model(model_path, engine)
+    rng = np.random.default_rng(0)
+    results = {}
+    for size in batch_sizes:
+        X = rng.random((size, LOOK_BACK, 3), dtype=np.float32)
+        results[f'inference.single_x{size}'] = measure(
+            lambda: [predict.predict_on_batch(model, X[i:i + 1]) for i in range(size)], repeat, items=size)
+        results[f'inference.batched_{size}'] = measure(lambda: predict.predict_on_batch(model, X), repeat, items=size)
+    return results
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _post_json(url, body, timeout=60):
+    request = urllib.request.Request(url, data=json.dumps(body).encode(), headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def start_api(registry_dir, engine):
+    """Start backend/index.js against the synthetic source; returns (process, base url)"""
+    node = shutil.which('node')
+    if node is None:
+        raise RuntimeError('node not found on PATH')
+    port = _free_port()
+    env = dict(os.environ, PORT=str(port), PYTHON_EXE=sys.executable, DATA_SOURCE='synthetic',
+               MODEL_REGISTRY_DIR=registry_dir, PREDICT_ENGINE=engine)
+    proc = subprocess.Popen([node, os.path.join(BACKEND_DIR, 'index.js')], cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"index.js exited: {proc.stderr.read()[-500:]}")
+        try:
+            # Succeeds once the workers have loaded the model
+            if 'prediction' in _post_json(f'{url}/api/predict', {'ticker': 'WARMUP'}, timeout=5):
+                return proc, url
+        except Exception:
+            time.sleep(0.25)
+    proc.kill()
+    raise RuntimeError('index.js did not answer /api/predict within 120s')
+
+
+def bench_api(url, requests_total, concurrency, tickers):
+    """Throughput and latency of /api/predict with `concurrency` clients over distinct tickers"""
+    def call(i):
+        start = time.perf_counter()
+        # Tickers are distinct per concurrency level so earlier levels do not warm the result cache
+        body = _post_json(f'{url}/api/predict', {'ticker': f'BENCH{concurrency}X{i % tickers}'})
+        if 'prediction' not in body:
+            raise RuntimeError(f"Unexpected response: {body}")
+        return (time.perf_counter() - start) * 1000.0
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(call, range(requests_total)))
+    elapsed = time.perf_counter() - started
+    stats = summarize(latencies)
+    stats['itemsPerSec'] = requests_total / elapsed
+    stats['concurrency'] = concurrency
+    return {f'e2e.api_predict_c{concurrency}': stats}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Print median times against a previous run (ratio > 1 means slower now)"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)['benchmarks']
+    print(f"{'benchmark':45} {'before ms':>11} {'after ms':>11} {'ratio':>7}")
+    for name, stats in results.items():
+        before = baseline.get(name)
+        if not before or 'medianMs' not in before or 'medianMs' not in stats:
+            continue
+        ratio = stats['medianMs'] / before['medianMs'] if before['medianMs'] else float('inf')
+        print(f"{name:45} {before['medianMs']:11.3f} {stats['medianMs']:11.3f} {ratio:7.2f}")
+
+
+def run(args):
+    groups = set(args.only.split(',')) if args.only else None
+    scratch = tempfile.mkdtemp(prefix='stock-bench-')
+    registry_dir = os.path.join(scratch, 'registry')
+    data_source.set_source('synthetic')
+    if args.model:
+        model_path, engine, model_kind = args.model, args.engine, 'file'
+    else:
+        # The random model only exists in NumPy engine format
+        model_path, engine, model_kind = publish_synthetic_model(registry_dir), 'numpy', 'synthetic'
+
+    stages = [
+        ('cold_start', lambda: bench_cold_start(model_path, registry_dir, engine, max(3, args.repeat // 4))),
+        ('model_load', lambda: bench_model_load(model_path, engine, max(3, args.repeat // 4))),
+        ('features', lambda: bench_features(args.repeat, args.series_rows)),
+        ('windows', lambda: bench_sequences(args.repeat, args.series_rows)),
+        ('inference', lambda: bench_inference(model_path, engine, args.repeat, args.batch_sizes)),
+    ]
+    results = {}
+    try:
+        for group, stage in stages:
+            if groups is None or group in groups:
+                print(f"Running {group} ...", file=sys.stderr)
+                results.update(stage())
+
+        if groups is None or 'e2e' in groups:
+            print("Running e2e ...", file=sys.stderr)
+            proc = None
+            try:
+                if args.api_url:
+                    url = args.api_url.rstrip('/')
+                else:
+                    proc, url = start_api(registry_dir if model_kind == 'synthetic' else model_registry.REGISTRY_DIR,
+                                          engine)
+                for concurrency in args.concurrency:
+                    results.update(bench_api(url, args.api_requests, concurrency, args.api_tickers))
+            except Exception as e:
+                # Node dependencies are not always installed where the Python side is benchmarked
+                results['e2e.api_predict'] = {'skipped': str(e)}
+            finally:
+                if proc is not None:
+                    proc.terminate()
+                    proc.wait()
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'createdAt': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'engine': engine,
+            'model': model_kind,
+            'repeat': args.repeat,
+        },
+        'benchmarks': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the prediction and training hot paths.')
+    parser.add_argument('--model', help='Trained model to benchmark (default: random-weight synthetic model)')
+    parser.add_argument('--engine', choices=predict.ENGINES, default=predict.DEFAULT_ENGINE,
+                        help='Inference engine for --model (the synthetic model always uses numpy)')
+    parser.add_argument('--only', help='Comma-separated groups: cold_start,model_load,features,windows,inference,e2e')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed calls per benchmark')
+    parser.add_argument('--series-rows', type=int, default=2520, help='Rows of the series used for indicators/windows')
+    parser.add_argument('--batch-sizes', type=lambda s: [int(x) for x in s.split(',')], default=[1, 16, 64, 256])
+    parser.add_argument('--api-url', help='Benchmark a running backend instead of starting index.js')
+    parser.add_argument('--api-requests', type=int, default=200, help='/api/predict calls per concurrency level')
+    parser.add_argument('--api-tickers', type=int, default=200,
+                        help='Distinct synthetic tickers requested (fewer than --api-requests exercises the result cache)')
+    parser.add_argument('--concurrency', type=lambda s: [int(x) for x in s.split(',')], default=[1, 16])
+    parser.add_argument('--out', default=RESULTS_PATH)
+    parser.add_argument('--compare', help='Previous results file to compare median times against')
+    args = parser.parse_args()
+
+    report = run(args)
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    if args.compare:
+        compare(report['benchmarks'], args.compare)
+    else:
+        for name, stats in report['benchmarks'].items():
+            if 'medianMs' in stats:
+                print(f"{name:45} median {stats['medianMs']:10.3f} ms  p95 {stats['p95Ms']:10.3f} ms")
+            else:
+                print(f"{name:45} skipped: {stats.get('skipped')}")
+    print(f"Results written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,10 @@
+import os
+import zlib
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from ohlcv_cache import OHLCVCache, normalize_frame, default_cache
+from market_data import default_client
 
 def generate_mock_prices(start_price, end_price, days=65):
     """Generate smooth mock price data with some realistic variation"""
@@ -50,4 +54,211 @@ def fetch_data_from_sheet(ticker):
 
 def is_supported_ticker(ticker):
     """Check if a ticker is supported by our mock data"""
-    return ticker.upper() in ['AAPL', 'MSFT']
\ No newline at end of file
+    return ticker.upper() in ['AAPL', 'MSFT']
+
+# ---------------------------------------------------------------------------
+# Pluggable data sources
+#
+# A source returns daily bars as a DataFrame with a DatetimeIndex and OHLCV columns
+# (at least Close). Sources are registered by name and chosen with a spec string such
+# as "mock,yahoo", "local:/data/vendor" or "synthetic:7"; comma-separated sources are
+# tried in order, skipping those that do not support the ticker.
+# ---------------------------------------------------------------------------
+
+DEFAULT_SPEC = 'mock,yahoo'
+SOURCES = {}
+
+
+class DataSourceError(Exception):
+    """No configured source could provide data for a ticker"""
+
+
+def register_source(name):
+    """Class decorator adding a DataSource subclass to the registry under `name`"""
+    def decorator(cls):
+        cls.name = name
+        SOURCES[name] = cls
+        return cls
+    return decorator
+
+
+class DataSource:
+    """Base class: `history(ticker, start)` returns bars from `start` (a date) or a default lookback"""
+
+    name = None
+
+    def supports(self, ticker):
+        return True
+
+    def history(self, ticker, start=None):
+        raise NotImplementedError
+
+
+@register_source('mock')
+class MockSheetSource(DataSource):
+    """The random-noise AAPL/MSFT mock that stands in for a Google Sheet"""
+
+    def __init__(self, arg=None):
+        pass
+
+    def supports(self, ticker):
+        return is_supported_ticker(ticker)
+
+    def history(self, ticker, start=None):
+        df = normalize_frame(fetch_data_from_sheet(ticker))
+        return df if start is None else df[df.index >= pd.Timestamp(start)]
+
+
+@register_source('yahoo')
+class YahooSource(DataSource):
+    """Chart API through market_data, with full histories kept in the on-disk OHLCV cache"""
+
+    def __init__(self, arg=None):
+        pass
+
+    def history(self, ticker, start=None):
+        if start is not None:
+            return default_client.history(ticker, start)
+
+        def fetch_history(refresh_start):
+            hist = default_client.history(ticker, refresh_start)
+            if refresh_start is None and (hist.empty or hist['Close'].isna().all()):
+                raise DataSourceError(f"No price history returned for '{ticker}'")
+            return hist
+
+        return default_cache.get(ticker, '1d', fetch_history, min_rows=60)
+
+
+@register_source('local')
+class LocalFileSource(DataSource):
+    """
+    Vendor dumps in a directory: <TICKER>.csv, <TICKER>.parquet or <TICKER>.npy.
+
+    CSV/Parquet files need a date column (Date/date/timestamp, or the first column) plus
+    OHLCV columns; .npy files hold a structured array with `date` and OHLCV fields. Each
+    file is parsed once into an OHLCVCache entry under `<dir>/.mmap` and memory-mapped
+    from then on; a newer source file triggers a re-parse.
+    """
+
+    EXTENSIONS = ('.parquet', '.csv', '.npy')
+
+    def __init__(self, arg=None):
+        self.root = arg or os.environ.get('DATA_SOURCE_DIR', os.path.join(os.path.dirname(__file__), 'data'))
+        self.compiled = OHLCVCache(root=os.path.join(self.root, '.mmap'), ttl=float('inf'),
+                                   max_stale=float('inf'), max_bytes=float('inf'))
+
+    def _path(self, ticker):
+        for ext in self.EXTENSIONS:
+            path = os.path.join(self.root, ticker.upper() + ext)
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def supports(self, ticker):
+        return self._path(ticker) is not None
+
+    def _parse(self, path):
+        if path.endswith('.npy'):
+            records = np.load(path, allow_pickle=False)
+            df = pd.DataFrame({name: records[name] for name in records.dtype.names})
+        elif path.endswith('.parquet'):
+            df = pd.read_parquet(path)
+        else:
+            df = pd.read_csv(path)
+        date_col = next((c for c in df.columns if str(c).lower() in ('date', 'datetime', 'timestamp', 'time')), df.columns[0])
+        df = df.set_index(date_col)
+        df.columns = [str(c).capitalize() if str(c).lower() != 'adj close' else 'Adj Close' for c in df.columns]
+        return df
+
+    def history(self, ticker, start=None):
+        path = self._path(ticker)
+        if path is None:
+            raise DataSourceError(f"No local history file for '{ticker}' in {self.root}")
+        df, meta = self.compiled.load(ticker, '1d')
+        if df is None or meta.get('fetched_at', 0) < os.path.getmtime(path):
+            df = self.compiled.store(ticker, '1d', self._parse(path), merge=False)
+        return df if start is None else df[df.index >= pd.Timestamp(start)]
+
+
+@register_source('synthetic')
+class SyntheticSource(DataSource):
+    """
+    Deterministic geometric random walk per ticker (seeded by the ticker name and an
+    optional integer seed), one bar per business day up to today. For load tests.
+    """
+
+    EPOCH = pd.Timestamp('2015-01-02')
+
+    def __init__(self, arg=None):
+        self.seed = int(arg) if arg else 0
+
+    def history(self, ticker, start=None):
+        dates = pd.bdate_range(self.EPOCH, pd.Timestamp.today().normalize())
+        rng = np.random.default_rng([zlib.crc32(ticker.upper().encode()), self.seed])
+        start_price = rng.uniform(20, 400)
+        close = start_price * np.exp(np.cumsum(rng.normal(0.0003, 0.015, len(dates))))
+        spread = np.abs(rng.normal(0, 0.01, len(dates)))
+        df = pd.DataFrame({
+            'Open': close * (1 + rng.normal(0, 0.003, len(dates))),
+            'High': close * (1 + spread),
+            'Low': close * (1 - spread),
+            'Close': close,
+            'Volume': rng.integers(100_000, 5_000_000, len(dates)).astype(np.float64),
+        }, index=dates)
+        if start is None:
+            start = dates[-1] - pd.Timedelta(days=400)
+        return df[df.index >= pd.Timestamp(start)]
+
+
+class ChainSource(DataSource):
+    """Try several sources in order; the first one that supports the ticker and succeeds wins"""
+
+    def __init__(self, sources):
+        self.sources = sources
+        self.name = ','.join(source.name for source in sources)
+
+    def supports(self, ticker):
+        return any(source.supports(ticker) for source in self.sources)
+
+    def history(self, ticker, start=None):
+        errors = []
+        for source in self.sources:
+            if not source.supports(ticker):
+                continue
+            try:
+                df = source.history(ticker, start)
+                if df is not None and not df.empty and 'Close' in df.columns:
+                    return df
+                errors.append(f"{source.name}: no data")
+            except Exception as e:
+                errors.append(f"{source.name}: {str(e)}")
+        raise DataSourceError('; '.join(errors) or f"No data source supports '{ticker}' ({self.name})")
+
+
+def create_source(spec=None):
+    """Build a source from a spec like "mock,yahoo" or "local:/path/to/dumps" """
+    spec = spec or os.environ.get('DATA_SOURCE', DEFAULT_SPEC)
+    sources = []
+    for part in spec.split(','):
+        name, _, arg = part.strip().partition(':')
+        if name not in SOURCES:
+            raise ValueError(f"Unknown data source '{name}'. Available: {', '.join(sorted(SOURCES))}")
+        sources.append(SOURCES[name](arg or None))
+    return sources[0] if len(sources) == 1 else ChainSource(sources)
+
+
+_default_source = None
+
+
+def get_source():
+    """Process-wide source selected by DATA_SOURCE (or set_source)"""
+    global _default_source
+    if _default_source is None:
+        _default_source = create_source()
+    return _default_source
+
+
+def set_source(spec):
+    global _default_source
+    _default_source = create_source(spec)
+    return _default_source
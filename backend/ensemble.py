@@ -0,0 +1,280 @@
+import os
+import json
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from windows import iter_window_batches
+
+# Fast baselines served next to the LSTM and blended with it:
+#
+#   naive  tomorrow's close is today's close
+#   ema    today's close drifted by the exponentially weighted mean of recent log returns
+#   ridge  closed-form ridge regression on lagged features of the [Close, RSI, MACD] window
+#   gbt    gradient-boosted trees (scikit-learn HistGradientBoostingRegressor) on the same features
+#
+# Every baseline predicts the next log return from lag_features(); closes follow from the
+# window's last close. data_and_train.py fits them in a process pool and learns non-negative
+# blending weights on the validation windows; the version directory then holds ensemble.json
+# (weights, ridge coefficients, metrics) and gbt.pkl. Kept free of TensorFlow imports.
+
+ENSEMBLE_FILE = 'ensemble.json'
+GBT_FILE = 'gbt.pkl'
+FORMAT_VERSION = 1
+BASELINES = ('naive', 'ema', 'ridge', 'gbt')
+LAGS = 20
+EMA_SPAN = 10
+RIDGE_ALPHA = 1.0
+# Baselines are fitted on an evenly spaced subsample of at most this many training windows
+MAX_FIT_WINDOWS = 200000
+
+
+def lag_features(windows):
+    """[B, F] scale-free features of raw (unnormalized) [B, T, 3] windows"""
+    windows = np.asarray(windows, dtype=np.float64)
+    close, rsi, macd = windows[..., 0], windows[..., 1], windows[..., 2]
+    last = close[:, -1:]
+    returns = np.diff(np.log(close[:, -(LAGS + 1):]), axis=1)
+    return np.column_stack([
+        returns,
+        returns.std(axis=1),
+        last[:, 0] / close[:, -LAGS:].mean(axis=1) - 1.0,
+        last[:, 0] / close.mean(axis=1) - 1.0,
+        rsi[:, -1] / 100.0,
+        rsi[:, -5:].mean(axis=1) / 100.0,
+        macd[:, -1] / last[:, 0],
+        (macd[:, -1] - macd[:, -5]) / last[:, 0],
+    ])
+
+
+class NaiveBaseline:
+    name = 'naive'
+
+    def fit(self, features, returns):
+        return self
+
+    def predict(self, features):
+        return np.zeros(len(features))
+
+
+class EMADriftBaseline:
+    name = 'ema'
+
+    def __init__(self, span=EMA_SPAN):
+        self.span = span
+        alpha = 2.0 / (span + 1.0)
+        # Weights of the LAGS most recent returns (oldest first) in one dot product
+        weights = (1.0 - alpha) ** np.arange(LAGS - 1, -1, -1)
+        self.weights = weights / weights.sum()
+
+    def fit(self, features, returns):
+        return self
+
+    def predict(self, features):
+        return features[:, :LAGS] @ self.weights
+
+
+class RidgeBaseline:
+    name = 'ridge'
+
+    def __init__(self, alpha=RIDGE_ALPHA, mean=None, scale=None, coef=None, intercept=0.0):
+        self.alpha = alpha
+        self.mean = None if mean is None else np.asarray(mean)
+        self.scale = None if scale is None else np.asarray(scale)
+        self.coef = None if coef is None else np.asarray(coef)
+        self.intercept = intercept
+
+    def fit(self, features, returns):
+        std = features.std(axis=0)
+        self.mean = features.mean(axis=0)
+        self.scale = np.where(std > 0, std, 1.0)
+        Z = (features - self.mean) / self.scale
+        self.intercept = float(returns.mean())
+        self.coef = np.linalg.solve(Z.T @ Z + self.alpha * np.eye(Z.shape[1]), Z.T @ (returns - self.intercept))
+        return self
+
+    def predict(self, features):
+        return ((features - self.mean) / self.scale) @ self.coef + self.intercept
+
+    def params(self):
+        return {'alpha': self.alpha, 'mean': self.mean.tolist(), 'scale': self.scale.tolist(),
+                'coef': self.coef.tolist(), 'intercept': self.intercept}
+
+
+class GBTBaseline:
+    name = 'gbt'
+
+    def __init__(self, model=None):
+        self.model = model
+
+    def fit(self, features, returns):
+        from sklearn.ensemble import HistGradientBoostingRegressor
+
+        self.model = HistGradientBoostingRegressor(max_iter=300, learning_rate=0.05, max_leaf_nodes=31,
+                                                   l2_regularization=1.0, early_stopping=True, random_state=0)
+        self.model.fit(features, returns)
+        return self
+
+    def predict(self, features):
+        return self.model.predict(features)
+
+
+def create_baseline(name):
+    classes = {'naive': NaiveBaseline, 'ema': EMADriftBaseline, 'ridge': RidgeBaseline, 'gbt': GBTBaseline}
+    if name not in classes:
+        raise ValueError(f"Unknown baseline '{name}' (expected one of {', '.join(BASELINES)})")
+    return classes[name]()
+
+
+class Ensemble:
+    """
+    Fitted baselines plus their blending weights. `weights` covers 'lstm' and every
+    baseline and is used while the LSTM serves; `fallback_weights` blends the baselines
+    alone when a prediction skips the LSTM.
+    """
+
+    def __init__(self, baselines, weights, fallback_weights, metrics=None):
+        self.baselines = list(baselines)
+        self.names = [b.name for b in self.baselines]
+        self.weights = dict(weights)
+        self.fallback_weights = dict(fallback_weights)
+        self.metrics = metrics or {}
+        self._lstm_weight = float(self.weights.get('lstm', 0.0))
+        self._weights = np.array([self.weights.get(n, 0.0) for n in self.names])
+        self._fallback = np.array([self.fallback_weights.get(n, 0.0) for n in self.names])
+
+    def baseline_closes(self, windows):
+        """[B, M] next-close predictions of every baseline for raw [B, T, 3] windows"""
+        windows = np.asarray(windows, dtype=np.float64)
+        features = lag_features(windows)
+        returns = np.column_stack([b.predict(features) for b in self.baselines])
+        return windows[:, -1, :1] * np.exp(returns)
+
+    def combine(self, lstm_closes, baseline_closes):
+        """Blended closes from [B] LSTM closes and [B, M] baseline closes"""
+        return self._lstm_weight * lstm_closes + baseline_closes @ self._weights
+
+    def fallback(self, baseline_closes):
+        """Blended closes without the LSTM"""
+        return baseline_closes @ self._fallback
+
+    def save(self, directory):
+        spec = {'version': FORMAT_VERSION, 'baselines': self.names, 'lags': LAGS,
+                'weights': self.weights, 'fallbackWeights': self.fallback_weights, 'metrics': self.metrics}
+        for baseline in self.baselines:
+            if baseline.name == 'ema':
+                spec['ema'] = {'span': baseline.span}
+            elif baseline.name == 'ridge':
+                spec['ridge'] = baseline.params()
+            elif baseline.name == 'gbt':
+                with open(os.path.join(directory, GBT_FILE), 'wb') as f:
+                    pickle.dump(baseline.model, f)
+        with open(os.path.join(directory, ENSEMBLE_FILE), 'w') as f:
+            json.dump(spec, f, indent=2)
+
+
+def load_ensemble(directory):
+    """The Ensemble published in a model version directory, or None when it has none"""
+    try:
+        with open(os.path.join(directory, ENSEMBLE_FILE)) as f:
+            spec = json.load(f)
+    except FileNotFoundError:
+        return None
+    if spec.get('version') != FORMAT_VERSION or spec.get('lags') != LAGS:
+        return None
+    baselines = []
+    for name in spec['baselines']:
+        if name == 'ema':
+            baselines.append(EMADriftBaseline(**spec['ema']))
+        elif name == 'ridge':
+            baselines.append(RidgeBaseline(**spec['ridge']))
+        elif name == 'gbt':
+            with open(os.path.join(directory, GBT_FILE), 'rb') as f:
+                baselines.append(GBTBaseline(pickle.load(f)))
+        else:
+            baselines.append(create_baseline(name))
+    return Ensemble(baselines, spec['weights'], spec['fallbackWeights'], spec.get('metrics'))
+
+
+def window_features(series, index, look_back=60, batch_size=65536):
+    """(lag features, last closes, next closes) for the windows in `index`"""
+    parts = [(lag_features(X), X[:, -1, 0].astype(np.float64), y.astype(np.float64))
+             for X, y in iter_window_batches(series, index, look_back, batch_size)]
+    if not parts:
+        return np.empty((0, LAGS + 7)), np.empty(0), np.empty(0)
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+
+def _fit_task(name, series, train_idx, eval_indexes, look_back):
+    """Process-pool task: fit one baseline and return (name, baseline, [closes per eval index])"""
+    if len(train_idx) > MAX_FIT_WINDOWS:
+        train_idx = train_idx[np.linspace(0, len(train_idx) - 1, MAX_FIT_WINDOWS).astype(np.int64)]
+    features, last, target = window_features(series, train_idx, look_back)
+    baseline = create_baseline(name).fit(features, np.log(target / last))
+    closes = []
+    for index in eval_indexes:
+        features, last, _ = window_features(series, index, look_back)
+        closes.append(last * np.exp(baseline.predict(features)))
+    return name, baseline, closes
+
+
+def fit_weights(returns, target):
+    """
+    Non-negative blending weights over the columns of [n, M] predicted log returns. The
+    naive baseline predicts a zero return, so it takes up whatever weight is left below 1.
+    """
+    from scipy.optimize import nnls
+
+    weights, _ = nnls(returns, target)
+    total = weights.sum()
+    if total > 1.0:
+        weights = weights / total
+    return weights, max(0.0, 1.0 - weights.sum())
+
+
+def price_metrics(y_true, y_pred, index):
+    """RMSE, MAE and directional accuracy (consecutive windows of the same series only)"""
+    same = index[1:, 0] == index[:-1, 0]
+    direction = np.sign(np.diff(y_true))[same] == np.sign(np.diff(y_pred))[same]
+    return {'rmse': float(np.sqrt(np.mean((y_true - y_pred) ** 2))), 'mae': float(np.mean(np.abs(y_true - y_pred))),
+            'directional_accuracy': float(direction.mean() * 100) if len(direction) else 0.0}
+
+
+def fit_ensemble(series, train_idx, val_idx, test_idx, lstm_val, lstm_test, look_back=60, baselines=BASELINES,
+                 workers=None):
+    """
+    Fit `baselines` in parallel processes, learn blending weights against the LSTM's
+    validation closes (`lstm_val`) and score every model on the test windows (`lstm_test`
+    are the LSTM's test closes). Returns (Ensemble, metrics).
+    """
+    # The naive baseline absorbs the weight left below 1, so it is always part of the blend
+    baselines = ['naive'] + [n for n in baselines if n != 'naive']
+    for name in baselines:
+        create_baseline(name)
+    fitted, closes = {}, {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        tasks = [pool.submit(_fit_task, name, series, train_idx, (val_idx, test_idx), look_back) for name in baselines]
+        for task in tasks:
+            name, baseline, (val, test) = task.result()
+            fitted[name], closes[name] = baseline, (val, test)
+
+    _, val_last, val_target = window_features(series, val_idx, look_back)
+    _, test_last, test_target = window_features(series, test_idx, look_back)
+    target = np.log(val_target / val_last)
+    blended = [n for n in baselines if n != 'naive']
+    val_returns = {n: np.log(closes[n][0] / val_last) for n in blended}
+
+    lstm_returns = np.log(np.maximum(lstm_val, 1e-9) / val_last)
+    columns, naive = fit_weights(np.column_stack([lstm_returns] + [val_returns[n] for n in blended]),
+                                 target)
+    weights = dict(zip(['lstm'] + blended, columns.tolist()), naive=naive)
+    columns, naive = fit_weights(np.column_stack([val_returns[n] for n in blended]), target)
+    fallback_weights = dict(zip(blended, columns.tolist()), naive=naive)
+
+    ensemble = Ensemble([fitted[n] for n in baselines], weights, fallback_weights)
+    test_closes = np.column_stack([closes[n][1] for n in baselines])
+    metrics = {n: price_metrics(test_target, closes[n][1], test_idx) for n in baselines}
+    metrics['lstm'] = price_metrics(test_target, lstm_test, test_idx)
+    metrics['ensemble'] = price_metrics(test_target, ensemble.combine(lstm_test, test_closes), test_idx)
+    metrics['fallback'] = price_metrics(test_target, ensemble.fallback(test_closes), test_idx)
+    ensemble.metrics = metrics
+    return ensemble, {'weights': weights, 'fallbackWeights': fallback_weights, 'models': metrics}
@@ -0,0 +1,310 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from indicators import compute_features, RSI_LENGTH, MACD_FAST, MACD_SLOW, MACD_SIGNAL
+
+# Precomputed per-ticker feature rows shared by training and serving:
+#
+#   <root>/manifest.json                columns, indicator parameters and published rows and
+#                                       generation per ticker
+#   <root>/<TICKER>/features.<gen>.f32  [rows, 3] float32 [Close, RSI, MACD], before normalization
+#   <root>/<TICKER>/dates.<gen>.i64     [rows] int64 bar dates (datetime64[ns])
+#
+# The ingestion job (`python feature_store.py --tickers ...`) is the only writer. New bars are
+# appended to the current generation's files and published by replacing manifest.json; readers
+# never look past the published row count, so they cannot see a half-written bar. A revised
+# history (the last bar was still trading at the previous run, a split adjustment) is written
+# to the files of the next generation, which no published manifest points at yet; once the new
+# manifest is in place the older generations are deleted (open mappings stay valid).
+#
+# Rows are stored unnormalized because the MACD column is scaled per 60-row window;
+# training and serving normalize the windows they slice with featurize.normalize_features.
+
+DEFAULT_DIR = os.path.join(os.path.dirname(__file__), 'data', 'features')
+# Serving reads the store only when this is set; the ingestion CLI falls back to DEFAULT_DIR
+FEATURE_STORE_DIR = os.environ.get('FEATURE_STORE_DIR', '')
+# Tickers not re-ingested for this long are fetched and computed again by the predictor
+FEATURE_STORE_MAX_AGE = float(os.environ.get('FEATURE_STORE_MAX_AGE', 24 * 3600))
+
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 2  # 2: generation-suffixed files
+COLUMNS = ['Close', 'RSI', 'MACD']
+INDICATORS = {'rsi': {'length': RSI_LENGTH}, 'macd': {'fast': MACD_FAST, 'slow': MACD_SLOW, 'signal': MACD_SIGNAL}}
+ROW_DTYPE = np.dtype('<f4')
+DATE_DTYPE = np.dtype('<i8')
+
+
+def empty_manifest():
+    return {'version': FORMAT_VERSION, 'columns': COLUMNS, 'dtype': 'float32', 'indicators': INDICATORS,
+            'tickers': {}}
+
+
+def load_manifest(root):
+    """The store's manifest, or an empty one when nothing was ingested yet"""
+    try:
+        with open(os.path.join(root, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return empty_manifest()
+
+
+def compatible(manifest):
+    """Whether stored rows were computed with the current indicator code"""
+    return (manifest.get('version') == FORMAT_VERSION and manifest.get('columns') == COLUMNS
+            and manifest.get('indicators') == INDICATORS)
+
+
+def _paths(root, ticker, generation):
+    directory = os.path.join(root, ticker)
+    return (os.path.join(directory, f"features.{generation}.f32"),
+            os.path.join(directory, f"dates.{generation}.i64"))
+
+
+def _next_generation(root, ticker):
+    """A generation above every one with files on disk (e.g. left by a dropped manifest)"""
+    generations = [0]
+    try:
+        for name in os.listdir(os.path.join(root, ticker)):
+            parts = name.split('.')
+            if len(parts) == 3 and parts[1].isdigit():
+                generations.append(int(parts[1]))
+    except FileNotFoundError:
+        pass
+    return max(generations) + 1
+
+
+def remove_stale_generations(root, ticker, generation):
+    """Delete a ticker's files other than the published generation's"""
+    keep = {os.path.basename(path) for path in _paths(root, ticker, generation)}
+    directory = os.path.join(root, ticker)
+    for name in os.listdir(directory):
+        if name not in keep:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+def _day(value):
+    return str(np.asarray(value, dtype=DATE_DTYPE).view('datetime64[ns]').astype('datetime64[D]'))
+
+
+def _map(path, dtype, shape):
+    return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+
+class FeatureStore:
+    """
+    Read side of the store. Arrays are memory-mapped once per ticker and generation and
+    re-mapped when the manifest publishes more rows; slices are zero-copy views.
+    """
+
+    def __init__(self, root=DEFAULT_DIR, max_age=FEATURE_STORE_MAX_AGE, max_open=512):
+        self.root = root
+        self.max_age = max_age
+        self.max_open = max_open  # every mapping holds a file descriptor
+        self._manifest = empty_manifest()
+        self._manifest_mtime = None
+        self._maps = OrderedDict()  # ticker -> ((generation, rows), dates, features)
+        self._lock = threading.Lock()
+
+    def manifest(self):
+        """Current manifest; re-read whenever the ingestion job has replaced it"""
+        path = os.path.join(self.root, MANIFEST)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return self._manifest
+        with self._lock:
+            if mtime != self._manifest_mtime:
+                with open(path) as f:
+                    manifest = json.load(f)
+                # Rows from older indicator code would reintroduce training/serving skew
+                self._manifest = manifest if compatible(manifest) else empty_manifest()
+                self._manifest_mtime = mtime
+            return self._manifest
+
+    def tickers(self):
+        return list(self.manifest()['tickers'])
+
+    def series(self, ticker):
+        """(dates, [rows, 3] features) for every published row of `ticker`, or None when it is not stored"""
+        try:
+            return self._series(ticker)
+        except FileNotFoundError:
+            # The ingestion job published a new generation and deleted ours after we read the
+            # manifest; the re-read manifest names the new files
+            return self._series(ticker)
+
+    def _series(self, ticker):
+        entry = self.manifest()['tickers'].get(ticker)
+        if entry is None:
+            return None
+        key = (entry['generation'], entry['rows'])
+        with self._lock:
+            cached = self._maps.get(ticker)
+            if cached is None or cached[0] != key:
+                features_path, dates_path = _paths(self.root, ticker, entry['generation'])
+                rows = entry['rows']
+                cached = (key, _map(dates_path, DATE_DTYPE, (rows,)).view('datetime64[ns]'),
+                          _map(features_path, ROW_DTYPE, (rows, len(COLUMNS))))
+                self._maps[ticker] = cached
+                if len(self._maps) > self.max_open:
+                    self._maps.popitem(last=False)
+            else:
+                self._maps.move_to_end(ticker)
+        return cached[1], cached[2]
+
+    def window(self, ticker, rows=60):
+        """
+        Last `rows` (dates, features) of a ticker ingested within `max_age`, or None so the
+        caller fetches and computes the features itself.
+        """
+        entry = self.manifest()['tickers'].get(ticker)
+        if entry is None or entry['rows'] < rows or time.time() - entry['updatedAt'] > self.max_age:
+            return None
+        dates, features = self.series(ticker)
+        return dates[-rows:], features[-rows:]
+
+
+def _write_arrays(root, ticker, generation, dates, features):
+    """Write a generation's files from scratch; readers only map it once the manifest names it"""
+    features_path, dates_path = _paths(root, ticker, generation)
+    os.makedirs(os.path.dirname(features_path), exist_ok=True)
+    for path, array in ((features_path, features), (dates_path, dates)):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(array.tobytes())
+        os.replace(tmp, path)
+
+
+def _append_arrays(root, ticker, generation, offset, dates, features):
+    """Write rows after the first `offset` rows; bytes left by an unpublished run are overwritten"""
+    features_path, dates_path = _paths(root, ticker, generation)
+    for path, array, row_bytes in ((features_path, features, ROW_DTYPE.itemsize * len(COLUMNS)),
+                                   (dates_path, dates, DATE_DTYPE.itemsize)):
+        with open(path, 'r+b') as f:
+            f.seek(offset * row_bytes)
+            f.write(array.tobytes())
+            f.truncate()
+
+
+def ingest_ticker(root, ticker, entry, dates, closes):
+    """
+    Bring one ticker up to date with a freshly downloaded close history and return its new
+    manifest entry. `updatedAt` moves forward even when no bar changed: the rows were checked.
+    """
+    dates = np.asarray(dates, dtype='datetime64[ns]').astype(DATE_DTYPE)
+    # Indicators are computed on the stored float32 closes so appends and rewrites agree
+    closes = np.asarray(closes, dtype=ROW_DTYPE).astype(np.float64)
+
+    if entry is not None:
+        features_path, dates_path = _paths(root, ticker, entry['generation'])
+        stored_dates = _map(dates_path, DATE_DTYPE, (entry['rows'],))
+        stored = _map(features_path, ROW_DTYPE, (entry['rows'], len(COLUMNS)))
+        _, stored_pos, fetched_pos = np.intersect1d(stored_dates, dates, assume_unique=True, return_indices=True)
+        last = stored_dates[-1]
+        unchanged = (len(stored_pos) > 0 and stored_pos[-1] == entry['rows'] - 1 and
+                     np.array_equal(stored[stored_pos, 0].astype(np.float64), closes[fetched_pos]))
+        if unchanged:
+            new = dates > last
+            if not new.any():
+                return dict(entry, updatedAt=time.time())
+            all_closes = np.concatenate([stored[:, 0].astype(np.float64), closes[new]])
+            features = compute_features(all_closes)[entry['rows']:].astype(ROW_DTYPE)
+            _append_arrays(root, ticker, entry['generation'], entry['rows'], dates[new], features)
+            return dict(entry, rows=entry['rows'] + int(new.sum()), lastDate=_day(dates[-1]),
+                        lastClose=float(closes[-1]), updatedAt=time.time())
+
+    features = compute_features(closes).astype(ROW_DTYPE)
+    generation = max(entry['generation'] + 1 if entry is not None else 1, _next_generation(root, ticker))
+    _write_arrays(root, ticker, generation, dates, features)
+    return {'rows': len(dates), 'generation': generation,
+            'firstDate': _day(dates[0]), 'lastDate': _day(dates[-1]),
+            'lastClose': float(closes[-1]), 'updatedAt': time.time()}
+
+
+def _ingest_task(root, ticker, entry, years, source_spec):
+    """Process-pool task: (ticker, new entry, error)"""
+    from featurize import download_daily_history
+
+    try:
+        df = download_daily_history(ticker, years, source_spec)
+        close = df['Close'].dropna()
+        if close.empty:
+            raise RuntimeError(f"No close prices for {ticker}")
+        return ticker, ingest_ticker(root, ticker, entry, close.index.values, close.to_numpy()), None
+    except Exception as e:
+        return ticker, entry, str(e)
+
+
+def ingest(tickers, root=DEFAULT_DIR, years=5, source_spec=None, workers=None):
+    """Ingest tickers in a process pool and publish the result; returns {ticker: error} for failures"""
+    from featurize import TRAIN_DATA_SOURCE
+
+    source_spec = source_spec or TRAIN_DATA_SOURCE
+    os.makedirs(root, exist_ok=True)
+    manifest = load_manifest(root)
+    if not compatible(manifest):
+        # Rows computed with other indicator parameters are dropped and recomputed
+        manifest = empty_manifest()
+    entries = manifest['tickers']
+    current = [entries.get(t) for t in tickers]
+
+    failed = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for ticker, entry, error in pool.map(_ingest_task, [root] * len(tickers), tickers, current,
+                                             [years] * len(tickers), [source_spec] * len(tickers)):
+            if error:
+                failed[ticker] = error
+            if entry is not None:
+                entries[ticker] = entry
+
+    manifest['updatedAt'] = time.time()
+    tmp = os.path.join(root, f"{MANIFEST}.{os.getpid()}.tmp")
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(root, MANIFEST))
+    # Readers still holding the previous manifest retry with this one (FeatureStore.series)
+    for ticker in tickers:
+        if ticker in entries:
+            remove_stale_generations(root, ticker, entries[ticker]['generation'])
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingest daily bars into the memory-mapped feature store.')
+    parser.add_argument('--tickers', default='AAPL', help='Comma-separated ticker symbols')
+    parser.add_argument('--tickers-file', help='File with one ticker symbol per line (overrides --tickers)')
+    parser.add_argument('--years', type=int, default=5, help='Years of daily history for newly added tickers')
+    parser.add_argument('--data-source', default=None, help='Data source spec (default: the training source)')
+    parser.add_argument('--root', default=FEATURE_STORE_DIR or DEFAULT_DIR, help='Store directory')
+    parser.add_argument('--workers', type=int, default=None, help='Processes used to fetch and featurize tickers')
+    args = parser.parse_args()
+
+    if args.tickers_file:
+        with open(args.tickers_file) as f:
+            tickers = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    else:
+        tickers = args.tickers.split(',')
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t.strip()))
+
+    start = time.perf_counter()
+    failed = ingest(tickers, args.root, args.years, args.data_source, args.workers)
+    for ticker, error in failed.items():
+        print(f"Skipping {ticker}: {error}", file=sys.stderr)
+    manifest = load_manifest(args.root)
+    print(json.dumps({'root': args.root, 'tickers': len(manifest['tickers']), 'failed': len(failed),
+                      'rows': sum(e['rows'] for e in manifest['tickers'].values()),
+                      'seconds': round(time.perf_counter() - start, 3)}))
+    sys.exit(1 if failed and len(failed) == len(tickers) else 0)
+
+
+if __name__ == '__main__':
+    main()
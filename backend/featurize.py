@@ -0,0 +1,76 @@
+import numpy as np
+from datetime import datetime, timedelta
+from indicators import compute_features
+from data_source import create_source
+
+# Kept free of TensorFlow imports: process-pool workers import this module.
+
+MIN_TRAINING_ROWS = 200
+TRAIN_DATA_SOURCE = 'yahoo'
+
+_sources = {}
+
+
+def download_daily_history(ticker, years=5, source_spec=TRAIN_DATA_SOURCE):
+    """Fetch `years` of daily bars for `ticker` from the given data source, sorted oldest -> newest"""
+    if source_spec not in _sources:
+        # One source per spec and process: pool workers reuse it for every ticker they load
+        _sources[source_spec] = create_source(source_spec)
+    start = datetime.utcnow().date() - timedelta(days=365 * years)
+    df = _sources[source_spec].history(ticker, start)
+
+    if df is None or df.empty:
+        raise RuntimeError(f"Failed to download historical data for {ticker}. Dataframe empty.")
+    if 'Close' not in df.columns:
+        raise RuntimeError(f"Downloaded data for {ticker} does not contain a 'Close' column. Columns: {df.columns.tolist()}")
+    # Ensure index is sorted oldest -> newest
+    return df.sort_index()
+
+
+def load_ticker_series(ticker, years=5, source_spec=TRAIN_DATA_SOURCE):
+    """
+    Process-pool task: download one ticker and compute its [n, 3] float64 matrix of
+    [Close, RSI, MACD] plus the matching dates. Returns (ticker, dates, features, error)
+    so one bad symbol does not abort a whole run.
+    """
+    try:
+        df = download_daily_history(ticker, years, source_spec)
+        close = df['Close'].dropna()
+        features = compute_features(close.to_numpy(dtype=np.float64))
+        valid = ~np.isnan(features).any(axis=1)
+        features, dates = features[valid], close.index.values[valid]
+        if len(features) < MIN_TRAINING_ROWS:
+            raise RuntimeError(f"Insufficient cleaned data for training (need >{MIN_TRAINING_ROWS} rows), got {len(features)} rows")
+        return ticker, dates, features, None
+    except Exception as e:
+        return ticker, None, None, str(e)
+
+
+def load_ticker_features(ticker, years=5, source_spec=TRAIN_DATA_SOURCE):
+    """Like load_ticker_series without the dates: returns (ticker, features, error)"""
+    ticker, _, features, error = load_ticker_series(ticker, years, source_spec)
+    return ticker, features, error
+
+
+def normalize_features(features, scaler_min, scaler_max):
+    """
+    Normalize feature windows using fixed MinMax parameters (only Close uses the scaler).
+    Accepts a single [60, 3] window or a stacked [B, 60, 3] batch. Training and serving
+    both go through this function, so the model sees the same inputs in both.
+    """
+    range_val = scaler_max - scaler_min
+    normalized = features.copy()
+    normalized[..., 0] = (features[..., 0] - scaler_min) / range_val
+    # RSI is already 0-100, normalize to 0-1
+    normalized[..., 1] = features[..., 1] / 100.0
+    # MACD is scaled by its own window range and centered around 0.5 (left as-is when flat)
+    macd = features[..., 2]
+    macd_range = np.abs(macd).max(axis=-1, keepdims=True)
+    np.divide(macd, 2 * macd_range, out=normalized[..., 2], where=macd_range != 0)
+    normalized[..., 2] += np.where(macd_range != 0, 0.5, 0.0)
+    return normalized
+
+
+def normalize_batch(X, y, scaler_min, scaler_max):
+    """(X, y) transform for windows.iter_window_batches: inputs as served, targets as normalized closes"""
+    return normalize_features(X, scaler_min, scaler_max), (y - scaler_min) / (scaler_max - scaler_min)
@@ -0,0 +1,159 @@
+// Node side of the framed binary worker transport (see frames.py for the layout):
+//   "PF01" | uint32 LE header length | uint32 LE body length | JSON header | array body
+// Numeric arrays travel as raw little-endian float32/float64 bytes and are referenced
+// from the header as {"$a": i}; header.$arrays[i] = [dtype, shape, byte offset].
+
+const MAGIC = Buffer.from('PF01');
+const PREFIX_SIZE = 12;
+const MIN_LIST_ARRAY = 8; // plain number arrays at least this long are sent as float64
+// Fields whose equal-length rows are one tensor (a 60x3 feature window). Elsewhere, e.g. a
+// batch's `items`, an array of series stays a list and each row is packed on its own.
+const MATRIX_FIELDS = new Set(['data']);
+
+function isNumberList(value) {
+  return Array.isArray(value) && value.length >= MIN_LIST_ARRAY && value.every(v => typeof v === 'number');
+}
+
+// [[n, n, ...], ...] with equal row lengths, e.g. a 60x3 feature window
+function isNumberMatrix(value) {
+  if (!Array.isArray(value) || value.length === 0 || !Array.isArray(value[0])) return false;
+  const width = value[0].length;
+  return width > 0 && value.every(row => Array.isArray(row) && row.length === width && row.every(v => typeof v === 'number'));
+}
+
+function encode(message) {
+  const arrays = [];
+  const chunks = [];
+  let offset = 0;
+
+  const addArray = (typed, shape) => {
+    const dtype = typed instanceof Float32Array ? 'f4' : 'f8';
+    const bytes = Buffer.from(typed.buffer, typed.byteOffset, typed.byteLength);
+    const pad = (8 - (bytes.length % 8)) % 8;
+    arrays.push([dtype, shape, offset]);
+    chunks.push(bytes);
+    if (pad) chunks.push(Buffer.alloc(pad));
+    offset += bytes.length + pad;
+    return { $a: arrays.length - 1 };
+  };
+
+  const walk = (value, field) => {
+    if (value instanceof Float32Array || value instanceof Float64Array) return addArray(value, [value.length]);
+    if (isNumberList(value)) return addArray(Float64Array.from(value), [value.length]);
+    if (MATRIX_FIELDS.has(field) && isNumberMatrix(value)) {
+      return addArray(Float64Array.from(value.flat()), [value.length, value[0].length]);
+    }
+    if (Array.isArray(value)) return value.map(v => walk(v));
+    if (value && typeof value === 'object') {
+      const out = {};
+      for (const [key, v] of Object.entries(value)) out[key] = walk(v, key);
+      return out;
+    }
+    return value;
+  };
+
+  const header = walk(message);
+  if (arrays.length > 0) header.$arrays = arrays;
+  const headerBytes = Buffer.from(JSON.stringify(header));
+  const prefix = Buffer.alloc(PREFIX_SIZE);
+  MAGIC.copy(prefix, 0);
+  prefix.writeUInt32LE(headerBytes.length, 4);
+  prefix.writeUInt32LE(offset, 8);
+  return Buffer.concat([prefix, headerBytes, ...chunks]);
+}
+
+function decode(headerBytes, body) {
+  const message = JSON.parse(headerBytes.toString('utf-8'));
+  const specs = message.$arrays;
+  if (!specs) return message;
+  delete message.$arrays;
+
+  const arrays = specs.map(([dtype, shape, offset]) => {
+    const Typed = dtype === 'f4' ? Float32Array : Float64Array;
+    const count = shape.reduce((a, b) => a * b, 1);
+    const start = body.byteOffset + offset;
+    let typed;
+    if (start % Typed.BYTES_PER_ELEMENT === 0) {
+      typed = new Typed(body.buffer, start, count); // zero-copy view of the received chunk
+    } else {
+      // Typed arrays need aligned offsets; copy when the chunk happens to be misaligned
+      typed = new Typed(count);
+      Buffer.from(typed.buffer).set(body.subarray(offset, offset + count * Typed.BYTES_PER_ELEMENT));
+    }
+    if (shape.length <= 1) return typed;
+    const width = count / shape[0];
+    return Array.from({ length: shape[0] }, (_, i) => typed.subarray(i * width, (i + 1) * width));
+  });
+
+  const walk = (value) => {
+    if (Array.isArray(value)) return value.map(walk);
+    if (value && typeof value === 'object') {
+      if (typeof value.$a === 'number' && Object.keys(value).length === 1) return arrays[value.$a];
+      for (const key of Object.keys(value)) value[key] = walk(value[key]);
+    }
+    return value;
+  };
+  return walk(message);
+}
+
+// Incremental decoder for a byte stream (e.g. a worker's stdout)
+class FrameReader {
+  constructor() {
+    this.buffer = Buffer.alloc(0);
+    this.pending = []; // chunks of a frame that is still incomplete
+    this.pendingLength = 0;
+    this.needed = 0;
+  }
+
+  // Returns the messages completed by `chunk`
+  push(chunk) {
+    if (this.needed > 0) {
+      // Large frames arrive in many pipe reads; join them once instead of per chunk
+      this.pending.push(chunk);
+      this.pendingLength += chunk.length;
+      if (this.pendingLength < this.needed) return [];
+      chunk = Buffer.concat(this.pending, this.pendingLength);
+      this.pending = [];
+      this.pendingLength = 0;
+      this.needed = 0;
+    } else if (this.buffer.length) {
+      chunk = Buffer.concat([this.buffer, chunk]);
+    }
+    this.buffer = chunk;
+    const messages = [];
+    while (this.buffer.length >= PREFIX_SIZE) {
+      if (!this.buffer.subarray(0, 4).equals(MAGIC)) {
+        // Skip stray bytes (nothing else should write to the stream) up to the next frame
+        const next = this.buffer.indexOf(MAGIC, 1);
+        this.buffer = next === -1 ? this.buffer.subarray(Math.max(0, this.buffer.length - 3)) : this.buffer.subarray(next);
+        continue;
+      }
+      const headerLength = this.buffer.readUInt32LE(4);
+      const bodyLength = this.buffer.readUInt32LE(8);
+      const end = PREFIX_SIZE + headerLength + bodyLength;
+      if (this.buffer.length < end) {
+        this.pending = [this.buffer];
+        this.pendingLength = this.buffer.length;
+        this.needed = end;
+        this.buffer = Buffer.alloc(0);
+        break;
+      }
+      const header = this.buffer.subarray(PREFIX_SIZE, PREFIX_SIZE + headerLength);
+      const body = this.buffer.subarray(PREFIX_SIZE + headerLength, end);
+      this.buffer = this.buffer.subarray(end);
+      try {
+        messages.push(decode(header, body));
+      } catch (e) {
+        console.warn(`Dropping undecodable worker frame: ${e.message}`);
+      }
+    }
+    return messages;
+  }
+}
+
+// JSON.stringify replacer so typed arrays from frames serialize as plain JSON arrays
+function typedArrayReplacer(key, value) {
+  return ArrayBuffer.isView(value) ? Array.from(value) : value;
+}
+
+module.exports = { encode, decode, FrameReader, typedArrayReplacer };
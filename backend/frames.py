@@ -0,0 +1,134 @@
+import json
+import struct
+import numpy as np
+
+# Framed binary transport between model.js (PredictorPool) and predict.py --serve.
+#
+#   frame  = magic "PF01" | uint32 header length | uint32 body length | header | body
+#   header = UTF-8 JSON of the message, where every numeric array is replaced by
+#            {"$a": i} and header["$arrays"][i] = [dtype, shape, byte offset into body]
+#   body   = the arrays' raw little-endian bytes, 8-byte aligned
+#
+# Series, paths and batch inputs therefore cross the pipe as raw float32/float64 bytes
+# instead of decimal text; everything else stays plain JSON.
+
+MAGIC = b'PF01'
+PREFIX = struct.Struct('<4sII')
+DTYPES = {'f4': np.dtype('<f4'), 'f8': np.dtype('<f8'), 'i4': np.dtype('<i4')}
+MIN_LIST_ARRAY = 8  # numeric lists at least this long are sent as float64 arrays
+
+
+class FrameError(Exception):
+    """The byte stream does not contain a valid frame"""
+
+
+def json_default(obj):
+    """`default=` for json.dumps so payloads holding NumPy arrays still serialize as JSON"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _as_array(value):
+    if isinstance(value, np.ndarray):
+        if value.dtype == np.float32:
+            return value
+        if value.dtype.kind in 'fiub':
+            return value.astype(np.float64)
+        return None
+    if (isinstance(value, list) and len(value) >= MIN_LIST_ARRAY and isinstance(value[0], (int, float))
+            and not isinstance(value[0], bool)):
+        try:
+            return np.asarray(value, dtype=np.float64)
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def encode(message):
+    """Serialize a message (dicts, lists, scalars and NumPy arrays) into one frame"""
+    arrays, chunks = [], []
+    offset = 0
+
+    def walk(value):
+        nonlocal offset
+        array = _as_array(value)
+        if array is not None:
+            array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<'))
+            arrays.append([array.dtype.kind + str(array.dtype.itemsize), list(array.shape), offset])
+            data = array.tobytes()
+            pad = -len(data) % 8
+            chunks.append(data + b'\0' * pad)
+            offset += len(data) + pad
+            return {'$a': len(arrays) - 1}
+        if isinstance(value, dict):
+            return {k: walk(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [walk(v) for v in value]
+        return value
+
+    header = walk(message)
+    if arrays:
+        header['$arrays'] = arrays
+    header = json.dumps(header, default=json_default, separators=(',', ':')).encode()
+    body = b''.join(chunks)
+    return PREFIX.pack(MAGIC, len(header), len(body)) + header + body
+
+
+def decode(header, body):
+    """Inverse of encode(); arrays come back as read-only NumPy views of `body`"""
+    message = json.loads(header)
+    specs = message.pop('$arrays', None) if isinstance(message, dict) else None
+    if not specs:
+        return message
+    arrays = []
+    for dtype, shape, offset in specs:
+        if dtype not in DTYPES:
+            raise FrameError(f"Unsupported array dtype '{dtype}'")
+        count = int(np.prod(shape)) if shape else 1
+        arrays.append(np.frombuffer(body, dtype=DTYPES[dtype], count=count, offset=offset).reshape(shape))
+
+    def walk(value):
+        if isinstance(value, dict):
+            if len(value) == 1 and '$a' in value:
+                return arrays[value['$a']]
+            return {k: walk(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [walk(v) for v in value]
+        return value
+
+    return walk(message)
+
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    while data is not None and len(data) < size:
+        more = stream.read(size - len(data))
+        if not more:
+            break
+        data += more
+    return data or b''
+
+
+def read_frame(stream):
+    """Next message from a binary stream, or None at EOF"""
+    prefix = _read_exact(stream, PREFIX.size)
+    if not prefix:
+        return None
+    if len(prefix) < PREFIX.size:
+        raise FrameError("Truncated frame prefix")
+    magic, header_len, body_len = PREFIX.unpack(prefix)
+    if magic != MAGIC:
+        raise FrameError(f"Bad frame magic {magic!r}")
+    header = _read_exact(stream, header_len)
+    body = _read_exact(stream, body_len)
+    if len(header) < header_len or len(body) < body_len:
+        raise FrameError("Truncated frame")
+    return decode(header, body)
+
+
+def write_frame(stream, message):
+    stream.write(encode(message))
+    stream.flush()
@@ -2,22 +2,41 @@ const express = require('express');
 const cors = require('cors');
 const bodyParser = require('body-parser');
 const apiRoutes = require('./api');
+const stream = require('./stream');
+const { loadModel, shutdown } = require('./model');
+const { typedArrayReplacer } = require('./frames');
 
 const app = express();
-const port = 3001; // Avoid conflict with Next.js dev server on 3000
+const port = Number(process.env.PORT) || 3001; // Avoid conflict with Next.js dev server on 3000
 
 app.use(cors());
 app.use(bodyParser.json());
+// Series from the binary worker transport arrive as typed arrays
+app.set('json replacer', typedArrayReplacer);
 
 // Health check / root
 app.get('/', (req, res) => {
   res.json({ status: 'ok', service: 'stock-prediction-backend' });
 });
 
+// Streaming feed first, so long-lived SSE connections stay out of the request latency metrics
+app.use(stream.router);
+
 // Mount API routes (includes /api/predict)
 app.use(apiRoutes);
 
 app.listen(port, () => {
   console.log(`Backend server listening at http://localhost:${port}`);
   console.log('Note: If your Next.js dev server is also on 3000, stop it before running this backend.');
-});
\ No newline at end of file
+  // Start the predictor workers up front; a missing model is reported again on first request
+  loadModel().catch(err => console.warn(`Predictor warm-up skipped: ${err.message}`));
+});
+
+// Stop the Python workers together with the server
+for (const signal of ['SIGINT', 'SIGTERM']) {
+  process.on(signal, () => {
+    stream.feed.close();
+    shutdown();
+    process.exit(0);
+  });
+}
\ No newline at end of file
@@ -0,0 +1,369 @@
+import threading
+from collections import deque
+import numpy as np
+from scipy.signal import lfilter
+
+# Indicator parameters shared by training and serving
+RSI_LENGTH = 14
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+
+
+# ---------------------------------------------------------------------------
+# Vectorized batch path
+#
+# These match pandas_ta 0.4.x without TA-Lib: RSI uses Wilder's RMA
+# (ewm(alpha=1/length, adjust=False)) of the up/down moves, and each MACD EMA is
+# seeded with the SMA of its first `length` values before ewm(span, adjust=False).
+# The recursions run through scipy's lfilter, so they are exact and work on the
+# last axis of any [..., T] array (e.g. a [B, T] stack of equal-length series).
+# ---------------------------------------------------------------------------
+
+def _recursive_mean(x, alpha, seed, start):
+    """y[start] = seed, y[t] = (1 - alpha) * y[t-1] + alpha * x[t] afterwards, NaN before start"""
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] <= start:
+        return out
+    seed = np.asarray(seed, dtype=np.float64)
+    out[..., start] = seed
+    if x.shape[-1] > start + 1:
+        zi = ((1.0 - alpha) * seed)[..., np.newaxis]
+        out[..., start + 1:], _ = lfilter([alpha], [1.0, alpha - 1.0], x[..., start + 1:], axis=-1, zi=zi)
+    return out
+
+
+def ema_batch(close, length):
+    """EMA seeded with the SMA of the first `length` values (pandas_ta `ema`, presma=True)"""
+    close = np.asarray(close, dtype=np.float64)
+    if close.shape[-1] < length:
+        return np.full(close.shape, np.nan)
+    seed = close[..., :length].mean(axis=-1)
+    return _recursive_mean(close, 2.0 / (length + 1), seed, length - 1)
+
+
+def _rsi_averages(close, length):
+    """Wilder (RMA) averages of up and down moves; defined from the second close on"""
+    delta = np.diff(close, axis=-1)
+    lead = np.full(close.shape[:-1] + (1,), np.nan)
+    up = np.concatenate([lead, np.maximum(delta, 0.0)], axis=-1)
+    down = np.concatenate([lead, np.maximum(-delta, 0.0)], axis=-1)
+    alpha = 1.0 / length
+    if close.shape[-1] < 2:
+        return up, down
+    return _recursive_mean(up, alpha, up[..., 1], 1), _recursive_mean(down, alpha, down[..., 1], 1)
+
+
+def rsi_batch(close, length=RSI_LENGTH):
+    """Wilder RSI; the first value is NaN (no prior close) and flat stretches give NaN"""
+    close = np.asarray(close, dtype=np.float64)
+    up_avg, down_avg = _rsi_averages(close, length)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return 100.0 * up_avg / (up_avg + down_avg)
+
+
+def macd_batch(close, fast=MACD_FAST, slow=MACD_SLOW, signal=MACD_SIGNAL):
+    """Return (macd, signal, histogram); macd is NaN for the first `slow - 1` bars"""
+    close = np.asarray(close, dtype=np.float64)
+    macd = ema_batch(close, fast) - ema_batch(close, slow)
+    signal_line = np.full(close.shape, np.nan)
+    if close.shape[-1] >= slow - 1 + signal:
+        signal_line[..., slow - 1:] = ema_batch(macd[..., slow - 1:], signal)
+    return macd, signal_line, macd - signal_line
+
+
+def forward_fill(values):
+    """Forward fill NaNs along the last axis (df.ffill()); leading NaNs stay NaN"""
+    values = np.array(values, dtype=np.float64)
+    idx = np.arange(values.shape[-1])
+    last_valid = np.maximum.accumulate(np.where(np.isnan(values), -1, idx), axis=-1)
+    filled = np.take_along_axis(values, np.maximum(last_valid, 0), axis=-1)
+    return np.where(last_valid >= 0, filled, np.nan)
+
+
+def fill_gaps(values):
+    """Forward fill then back fill NaNs along the last axis (same as df.ffill().bfill())"""
+    values = forward_fill(values)
+    # Back filling the remaining leading NaNs is a forward fill of the reversed rows
+    return forward_fill(values[..., ::-1])[..., ::-1]
+
+
+def compute_features(close):
+    """
+    Build [..., T, 3] feature rows of [Close, RSI, MACD] from close prices, with indicator
+    warm-up gaps filled the same way predict.py and data_and_train.py always did.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    rsi = fill_gaps(rsi_batch(close))
+    macd = fill_gaps(macd_batch(close)[0])
+    return np.stack([close, rsi, macd], axis=-1)
+
+
+# ---------------------------------------------------------------------------
+# Streaming path: O(1) state updates per bar
+# ---------------------------------------------------------------------------
+
+class EMAState:
+    """Streaming EMA with SMA seeding; `value` is NaN until `length` values were seen"""
+
+    __slots__ = ('length', 'alpha', 'count', 'total', 'value')
+
+    def __init__(self, length):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.count = 0
+        self.total = 0.0
+        self.value = np.nan
+
+    def copy(self):
+        other = EMAState(self.length)
+        other.count, other.total, other.value = self.count, self.total, self.value
+        return other
+
+    def update(self, x):
+        self.count += 1
+        if self.count < self.length:
+            self.total += x
+        elif self.count == self.length:
+            self.value = (self.total + x) / self.length
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+
+class RSIState:
+    """Streaming Wilder RSI"""
+
+    __slots__ = ('length', 'alpha', 'prev_close', 'up', 'down', 'count')
+
+    def __init__(self, length=RSI_LENGTH):
+        self.length = length
+        self.alpha = 1.0 / length
+        self.prev_close = None
+        self.up = np.nan
+        self.down = np.nan
+        self.count = 0
+
+    def copy(self):
+        other = RSIState(self.length)
+        other.prev_close, other.up, other.down, other.count = self.prev_close, self.up, self.down, self.count
+        return other
+
+    def update(self, close):
+        self.count += 1
+        if self.prev_close is not None:
+            delta = close - self.prev_close
+            gain, loss = max(delta, 0.0), max(-delta, 0.0)
+            if np.isnan(self.up):
+                self.up, self.down = gain, loss
+            else:
+                self.up += self.alpha * (gain - self.up)
+                self.down += self.alpha * (loss - self.down)
+        self.prev_close = close
+        return self.value
+
+    @property
+    def value(self):
+        total = self.up + self.down
+        if not total > 0:
+            return np.nan
+        return 100.0 * self.up / total
+
+
+class MACDState:
+    """Streaming MACD line (EMA fast - EMA slow) plus its signal EMA"""
+
+    __slots__ = ('fast', 'slow', 'signal')
+
+    def __init__(self, fast=MACD_FAST, slow=MACD_SLOW, signal=MACD_SIGNAL):
+        self.fast = EMAState(fast)
+        self.slow = EMAState(slow)
+        self.signal = EMAState(signal)
+
+    def copy(self):
+        other = MACDState.__new__(MACDState)
+        other.fast, other.slow, other.signal = self.fast.copy(), self.slow.copy(), self.signal.copy()
+        return other
+
+    def update(self, close):
+        macd = self.fast.update(close) - self.slow.update(close)
+        signal = self.signal.update(macd) if not np.isnan(macd) else np.nan
+        return macd, signal, macd - signal
+
+
+class IndicatorState:
+    """
+    Indicator state for one ticker plus the last `window` committed feature rows.
+
+    Bars are committed in order with O(1) work each. The newest bar of a fetch can still
+    change (an open trading session), so it is only previewed on a copy of the state and
+    committed once a later bar shows up.
+    """
+
+    def __init__(self, window=60):
+        self.rsi = RSIState()
+        self.macd = MACDState()
+        self.rows = deque(maxlen=window)
+        self.last_time = None
+        self.last_close = None
+        self.last_valid = [np.nan, np.nan]
+
+    @classmethod
+    def from_history(cls, closes, timestamps, window=60):
+        """Commit every bar but the last using the vectorized batch path"""
+        state = cls(window)
+        closes = np.asarray(closes[:-1], dtype=np.float64)
+        m = len(closes)
+        if m == 0:
+            return state
+
+        up_avg, down_avg = _rsi_averages(closes, state.rsi.length)
+        state.rsi.prev_close = float(closes[-1])
+        state.rsi.up, state.rsi.down = float(up_avg[-1]), float(down_avg[-1])
+        state.rsi.count = m
+
+        fast, slow, signal = state.macd.fast, state.macd.slow, state.macd.signal
+        fast_ema, slow_ema = ema_batch(closes, fast.length), ema_batch(closes, slow.length)
+        macd = fast_ema - slow_ema
+        for ema, series, values in ((fast, closes, fast_ema), (slow, closes, slow_ema),
+                                    (signal, macd[slow.length - 1:], None)):
+            if values is None:
+                values = ema_batch(series, ema.length)
+            ema.count = len(series)
+            ema.total = float(series[:ema.length - 1].sum())
+            ema.value = float(values[-1]) if len(values) else np.nan
+
+        rsi = forward_fill(100.0 * up_avg / np.where(up_avg + down_avg > 0, up_avg + down_avg, np.nan))
+        macd = forward_fill(macd)
+        tail = slice(max(0, m - window), m)
+        state.rows.extend(np.column_stack([closes[tail], rsi[tail], macd[tail]]).tolist())
+        state.last_valid = [float(rsi[-1]), float(macd[-1])]
+        state.last_time = timestamps[m - 1]
+        state.last_close = float(closes[-1])
+        return state
+
+    def _row(self, rsi_state, macd_state, close, last_valid):
+        rsi = rsi_state.update(close)
+        macd = macd_state.update(close)[0]
+        # Interior gaps are forward filled, like df.ffill()
+        rsi = last_valid[0] if np.isnan(rsi) else rsi
+        macd = last_valid[1] if np.isnan(macd) else macd
+        return [close, rsi, macd]
+
+    def commit(self, close, timestamp):
+        row = self._row(self.rsi, self.macd, close, self.last_valid)
+        self.last_valid = row[1:]
+        self.rows.append(row)
+        self.last_time = timestamp
+        self.last_close = close
+
+    def preview(self, close):
+        """Feature window ending with an uncommitted bar; leading warm-up gaps are back filled"""
+        row = self._row(self.rsi.copy(), self.macd.copy(), close, self.last_valid)
+        window = np.array(list(self.rows)[1:] + [row] if len(self.rows) == self.rows.maxlen else list(self.rows) + [row])
+        window[:, 1:] = fill_gaps(window[:, 1:].T).T
+        return window
+
+    def rollout_state(self, close, last_row):
+        """
+        IndicatorRollout state after the uncommitted bar `close`; `last_row` is the last
+        row of the matching preview() window and seeds the forward filled RSI/MACD values.
+        """
+        rsi, macd = self.rsi.copy(), self.macd.copy()
+        rsi.update(close)
+        macd.update(close)
+        return (close, rsi.up, rsi.down, macd.fast.value, macd.slow.value, last_row[1], last_row[2])
+
+
+class IndicatorRollout:
+    """
+    Vectorized streaming RSI/MACD for B series at once. Used to roll feature windows
+    forward over predicted closes: every step is a handful of [B] array operations
+    instead of recomputing the indicators over the whole window.
+    """
+
+    def __init__(self, states, rsi_length=RSI_LENGTH, fast=MACD_FAST, slow=MACD_SLOW):
+        states = np.asarray(states, dtype=np.float64).reshape(-1, 7)
+        (self.prev_close, self.up, self.down, self.fast, self.slow,
+         self.rsi, self.macd) = (col.copy() for col in states.T)
+        self.rsi_alpha = 1.0 / rsi_length
+        self.fast_alpha = 2.0 / (fast + 1)
+        self.slow_alpha = 2.0 / (slow + 1)
+
+    def step(self, close):
+        """Advance every series by one close; returns the new ([B] rsi, [B] macd)"""
+        close = np.asarray(close, dtype=np.float64)
+        delta = close - self.prev_close
+        gain, loss = np.maximum(delta, 0.0), np.maximum(-delta, 0.0)
+        unseeded = np.isnan(self.up)
+        self.up = np.where(unseeded, gain, self.up + self.rsi_alpha * (gain - self.up))
+        self.down = np.where(unseeded, loss, self.down + self.rsi_alpha * (loss - self.down))
+        self.prev_close = close
+
+        self.fast = self.fast + self.fast_alpha * (close - self.fast)
+        self.slow = self.slow + self.slow_alpha * (close - self.slow)
+
+        # Undefined values are forward filled, like the streaming and batch paths
+        total = self.up + self.down
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rsi = 100.0 * self.up / total
+        self.rsi = np.where(total > 0, rsi, self.rsi)
+        macd = self.fast - self.slow
+        self.macd = np.where(np.isnan(macd), self.macd, macd)
+        return self.rsi.copy(), self.macd.copy()
+
+
+def rollout_state_from_closes(closes, window=60):
+    """(feature window, IndicatorRollout state) computed from a bare close series"""
+    closes = np.asarray(closes, dtype=np.float64)
+    state = IndicatorState.from_history(closes, np.arange(len(closes)), window)
+    features = state.preview(float(closes[-1]))
+    return features, state.rollout_state(float(closes[-1]), features[-1])
+
+
+class IndicatorEngine:
+    """
+    Per-ticker IndicatorState cache. `features()` feeds only bars newer than what the state
+    has already seen, so repeated requests cost O(new bars) instead of a full recompute.
+    """
+
+    def __init__(self, window=60, max_tickers=5000):
+        self.window = window
+        self.max_tickers = max_tickers
+        self.states = {}
+        self._lock = threading.Lock()
+
+    def features(self, key, closes, timestamps, with_state=False):
+        """
+        Return the latest [window, 3] feature rows for `key` given its full close history,
+        plus its IndicatorRollout state when `with_state` is set.
+        """
+        closes = np.asarray(closes, dtype=np.float64)
+        timestamps = np.asarray(timestamps)
+        with self._lock:
+            state = self.states.get(key)
+            start = self._resume_index(state, closes, timestamps)
+            if start is None:
+                # Unknown ticker or revised history: rebuild with the vectorized path
+                state = IndicatorState.from_history(closes, timestamps, self.window)
+                start = len(closes) - 1
+            for i in range(start, len(closes) - 1):
+                state.commit(float(closes[i]), timestamps[i])
+            if len(self.states) >= self.max_tickers and key not in self.states:
+                self.states.pop(next(iter(self.states)))
+            self.states[key] = state
+            window = state.preview(float(closes[-1]))
+            if with_state:
+                return window, state.rollout_state(float(closes[-1]), window[-1])
+            return window
+
+    @staticmethod
+    def _resume_index(state, closes, timestamps):
+        """Index of the first uncommitted bar, or None when the history no longer lines up"""
+        if state is None or state.last_time is None:
+            return None
+        pos = np.searchsorted(timestamps, state.last_time)
+        # The last bar is never committed, so the committed one must come before it
+        if pos >= len(timestamps) - 1 or timestamps[pos] != state.last_time or closes[pos] != state.last_close:
+            return None
+        return pos + 1
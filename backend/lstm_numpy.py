@@ -0,0 +1,241 @@
+import os
+import sys
+import json
+import zipfile
+import argparse
+import numpy as np
+
+# TensorFlow-free inference for the Sequential LSTM -> Dropout -> LSTM -> Dropout -> Dense
+# model built by data_and_train.py. Weights come from a `weights.npz` exported next to the
+# model file, or straight from the .keras archive (needs h5py, but not TensorFlow).
+# Dropout layers are kept as specs: identities for predictions, active for Monte Carlo sampling.
+
+WEIGHTS_FILE = 'weights.npz'
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'tanh': np.tanh,
+    'sigmoid': lambda x: 0.5 * (np.tanh(0.5 * x) + 1.0),  # overflow-free logistic
+    'hard_sigmoid': lambda x: np.clip(x / 6.0 + 0.5, 0.0, 1.0),
+    'relu': lambda x: np.maximum(x, 0.0),
+}
+
+
+def _activation(name):
+    if name not in ACTIVATIONS:
+        raise ValueError(f"Unsupported activation '{name}' for the NumPy engine")
+    return ACTIVATIONS[name]
+
+
+def weights_path(model_path):
+    """Location of the exported weights for a model file"""
+    return os.path.join(os.path.dirname(model_path), WEIGHTS_FILE)
+
+
+def layer_specs_from_keras(model):
+    """[(spec, arrays)] for every inference-relevant layer of a loaded Keras model"""
+    layers = []
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind == 'InputLayer':
+            continue
+        config = layer.get_config()
+        # A Dropout layer's only variable is its seed generator state, which is not a weight
+        arrays = [] if kind == 'Dropout' else [np.asarray(w, dtype=np.float32) for w in layer.get_weights()]
+        layers.append((_spec(kind, config), arrays))
+    return layers
+
+
+def _spec(kind, config):
+    if kind == 'Dropout':
+        return {'type': 'dropout', 'rate': float(config['rate'])}
+    if kind == 'LSTM':
+        return {'type': 'lstm', 'units': config['units'],
+                'activation': config.get('activation', 'tanh'),
+                'recurrent_activation': config.get('recurrent_activation', 'sigmoid'),
+                'return_sequences': bool(config.get('return_sequences', False))}
+    if kind == 'Dense':
+        return {'type': 'dense', 'units': config['units'], 'activation': config.get('activation', 'linear')}
+    raise ValueError(f"Unsupported layer '{kind}' for the NumPy engine")
+
+
+def export_weights(model, path):
+    """Write a loaded Keras model's weights and layer specs to an .npz file"""
+    layers = layer_specs_from_keras(model)
+    arrays = {}
+    for i, (_, weights) in enumerate(layers):
+        for j, w in enumerate(weights):
+            arrays[f"layer{i}_{j}"] = w
+    arrays['spec'] = np.array(json.dumps([spec for spec, _ in layers]))
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+    return path
+
+
+def _load_npz(path):
+    with np.load(path, allow_pickle=False) as data:
+        specs = json.loads(str(data['spec']))
+        layers = []
+        for i, spec in enumerate(specs):
+            count = sum(1 for k in data.files if k.startswith(f"layer{i}_"))
+            layers.append((spec, [data[f"layer{i}_{j}"] for j in range(count)]))
+    return layers
+
+
+def _load_keras_archive(path):
+    """Read layer configs and weights from a Keras 3 .keras zip (config.json + model.weights.h5)"""
+    try:
+        import h5py
+    except ImportError:
+        raise RuntimeError(f"{WEIGHTS_FILE} not found next to {path} and h5py is not installed; "
+                           f"run `python lstm_numpy.py --model {path} --export` once")
+    import io
+
+    with zipfile.ZipFile(path) as archive:
+        config = json.loads(archive.read('config.json'))
+        weights = io.BytesIO(archive.read('model.weights.h5'))
+
+    layers = []
+    with h5py.File(weights, 'r') as h5:
+        for layer in config['config']['layers']:
+            kind = layer['class_name']
+            if kind == 'InputLayer':
+                continue
+            if kind == 'Dropout':
+                layers.append((_spec(kind, layer['config']), []))
+                continue
+            name = layer['config']['name']
+            # LSTM variables live under layers/<name>/cell/vars, Dense under layers/<name>/vars;
+            # anything else (e.g. dropout seed generator state) is not a weight
+            group = h5['layers'][name]
+            group = group['cell'] if 'cell' in group else group
+            variables = group['vars']
+            weights = [np.asarray(variables[key][()], dtype=np.float32) for key in sorted(variables, key=int)]
+            layers.append((_spec(kind, layer['config']), weights))
+    return layers
+
+
+class NumpyLSTMModel:
+    """
+    Drop-in stand-in for the Keras model in predict.py: exposes predict_on_batch() and
+    predict() over [B, T, F] float inputs and returns [B, units] like Keras does.
+    sample_on_batch() is one Monte Carlo dropout pass (dropout active) per input row.
+    """
+
+    def __init__(self, layers, dtype=np.float32):
+        self.dtype = dtype
+        self.layers = []
+        for spec, weights in layers:
+            weights = [np.asarray(w, dtype=dtype) for w in weights]
+            if spec['type'] == 'lstm' and len(weights) != 3:
+                raise ValueError(f"LSTM layer expects kernel, recurrent_kernel and bias, got {len(weights)} arrays")
+            self.layers.append((spec, weights))
+        # weights.npz files exported before dropout specs were kept cannot be sampled
+        self.stochastic = any(spec['type'] == 'dropout' for spec, _ in self.layers)
+
+    @classmethod
+    def load(cls, model_path):
+        """Load from the exported weights.npz, else from the .keras archive itself"""
+        npz = weights_path(model_path)
+        if os.path.exists(npz):
+            return cls(_load_npz(npz))
+        return cls(_load_keras_archive(model_path))
+
+    def _lstm(self, x, spec, kernel, recurrent_kernel, bias):
+        act = _activation(spec['activation'])
+        recurrent_act = _activation(spec['recurrent_activation'])
+        batch, steps, _ = x.shape
+        units = spec['units']
+        # Input projections for every timestep in one matmul; only h @ U stays in the loop
+        projected = x @ kernel + bias
+        h = np.zeros((batch, units), dtype=self.dtype)
+        c = np.zeros((batch, units), dtype=self.dtype)
+        outputs = np.empty((batch, steps, units), dtype=self.dtype) if spec['return_sequences'] else None
+        for t in range(steps):
+            z = projected[:, t] + h @ recurrent_kernel
+            # Keras gate order: input, forget, cell candidate, output
+            i = recurrent_act(z[:, :units])
+            f = recurrent_act(z[:, units:2 * units])
+            g = act(z[:, 2 * units:3 * units])
+            o = recurrent_act(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * act(c)
+            if outputs is not None:
+                outputs[:, t] = h
+        return outputs if outputs is not None else h
+
+    def _forward(self, X, rng=None):
+        x = np.asarray(X, dtype=self.dtype)
+        for spec, weights in self.layers:
+            if spec['type'] == 'dropout':
+                if rng is not None and spec['rate'] > 0:
+                    # Inverted dropout with an independent mask per element, like keras.layers.Dropout
+                    keep = rng.random(x.shape, dtype=np.float32) >= spec['rate']
+                    x = x * keep / self.dtype(1.0 - spec['rate'])
+            elif spec['type'] == 'lstm':
+                x = self._lstm(x, spec, *weights)
+            else:
+                kernel, bias = weights
+                x = _activation(spec['activation'])(x @ kernel + bias)
+        return x
+
+    def predict_on_batch(self, X):
+        return self._forward(X)
+
+    def sample_on_batch(self, X, rng):
+        """One forward pass per row with dropout active, drawing masks from `rng`"""
+        if not self.stochastic:
+            raise ValueError(f"Model has no dropout layers in {WEIGHTS_FILE}; re-export it with "
+                             f"`python lstm_numpy.py --model <model.keras> --export`")
+        return self._forward(X, rng)
+
+    def predict(self, X, verbose=0, batch_size=1024):
+        """Same signature subset as keras.Model.predict"""
+        X = np.asarray(X, dtype=self.dtype)
+        if len(X) <= batch_size:
+            return self.predict_on_batch(X)
+        return np.concatenate([self.predict_on_batch(X[i:i + batch_size]) for i in range(0, len(X), batch_size)])
+
+
+def parity_report(model_path, samples=256, seed=0, tolerance=1e-4):
+    """Compare Keras and NumPy outputs on random [samples, T, F] windows in the training range"""
+    import tensorflow as tf
+
+    keras_model = tf.keras.models.load_model(model_path)
+    # Goes through the same loading path as the serving engine
+    numpy_model = NumpyLSTMModel.load(model_path)
+    _, steps, features = keras_model.input_shape
+    X = np.random.default_rng(seed).random((samples, steps, features), dtype=np.float32)
+    expected = np.asarray(keras_model.predict_on_batch(X))
+    actual = numpy_model.predict_on_batch(X)
+    diff = np.abs(expected - actual)
+    return {
+        'samples': samples,
+        'maxAbsDiff': float(diff.max()),
+        'meanAbsDiff': float(diff.mean()),
+        'tolerance': tolerance,
+        'ok': bool(diff.max() <= tolerance),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export weights for and verify the NumPy LSTM engine.')
+    parser.add_argument('--model', default=os.path.join(os.path.dirname(__file__), 'model', 'model.keras'))
+    parser.add_argument('--export', action='store_true', help=f'Write {WEIGHTS_FILE} next to the model (needs TensorFlow)')
+    parser.add_argument('--samples', type=int, default=256, help='Random windows compared against Keras')
+    parser.add_argument('--tolerance', type=float, default=1e-4)
+    args = parser.parse_args()
+
+    if args.export:
+        import tensorflow as tf
+        export_weights(tf.keras.models.load_model(args.model), weights_path(args.model))
+
+    report = parity_report(args.model, samples=args.samples, tolerance=args.tolerance)
+    print(json.dumps(report))
+    sys.exit(0 if report['ok'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+import os
+import random
+import asyncio
+import threading
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import timings
+
+# Daily bars from the Yahoo Finance chart API. The base URL can point at a local stand-in
+# (see market_stub_server.py) so the fetch path can be exercised without network access.
+BASE_URL = os.environ.get('MARKET_DATA_BASE_URL', 'https://query1.finance.yahoo.com')
+MAX_CONCURRENCY = int(os.environ.get('MARKET_DATA_CONCURRENCY', 8))  # simultaneous upstream requests
+REQUEST_TIMEOUT = 10  # seconds per HTTP request
+
+# Constants for retry mechanism
+MAX_RETRIES = 3
+RETRY_DELAY = 2  # base seconds between retries, doubled on every attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+HISTORY_DAYS = 400  # a cold fetch covers well over the 60 trading days the model needs
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36',
+    'Accept': 'application/json,text/plain,*/*',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Connection': 'keep-alive',
+}
+
+
+class FetchError(Exception):
+    """Upstream returned no usable data for a ticker (after retries when retryable)"""
+
+
+def parse_chart(payload):
+    """Convert a chart API response into a Date-indexed OHLCV DataFrame"""
+    chart = (payload or {}).get('chart') or {}
+    if chart.get('error'):
+        error = chart['error']
+        raise FetchError(error.get('description') if isinstance(error, dict) else str(error))
+    results = chart.get('result') or []
+    if not results:
+        raise FetchError("Chart response contained no result")
+
+    result = results[0]
+    timestamps = result.get('timestamp') or []
+    quote = ((result.get('indicators') or {}).get('quote') or [{}])[0]
+    # Daily bars are stamped at the session open; shift to exchange time and keep the date
+    offset = (result.get('meta') or {}).get('gmtoffset') or 0
+    index = pd.to_datetime(np.asarray(timestamps, dtype=np.int64) + offset, unit='s').normalize()
+    columns = {}
+    for name in ('open', 'high', 'low', 'close', 'volume'):
+        values = quote.get(name) or [None] * len(timestamps)
+        columns[name.capitalize()] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    return pd.DataFrame(columns, index=pd.DatetimeIndex(index, name='Date'))
+
+
+class MarketDataClient:
+    """
+    Asynchronous chart API client shared by all request threads of a predictor process.
+
+    - One pooled requests.Session keeps connections to upstream alive between requests.
+    - An asyncio.Semaphore bounds how many downloads run at once.
+    - 429/5xx responses and connection errors are retried with exponential backoff
+      (Retry-After is honored when present).
+    - Concurrent requests for the same (ticker, start) share a single download.
+
+    The event loop runs on a background thread; `history()` is the blocking entry point
+    used from predict.py's worker threads, `history_async()` the coroutine.
+    """
+
+    def __init__(self, base_url=BASE_URL, max_concurrency=MAX_CONCURRENCY, max_retries=MAX_RETRIES,
+                 retry_delay=RETRY_DELAY, timeout=REQUEST_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # requests is blocking, so the HTTP calls themselves run on this pool
+        self._http = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='market-data')
+        self._inflight = {}
+        self._loop = None
+        self._semaphore = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='market-data-loop', daemon=True).start()
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._loop = loop
+        return self._loop
+
+    def history(self, ticker, start=None, timeout=None):
+        """Blocking wrapper: daily bars for `ticker` from `start` (a date) or a full history"""
+        future = asyncio.run_coroutine_threadsafe(self.history_async(ticker, start), self._ensure_loop())
+        df = future.result(timeout)
+        # Reported to the calling request's timings (callers sharing a download see the same count)
+        timings.count('fetchAttempts', df.attrs.get('attempts', 1))
+        return df
+
+    async def history_async(self, ticker, start=None):
+        key = (ticker.upper(), start)
+        task = self._inflight.get(key)
+        if task is None:
+            # Single flight: later callers await the download already in progress
+            task = asyncio.ensure_future(self._download(key[0], start))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def history_many(self, tickers, start=None):
+        """{ticker: DataFrame or Exception} for several tickers fetched concurrently"""
+        results = await asyncio.gather(*(self.history_async(t, start) for t in tickers), return_exceptions=True)
+        return dict(zip(tickers, results))
+
+    async def _download(self, ticker, start):
+        now = datetime.now(timezone.utc)
+        if start is None:
+            start = (now - timedelta(days=HISTORY_DAYS)).date()
+        period1 = int(datetime.combine(start, datetime.min.time(), tzinfo=timezone.utc).timestamp())
+        params = {'period1': period1, 'period2': int(now.timestamp()), 'interval': '1d',
+                  'includePrePost': 'false', 'events': ''}
+        url = f"{self.base_url}/v8/finance/chart/{requests.utils.quote(ticker)}"
+
+        async with self._semaphore:
+            payload, attempts = await self._get_json(url, params)
+        df = parse_chart(payload)
+        df.attrs['attempts'] = attempts
+        return df
+
+    async def _get_json(self, url, params):
+        loop = asyncio.get_running_loop()
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await loop.run_in_executor(
+                    self._http, lambda: self.session.get(url, params=params, timeout=self.timeout))
+            except requests.RequestException as e:
+                last_error = f"{type(e).__name__}: {e}"
+                delay = None
+            else:
+                if response.status_code == 200:
+                    return response.json(), attempt + 1
+                if response.status_code == 404:
+                    raise FetchError("Ticker not found upstream (HTTP 404)")
+                last_error = f"HTTP {response.status_code}"
+                if response.status_code not in RETRY_STATUSES:
+                    raise FetchError(last_error)
+                delay = _retry_after(response)
+
+            if attempt < self.max_retries:
+                if delay is None:
+                    delay = self.retry_delay * (2 ** attempt) * (0.5 + random.random() / 2)
+                await asyncio.sleep(delay)
+        raise FetchError(f"Upstream failed after {self.max_retries + 1} attempts: {last_error}")
+
+    def close(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self._http.shutdown(wait=False)
+        self.session.close()
+
+
+def _retry_after(response):
+    value = response.headers.get('Retry-After')
+    try:
+        return min(float(value), 60.0) if value is not None else None
+    except ValueError:
+        return None
+
+
+# Shared instance used by predict.py
+default_client = MarketDataClient()
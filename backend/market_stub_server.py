@@ -0,0 +1,109 @@
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+import numpy as np
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Local stand-in for the Yahoo Finance chart API used by market_data.py. Serves a
+# deterministic random walk per ticker and can inject latency and rate limiting, e.g.:
+#
+#   python market_stub_server.py --port 8765 --latency-ms 200 --rate-limit 0.2
+#   MARKET_DATA_BASE_URL=http://127.0.0.1:8765 python predict.py --ticker NVDA --min 50 --max 200
+#
+# GET /stats returns how many chart requests each ticker received.
+
+DAY = 24 * 3600
+MARKET_OPEN_UTC = 13 * 3600 + 30 * 60  # 09:30 New York (EDT)
+
+
+def chart_payload(ticker, period1, period2):
+    """Chart API JSON with one bar per weekday in [period1, period2]"""
+    rng = np.random.default_rng(zlib.crc32(ticker.encode()))
+    first_day = period1 // DAY
+    days = np.arange(first_day, period2 // DAY + 1)
+    # The walk starts at a fixed epoch so overlapping requests return identical bars
+    epoch = 18000  # 2019-04-13
+    steps = rng.normal(0, 0.015, max(0, days[-1] - epoch + 1) if len(days) else 0)
+    prices = 100.0 * np.exp(np.cumsum(steps))
+    weekdays = days[(days + 3) % 7 < 5]  # 1970-01-01 was a Thursday
+    weekdays = weekdays[weekdays >= epoch]
+    close = prices[weekdays - epoch]
+    return {'chart': {'result': [{
+        'meta': {'symbol': ticker, 'currency': 'USD', 'gmtoffset': -4 * 3600,
+                 'exchangeTimezoneName': 'America/New_York'},
+        'timestamp': (weekdays * DAY + MARKET_OPEN_UTC).tolist(),
+        'indicators': {'quote': [{
+            'open': (close * 0.998).round(4).tolist(),
+            'high': (close * 1.01).round(4).tolist(),
+            'low': (close * 0.99).round(4).tolist(),
+            'close': close.round(4).tolist(),
+            'volume': [1_000_000] * len(close),
+        }]},
+    }], 'error': None}}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    rate_limit = 0.0
+    counts = {}
+    lock = threading.Lock()
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            with self.lock:
+                return self._send(200, dict(self.counts))
+        if not url.path.startswith('/v8/finance/chart/'):
+            return self._send(404, {'chart': {'result': None, 'error': {'code': 'Not Found'}}})
+
+        ticker = url.path.rsplit('/', 1)[-1].upper()
+        with self.lock:
+            self.counts[ticker] = self.counts.get(ticker, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+        if random.random() < self.rate_limit:
+            return self._send(429, {'error': 'Too Many Requests'}, {'Retry-After': '0.1'})
+        if ticker.startswith('UNKNOWN'):
+            return self._send(404, {'chart': {'result': None, 'error': {'code': 'Not Found',
+                                                                          'description': 'No data found, symbol may be delisted'}}})
+
+        query = parse_qs(url.query)
+        now = int(time.time())
+        period1 = int(query.get('period1', [now - 365 * DAY])[0])
+        period2 = int(query.get('period2', [now])[0])
+        self._send(200, chart_payload(ticker, period1, period2))
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the chart API.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Delay added to every chart request')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='Fraction of requests answered with HTTP 429')
+    args = parser.parse_args()
+
+    StubHandler.latency = args.latency_ms / 1000.0
+    StubHandler.rate_limit = args.rate_limit
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), StubHandler)
+    print(f"Chart API stub listening on http://127.0.0.1:{args.port}", flush=True)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
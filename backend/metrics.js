@@ -0,0 +1,196 @@
+// Minimal Prometheus text-format metrics (counters, gauges, histograms) for GET /metrics.
+// Stage timings reported by the predictor workers are folded in here by model.js.
+
+const DEFAULT_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30];
+
+function labelKey(labels) {
+  return JSON.stringify(Object.keys(labels).sort().map(k => [k, String(labels[k])]));
+}
+
+function formatLabels(pairs, extra) {
+  const all = extra ? [...pairs, extra] : pairs;
+  if (all.length === 0) return '';
+  const escape = v => v.replace(/\\/g, '\\\\').replace(/"/g, '\\"').replace(/\n/g, '\\n');
+  return `{${all.map(([k, v]) => `${k}="${escape(v)}"`).join(',')}}`;
+}
+
+class Metric {
+  constructor(name, help, type) {
+    this.name = name;
+    this.help = help;
+    this.type = type;
+    this.series = new Map(); // labelKey -> { pairs, value }
+  }
+
+  get(labels) {
+    const key = labelKey(labels);
+    let entry = this.series.get(key);
+    if (!entry) {
+      entry = { pairs: JSON.parse(key), value: this.initial() };
+      this.series.set(key, entry);
+    }
+    return entry;
+  }
+
+  initial() {
+    return 0;
+  }
+
+  render() {
+    const lines = [`# HELP ${this.name} ${this.help}`, `# TYPE ${this.name} ${this.type}`];
+    for (const { pairs, value } of this.series.values()) {
+      lines.push(`${this.name}${formatLabels(pairs)} ${value}`);
+    }
+    return lines.join('\n');
+  }
+}
+
+class Counter extends Metric {
+  constructor(name, help) {
+    super(name, help, 'counter');
+  }
+
+  inc(labels = {}, value = 1) {
+    this.get(labels).value += value;
+  }
+}
+
+class Gauge extends Metric {
+  constructor(name, help, collect = null) {
+    super(name, help, 'gauge');
+    this.collect = collect; // optional () => [[labels, value], ...] evaluated at scrape time
+  }
+
+  set(labels, value) {
+    this.get(labels).value = value;
+  }
+
+  render() {
+    if (this.collect) {
+      this.series.clear();
+      for (const [labels, value] of this.collect()) this.set(labels, value);
+    }
+    return super.render();
+  }
+}
+
+class Histogram extends Metric {
+  constructor(name, help, buckets = DEFAULT_BUCKETS) {
+    super(name, help, 'histogram');
+    this.buckets = buckets;
+  }
+
+  initial() {
+    return { counts: new Array(this.buckets.length).fill(0), sum: 0, count: 0 };
+  }
+
+  observe(labels, seconds) {
+    const value = this.get(labels).value;
+    for (let i = 0; i < this.buckets.length; i++) {
+      if (seconds <= this.buckets[i]) value.counts[i] += 1;
+    }
+    value.sum += seconds;
+    value.count += 1;
+  }
+
+  render() {
+    const lines = [`# HELP ${this.name} ${this.help}`, `# TYPE ${this.name} histogram`];
+    for (const { pairs, value } of this.series.values()) {
+      this.buckets.forEach((bound, i) => {
+        lines.push(`${this.name}_bucket${formatLabels(pairs, ['le', String(bound)])} ${value.counts[i]}`);
+      });
+      lines.push(`${this.name}_bucket${formatLabels(pairs, ['le', '+Inf'])} ${value.count}`);
+      lines.push(`${this.name}_sum${formatLabels(pairs)} ${value.sum}`);
+      lines.push(`${this.name}_count${formatLabels(pairs)} ${value.count}`);
+    }
+    return lines.join('\n');
+  }
+}
+
+const registry = [];
+
+function register(metric) {
+  registry.push(metric);
+  return metric;
+}
+
+const httpDuration = register(new Histogram(
+  'predict_http_request_duration_seconds', 'Latency of prediction API requests.'));
+const stageDuration = register(new Histogram(
+  'predict_stage_duration_seconds', 'Time spent per prediction stage inside the Python workers.'));
+const resultCache = register(new Counter(
+  'predict_result_cache_total', 'Ticker predictions answered from the result cache (hit) or computed (miss).'));
+const fetchAttempts = register(new Counter(
+  'predict_fetch_attempts_total', 'Upstream market data HTTP attempts, including retries.'));
+const workerErrors = register(new Counter(
+  'predict_errors_total', 'Failed predictions by error code.'));
+const modelAnswers = register(new Counter(
+  'predict_model_total', 'Predictions by the model that answered: lstm, ensemble or baseline (overload fallback).'));
+const queueWait = register(new Histogram(
+  'predict_queue_wait_seconds', 'Time requests waited in the pool queue before reaching a worker, by lane.'));
+const shed = register(new Counter(
+  'predict_shed_total', 'Requests rejected by admission control, by lane and reason (queue_full, deadline).'));
+const workerStartup = register(new Gauge(
+  'predict_worker_startup_seconds', 'Import and model load time of the most recent start of each worker.'));
+
+// Stage timings ({stage: ms, total: ms, counts: {...}}) from one worker response
+function recordTimings(timings) {
+  if (!timings || typeof timings !== 'object') return;
+  for (const [stage, ms] of Object.entries(timings)) {
+    if (typeof ms === 'number') stageDuration.observe({ stage }, ms / 1000);
+  }
+  const counts = timings.counts || {};
+  if (counts.fetchAttempts) fetchAttempts.inc({}, counts.fetchAttempts);
+}
+
+// `cache` is the per-prediction cache field ({hit, source}) or null when caching is off
+function recordCache(cache) {
+  if (!cache || typeof cache !== 'object') return;
+  resultCache.inc(cache.hit ? { result: 'hit', source: cache.source || 'memory' } : { result: 'miss', source: 'none' });
+}
+
+// `model` is set by workers serving a version with blended baselines; plain LSTM otherwise
+function recordModel(result) {
+  if (!result || typeof result !== 'object') return;
+  modelAnswers.inc({ model: result.model || 'lstm' });
+}
+
+function recordQueueWait(lane, ms) {
+  queueWait.observe({ lane }, ms / 1000);
+}
+
+function recordShed(lane, reason) {
+  shed.inc({ lane, reason });
+}
+
+function recordError(message) {
+  const code = typeof message === 'string' && message.includes(':') ? message.split(':')[0] : 'ERROR_UNKNOWN';
+  workerErrors.inc({ code });
+}
+
+function recordWorkerStartup(worker, timings) {
+  if (!timings) return;
+  for (const [stage, ms] of Object.entries(timings)) {
+    if (typeof ms === 'number') workerStartup.set({ worker, stage }, ms / 1000);
+  }
+}
+
+// Express middleware timing every request that reaches the router
+function httpMetrics(req, res, next) {
+  const start = process.hrtime.bigint();
+  res.on('finish', () => {
+    const route = req.route ? req.route.path : 'unmatched';
+    const seconds = Number(process.hrtime.bigint() - start) / 1e9;
+    httpDuration.observe({ route, method: req.method, status: res.statusCode }, seconds);
+  });
+  next();
+}
+
+function render() {
+  return registry.map(metric => metric.render()).join('\n') + '\n';
+}
+
+module.exports = {
+  Counter, Gauge, Histogram, register, render, httpMetrics,
+  recordTimings, recordCache, recordModel, recordQueueWait, recordShed, recordError, recordWorkerStartup,
+};
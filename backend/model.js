@@ -1,21 +1,112 @@
 const path = require('path');
 const fs = require('fs');
-const { spawn } = require('child_process');
-const { promisify } = require('util');
+const { PredictorPool, LANES } = require('./predictor_pool');
+const metrics = require('./metrics');
 
 let modelReady = false;
-const SUBPROCESS_TIMEOUT = 60000; // 60 seconds timeout
+let pool = null;
+const SUBPROCESS_TIMEOUT = Number(process.env.PREDICT_TIMEOUT_MS) || 60000; // default and longest deadline per prediction
+const BATCH_TIMEOUT = Number(process.env.PREDICT_BATCH_TIMEOUT_MS) || 300000; // batch requests fetch many histories
+const MAX_BATCH_ITEMS = 1000;
+const MAX_PORTFOLIO_ASSETS = Number(process.env.PREDICT_MAX_PORTFOLIO_ASSETS) || 5000;
+const PORTFOLIO_METHODS = ['mean-variance', 'risk-parity'];
+const MAX_HORIZON = 60; // longest recursive forecast path
+const MAX_MC_SAMPLES = 256; // Monte Carlo dropout passes per prediction, matches predict.py
+const POOL_SIZE = Number(process.env.PREDICT_WORKERS) || 2;
+const MAX_IN_FLIGHT = Number(process.env.PREDICT_MAX_IN_FLIGHT) || 32; // pipelined requests per worker
+const BATCH_WAIT_MS = Number(process.env.PREDICT_BATCH_WAIT_MS) || 5; // micro-batching window inside a worker
+const MAX_BATCH = Number(process.env.PREDICT_MAX_BATCH) || 64;
+const ENGINE = process.env.PREDICT_ENGINE || 'keras'; // 'numpy' skips the TensorFlow import in workers
+const TRANSPORT = process.env.PREDICT_TRANSPORT || 'binary'; // worker wire format: 'binary' frames or 'json' lines
+// Admission control: requests waiting for a worker slot per priority lane before new ones are rejected
+const MAX_QUEUE = Number(process.env.PREDICT_MAX_QUEUE) || 256;
+const MAX_BATCH_QUEUE = Number(process.env.PREDICT_MAX_BATCH_QUEUE) || 16;
+// Worker slots batch requests may hold at once; the rest stay free for interactive requests
+const BATCH_CONCURRENCY = Number(process.env.PREDICT_BATCH_CONCURRENCY) || Math.max(1, Math.floor(POOL_SIZE * MAX_IN_FLIGHT / 4));
 
-// Fixed MinMaxScaler parameters based on training configuration
+// Fallback MinMaxScaler parameters for models trained before scaler.json existed
 const SCALER_MIN = 50.694803;
 const SCALER_MAX = 199.957651;
 
+function modelPath() {
+  return path.join(__dirname, 'model', 'model.keras');
+}
+
+// Versioned models published by data_and_train.py; workers hot-reload new versions
+function registryDir() {
+  return process.env.MODEL_REGISTRY_DIR || path.join(__dirname, 'model', 'registry');
+}
+
+function hasRegistryModel() {
+  return fs.existsSync(path.join(registryDir(), 'default', 'CURRENT'));
+}
+
+// Close-price scaler written by data_and_train.py next to model.keras
+function loadScalerParams() {
+  const scalerPath = path.join(__dirname, 'model', 'scaler.json');
+  try {
+    const params = JSON.parse(fs.readFileSync(scalerPath, 'utf-8'));
+    if (typeof params.close_min === 'number' && typeof params.close_max === 'number') {
+      return { min: params.close_min, max: params.close_max };
+    }
+    console.warn(`Ignoring ${scalerPath}: close_min/close_max missing`);
+  } catch (e) {
+    if (e.code !== 'ENOENT') console.warn(`Failed to read ${scalerPath}: ${e.message}`);
+  }
+  return { min: SCALER_MIN, max: SCALER_MAX };
+}
+
+// Lazily start the persistent predict.py workers; they load the model once
+function getPool() {
+  if (pool) return pool;
+
+  const pythonExe = process.env.PYTHON_EXE || path.join(__dirname, '..', 'stock-env', 'Scripts', 'python.exe');
+  const scriptPath = path.join(__dirname, 'predict.py');
+
+  if (!fs.existsSync(pythonExe)) {
+    throw new Error('ERROR_ENVIRONMENT: Python executable not found.');
+  }
+  if (!fs.existsSync(scriptPath)) {
+    throw new Error('ERROR_ENVIRONMENT: Prediction script not found.');
+  }
+
+  const scaler = loadScalerParams();
+  pool = new PredictorPool({
+    size: POOL_SIZE,
+    maxInFlight: MAX_IN_FLIGHT,
+    requestTimeout: SUBPROCESS_TIMEOUT,
+    maxQueue: { interactive: MAX_QUEUE, batch: MAX_BATCH_QUEUE },
+    batchConcurrency: BATCH_CONCURRENCY,
+    transport: TRANSPORT,
+    pythonExe,
+    args: [
+      scriptPath,
+      '--model', modelPath(),
+      '--registry', registryDir(),
+      '--min', String(scaler.min),
+      '--max', String(scaler.max),
+      '--batch-wait-ms', String(BATCH_WAIT_MS),
+      '--max-batch', String(MAX_BATCH),
+      '--fetch-workers', String(MAX_IN_FLIGHT),
+      '--engine', ENGINE,
+    ],
+    // The ready line carries the worker's import and model load timings
+    onReady: (worker, parsed) => metrics.recordWorkerStartup(String(worker.index), parsed.timings),
+    onDispatch: (lane, waitedMs) => metrics.recordQueueWait(lane, waitedMs),
+    onShed: (lane, reason) => metrics.recordShed(lane, reason),
+  });
+  pool.start();
+  return pool;
+}
+
 async function loadModel() {
   if (modelReady) return true;
-  const kerasModelPath = path.join(__dirname, 'model', 'model.keras');
-  if (!fs.existsSync(kerasModelPath)) {
-    throw new Error(`Keras model not found at ${kerasModelPath}. Please run data_and_train.py to generate it.`);
+  const kerasModelPath = modelPath();
+  if (!hasRegistryModel() && !fs.existsSync(kerasModelPath)) {
+    throw new Error(`No model in ${registryDir()} and no Keras model at ${kerasModelPath}. Please run data_and_train.py to generate it.`);
   }
+  // Warm the worker pool so the first request does not pay the Python cold start
+  getPool();
   modelReady = true;
   return true;
 }
@@ -24,12 +115,91 @@ function isModelLoaded() {
   return modelReady;
 }
 
-async function predictStockPrice(inputData, ticker) {
+// Pool occupancy, read at scrape time
+metrics.register(new metrics.Gauge('predict_pool_requests', 'Prediction requests in flight on workers or queued in the pool.', () => {
+  if (!pool) return [];
+  return [[{ state: 'in_flight' }, pool.inFlight()], [{ state: 'queued' }, pool.queued()]];
+}));
+metrics.register(new metrics.Gauge('predict_queue_depth', 'Requests waiting for a worker slot, by priority lane.', () => (
+  pool ? LANES.map(lane => [{ lane }, pool.queued(lane)]) : []
+)));
+metrics.register(new metrics.Gauge('predict_workers_ready', 'Predictor workers ready to accept requests.', () => (
+  pool ? [[{}, pool.workers.filter(worker => worker.ready).length]] : []
+)));
+
+function shutdown() {
+  if (pool) pool.close();
+  pool = null;
+  modelReady = false;
+}
+
+// Throw a formatted error when a worker response carries an error payload
+function checkWorkerResponse(parsed) {
+  // Validate response structure
+  if (!parsed || typeof parsed !== 'object') {
+    throw new Error('ERROR_INVALID_RESPONSE: Invalid response format');
+  }
+
+  if (parsed.error || parsed.error_code) {
+    // New structured critical Python crash reporting
+    if (parsed.error_code === '500_CRITICAL_PYTHON_CRASH') {
+      const err = new Error(`500_CRITICAL_PYTHON_CRASH: ${parsed.message || 'Python process crashed.'}`);
+      // Attach traceback and raw message for upstream handlers
+      err.pythonTraceback = parsed.traceback || null;
+      err.pythonMessage = parsed.message || null;
+      throw err;
+    }
+
+    // Backwards-compatibility: older scripts might use error/ details
+    if (parsed.error === '500_PYTHON_CRASH' && parsed.details) {
+      const err = new Error(`500_PYTHON_CRASH: ${parsed.details}`);
+      err.pythonDetails = parsed.details;
+      throw err;
+    }
+
+    if (typeof parsed.error === 'string' && parsed.error.startsWith('ERROR_')) {
+      throw new Error(parsed.error);
+    }
+    throw new Error(`ERROR_PREDICTION: ${typeof parsed.error === 'string' ? parsed.error : JSON.stringify(parsed.error)}`);
+  }
+}
+
+function checkHorizon(horizon) {
+  if (horizon === undefined || horizon === null) return 1;
+  if (!Number.isInteger(horizon) || horizon < 1 || horizon > MAX_HORIZON) {
+    throw new Error(`ERROR_INVALID_INPUT: horizon must be an integer between 1 and ${MAX_HORIZON}.`);
+  }
+  return horizon;
+}
+
+// true (worker default sample count), false/absent, or a Monte Carlo dropout sample count
+function checkUncertainty(uncertainty) {
+  if (uncertainty === undefined || uncertainty === null || uncertainty === false) return undefined;
+  if (uncertainty === true) return true;
+  if (!Number.isInteger(uncertainty) || uncertainty < 2 || uncertainty > MAX_MC_SAMPLES) {
+    throw new Error(`ERROR_INVALID_INPUT: uncertainty must be true or an integer between 2 and ${MAX_MC_SAMPLES}.`);
+  }
+  return uncertainty;
+}
+
+// Optional caller deadline in ms; it can shorten the default budget but not extend it
+function checkDeadline(deadlineMs, limit) {
+  if (deadlineMs === undefined || deadlineMs === null) return limit;
+  if (typeof deadlineMs !== 'number' || !Number.isFinite(deadlineMs) || deadlineMs <= 0) {
+    throw new Error('ERROR_INVALID_INPUT: deadlineMs must be a positive number of milliseconds.');
+  }
+  return Math.min(deadlineMs, limit);
+}
+
+async function predictStockPrice(inputData, ticker, { horizon, uncertainty, deadlineMs } = {}) {
   try {
     // Input validation
     if (!modelReady) {
       throw new Error('ERROR_MODEL_NOT_READY: Model not loaded. Call loadModel() first.');
     }
+    horizon = checkHorizon(horizon);
+    uncertainty = checkUncertainty(uncertainty);
+    const timeout = checkDeadline(deadlineMs, SUBPROCESS_TIMEOUT);
 
     if (inputData) {
       if (!Array.isArray(inputData)) {
@@ -45,126 +215,139 @@ async function predictStockPrice(inputData, ticker) {
       throw new Error('ERROR_INVALID_INPUT: Either inputData or ticker must be provided.');
     }
 
-    // Prepare Python process execution
-    const pythonExe = path.join(__dirname, '..', 'stock-env', 'Scripts', 'python.exe');
-    const scriptPath = path.join(__dirname, 'predict.py');
-    
-    if (!fs.existsSync(pythonExe)) {
-      throw new Error('ERROR_ENVIRONMENT: Python executable not found.');
+    // Hand the request to a resident predictor worker
+    const parsed = await getPool().request({ ...(ticker ? { ticker } : { data: inputData }), horizon, uncertainty },
+      { timeout, lane: 'interactive' });
+    metrics.recordTimings(parsed.timings);
+    metrics.recordCache(parsed.cache);
+
+    checkWorkerResponse(parsed);
+
+    if (typeof parsed.predicted !== 'number' || isNaN(parsed.predicted)) {
+      throw new Error('ERROR_INVALID_RESPONSE: Prediction value is missing or invalid');
+    }
+    metrics.recordModel(parsed);
+
+    return parsed;
+  } catch (error) {
+    // Ensure all errors are properly formatted
+    if (!error.message.startsWith('ERROR_')) {
+      error.message = `ERROR_UNEXPECTED: ${error.message}`;
     }
-    if (!fs.existsSync(scriptPath)) {
-      throw new Error('ERROR_ENVIRONMENT: Prediction script not found.');
+    metrics.recordError(error.message);
+    throw error;
+  }
+}
+
+// items: array of ticker strings or 60-point price/feature arrays.
+// Resolves with per-item results; failed items carry an `error` instead of `predicted`.
+async function predictBatch(items, { includeSeries = false, horizon, uncertainty, deadlineMs } = {}) {
+  try {
+    if (!modelReady) {
+      throw new Error('ERROR_MODEL_NOT_READY: Model not loaded. Call loadModel() first.');
+    }
+    if (!Array.isArray(items) || items.length === 0) {
+      throw new Error('ERROR_INVALID_INPUT: items must be a non-empty array of tickers or price series.');
+    }
+    if (items.length > MAX_BATCH_ITEMS) {
+      throw new Error(`ERROR_INVALID_INPUT: At most ${MAX_BATCH_ITEMS} items are allowed per batch.`);
     }
 
-    const args = [
-      scriptPath,
-      '--model', path.join(__dirname, 'model', 'model.keras'),
-      '--min', String(SCALER_MIN),
-      '--max', String(SCALER_MAX),
-    ];
-
-    if (ticker) {
-      args.push('--ticker', ticker);
-    } else {
-      args.push('--data', JSON.stringify(inputData));
-    }
-
-    // Execute Python script with proper error handling and timeout
-    const result = await new Promise((resolve, reject) => {
-      let stdoutData = '';
-      let stderrData = '';
-      const startTime = Date.now();
-      const timeoutId = setTimeout(() => {
-        const elapsed = ((Date.now() - startTime) / 1000).toFixed(1);
-        console.error(`Python script timeout after ${elapsed}s`);
-        pythonProcess.kill();
-        reject(new Error(`ERROR_TIMEOUT: Python script execution timed out after ${elapsed} seconds`));
-      }, SUBPROCESS_TIMEOUT);
-
-      const pythonProcess = spawn(pythonExe, args, { encoding: 'utf-8' });
-      console.log(`Python process started with PID: ${pythonProcess.pid}`);
-
-      pythonProcess.stdout.on('data', (data) => {
-        stdoutData += data.toString();
-      });
-
-      pythonProcess.stderr.on('data', (data) => {
-        stderrData += data.toString();
-      });
-
-      pythonProcess.on('close', (code) => {
-        clearTimeout(timeoutId);
-        if (code === 0) {
-          resolve({ stdout: stdoutData, stderr: stderrData });
-        } else {
-          reject(new Error(`ERROR_PYTHON_FAILURE: Process exited with code ${code}\n${stderrData}`));
-        }
-      });
-
-      pythonProcess.on('error', (err) => {
-        clearTimeout(timeoutId);
-        reject(new Error(`ERROR_PROCESS_SPAWN: Failed to start Python process: ${err.message}`));
-      });
-    });
-
-    // Process and validate the output
-    const cleanOutput = result.stdout
-      .split('\n')
-      .map(line => line.trim())
-      .filter(line => line)
-      .pop();
-
-    if (!cleanOutput) {
-      throw new Error('ERROR_EMPTY_OUTPUT: No valid output received from Python script');
-    }
-
-    let parsed;
-    try {
-      parsed = JSON.parse(cleanOutput);
-    } catch (e) {
-      throw new Error(`ERROR_PARSE_FAILURE: Failed to parse Python output: ${e.message}\nRaw output: ${cleanOutput}`);
-    }
-
-    // Validate response structure
-    if (!parsed || typeof parsed !== 'object') {
-      throw new Error('ERROR_INVALID_RESPONSE: Invalid response format');
-    }
-
-    if (parsed.error) {
-      // New structured critical Python crash reporting
-      if (parsed.error_code === '500_CRITICAL_PYTHON_CRASH') {
-        const err = new Error(`500_CRITICAL_PYTHON_CRASH: ${parsed.message || 'Python process crashed.'}`);
-        // Attach traceback and raw message for upstream handlers
-        err.pythonTraceback = parsed.traceback || null;
-        err.pythonMessage = parsed.message || null;
-        throw err;
-      }
+    horizon = checkHorizon(horizon);
+    uncertainty = checkUncertainty(uncertainty);
+    const timeout = checkDeadline(deadlineMs, BATCH_TIMEOUT);
 
-      // Backwards-compatibility: older scripts might use error/ details
-      if (parsed.error === '500_PYTHON_CRASH' && parsed.details) {
-        const err = new Error(`500_PYTHON_CRASH: ${parsed.details}`);
-        err.pythonDetails = parsed.details;
-        throw err;
-      }
+    const parsed = await getPool().request({ op: 'batch', items, includeSeries, horizon, uncertainty },
+      { timeout, lane: 'batch' });
+    metrics.recordTimings(parsed.timings);
+    checkWorkerResponse(parsed);
 
-      if (typeof parsed.error === 'string' && parsed.error.startsWith('ERROR_')) {
-        throw new Error(parsed.error);
+    if (!Array.isArray(parsed.results)) {
+      throw new Error('ERROR_INVALID_RESPONSE: Batch results are missing');
+    }
+    for (const item of parsed.results) {
+      if (item.error) metrics.recordError(item.error);
+      else {
+        metrics.recordCache(item.cache);
+        metrics.recordModel(item);
       }
-      throw new Error(`ERROR_PREDICTION: ${typeof parsed.error === 'string' ? parsed.error : JSON.stringify(parsed.error)}`);
     }
+    return parsed;
+  } catch (error) {
+    if (!error.message.startsWith('ERROR_')) {
+      error.message = `ERROR_UNEXPECTED: ${error.message}`;
+    }
+    metrics.recordError(error.message);
+    throw error;
+  }
+}
 
-    if (typeof parsed.predicted !== 'number' || isNaN(parsed.predicted)) {
-      throw new Error('ERROR_INVALID_RESPONSE: Prediction value is missing or invalid');
+function checkFraction(name, value) {
+  if (value === undefined || value === null) return undefined;
+  if (typeof value !== 'number' || !Number.isFinite(value) || value < 0 || value > 1) {
+    throw new Error(`ERROR_INVALID_INPUT: ${name} must be a number between 0 and 1.`);
+  }
+  return value;
+}
+
+// Predicts every ticker in the batch lane, then allocates over them in the worker (portfolio.py).
+// Resolves with weights, trades, risk and expected return; tickers that could not be used are in `failed`.
+async function allocatePortfolio(tickers, { method, horizon, uncertainty, riskAversion, maxWeight, current, band,
+                                            maxTurnover, lookback, deadlineMs } = {}) {
+  try {
+    if (!modelReady) {
+      throw new Error('ERROR_MODEL_NOT_READY: Model not loaded. Call loadModel() first.');
     }
+    if (!Array.isArray(tickers) || tickers.length === 0 || !tickers.every(t => typeof t === 'string' && t.trim())) {
+      throw new Error('ERROR_INVALID_INPUT: tickers must be a non-empty array of ticker symbols.');
+    }
+    if (tickers.length > MAX_PORTFOLIO_ASSETS) {
+      throw new Error(`ERROR_INVALID_INPUT: At most ${MAX_PORTFOLIO_ASSETS} tickers are allowed per portfolio.`);
+    }
+    if (method !== undefined && !PORTFOLIO_METHODS.includes(method)) {
+      throw new Error(`ERROR_INVALID_INPUT: method must be one of ${PORTFOLIO_METHODS.join(', ')}.`);
+    }
+    if (maxWeight !== undefined && (typeof maxWeight !== 'number' || !(maxWeight > 0 && maxWeight <= 1))) {
+      throw new Error('ERROR_INVALID_INPUT: maxWeight must be above 0 and at most 1.');
+    }
+    if (riskAversion !== undefined && (typeof riskAversion !== 'number' || !(riskAversion > 0))) {
+      throw new Error('ERROR_INVALID_INPUT: riskAversion must be a positive number.');
+    }
+    if (lookback !== undefined && (!Number.isInteger(lookback) || lookback < 30 || lookback > 2520)) {
+      throw new Error('ERROR_INVALID_INPUT: lookback must be an integer between 30 and 2520.');
+    }
+    if (current !== undefined && (typeof current !== 'object' || current === null || Array.isArray(current) ||
+        !Object.values(current).every(w => typeof w === 'number' && Number.isFinite(w) && w >= 0))) {
+      throw new Error('ERROR_INVALID_INPUT: current must map tickers to non-negative weights.');
+    }
+
+    horizon = checkHorizon(horizon);
+    uncertainty = checkUncertainty(uncertainty);
+    const timeout = checkDeadline(deadlineMs, BATCH_TIMEOUT);
+    const request = {
+      op: 'portfolio', tickers, method, horizon, uncertainty, riskAversion, lookback,
+      maxWeight,
+      band: checkFraction('band', band),
+      maxTurnover: checkFraction('maxTurnover', maxTurnover),
+      // Held weights by upper-case ticker, as the worker reports them
+      current: current && Object.fromEntries(Object.entries(current).map(([t, w]) => [t.trim().toUpperCase(), w])),
+    };
+
+    const parsed = await getPool().request(request, { timeout, lane: 'batch' });
+    metrics.recordTimings(parsed.timings);
+    checkWorkerResponse(parsed);
 
+    if (!parsed.weights || typeof parsed.weights !== 'object') {
+      throw new Error('ERROR_INVALID_RESPONSE: Portfolio weights are missing');
+    }
     return parsed;
   } catch (error) {
-    // Ensure all errors are properly formatted
     if (!error.message.startsWith('ERROR_')) {
       error.message = `ERROR_UNEXPECTED: ${error.message}`;
     }
+    metrics.recordError(error.message);
     throw error;
   }
 }
 
-module.exports = { loadModel, isModelLoaded, predictStockPrice, SCALER_MIN, SCALER_MAX };
\ No newline at end of file
+module.exports = { loadModel, isModelLoaded, predictStockPrice, predictBatch, allocatePortfolio, shutdown, SCALER_MIN, SCALER_MAX };
\ No newline at end of file
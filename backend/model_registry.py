@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from ensemble import load_ensemble
+
+# Versioned model store:
+#   <root>/<name>/<version>/{model.keras, scaler.json, feature_spec.json, metrics.json}
+#   <root>/<name>/<version>/{ensemble.json, gbt.pkl}   optional baselines blended with the model (ensemble.py)
+#   <root>/<name>/CURRENT        -> text file holding the active version
+# `name` is "default" for the universe model or a ticker symbol for a per-ticker model.
+REGISTRY_DIR = os.environ.get('MODEL_REGISTRY_DIR', os.path.join(os.path.dirname(__file__), 'model', 'registry'))
+DEFAULT_NAME = 'default'
+MODEL_FILE = 'model.keras'
+
+
+def _write_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def current_version(name=DEFAULT_NAME, root=REGISTRY_DIR):
+    """Active version id for `name`, or None when nothing was published"""
+    try:
+        with open(os.path.join(root, name, 'CURRENT')) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def version_dir(name, version, root=REGISTRY_DIR):
+    return os.path.join(root, name, version)
+
+
+def publish(save_model, name=DEFAULT_NAME, scaler=None, feature_spec=None, metrics=None, root=REGISTRY_DIR):
+    """
+    Write a new model version and make it current.
+
+    `save_model(path)` writes the model file (keeps this module free of TensorFlow). The
+    version is assembled in a temporary directory, renamed into place and only then
+    pointed to by CURRENT, so readers never observe a half-written version.
+    """
+    version = datetime.utcnow().strftime('%Y%m%dT%H%M%S') + '-' + uuid.uuid4().hex[:6]
+    name_dir = os.path.join(root, name)
+    staging = os.path.join(name_dir, f".{version}.tmp")
+    os.makedirs(staging)
+    try:
+        save_model(os.path.join(staging, MODEL_FILE))
+        _write_json(os.path.join(staging, 'scaler.json'), scaler or {})
+        _write_json(os.path.join(staging, 'feature_spec.json'), feature_spec or {})
+        _write_json(os.path.join(staging, 'metrics.json'), metrics or {})
+        final = os.path.join(name_dir, version)
+        os.rename(staging, final)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    set_current(name, version, root)
+    return final
+
+
+def set_current(name, version, root=REGISTRY_DIR):
+    """Atomically point `name` at an existing version (also used for rollbacks)"""
+    if not os.path.isdir(version_dir(name, version, root)):
+        raise FileNotFoundError(f"Model version {name}/{version} does not exist")
+    tmp = os.path.join(root, name, f"CURRENT.{os.getpid()}.tmp")
+    with open(tmp, 'w') as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(root, name, 'CURRENT'))
+
+
+class ModelHandle:
+    """A loaded model together with the scaler and metadata it was trained with"""
+
+    __slots__ = ('name', 'version', 'path', 'model', 'scaler_min', 'scaler_max', 'scaler', 'feature_spec', 'ensemble')
+
+    def __init__(self, name, version, path, model, scaler_min, scaler_max, scaler=None, feature_spec=None,
+                 ensemble=None):
+        self.name = name
+        self.version = version
+        self.path = path
+        self.model = model
+        self.scaler_min = scaler_min
+        self.scaler_max = scaler_max
+        self.scaler = scaler or {}
+        self.feature_spec = feature_spec or {}
+        self.ensemble = ensemble
+
+
+class ModelRegistry:
+    """
+    Serving-side view of the registry with hot reload.
+
+    `get(ticker)` returns the per-ticker model when one is published, else the default.
+    Every `poll_interval` seconds the CURRENT pointers are re-read; a changed version is
+    loaded on a background thread and swapped in when ready. Requests keep the handle
+    they started with, so in-flight work finishes on the old model.
+    When the registry holds no default model, `fallback_path` (the legacy
+    backend/model/model.keras) is served with `fallback_scaler`.
+    """
+
+    def __init__(self, loader, root=REGISTRY_DIR, fallback_path=None, fallback_scaler=None,
+                 poll_interval=2.0, max_models=32):
+        self.loader = loader
+        self.root = root
+        self.fallback_path = fallback_path
+        self.fallback_scaler = fallback_scaler
+        self.poll_interval = poll_interval
+        self.max_models = max_models
+        self.handles = OrderedDict()
+        self.available = set()
+        self.reloading = set()
+        self._last_poll = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self, name):
+        version = current_version(name, self.root)
+        if version is None:
+            if name != DEFAULT_NAME or not self.fallback_path:
+                raise FileNotFoundError(f"No published model for '{name}'")
+            return ModelHandle(name, 'legacy', self.fallback_path, self.loader(self.fallback_path),
+                               *self.fallback_scaler, ensemble=self._ensemble(os.path.dirname(self.fallback_path)))
+
+        path = version_dir(name, version, self.root)
+        scaler = _read_json(os.path.join(path, 'scaler.json')) or {}
+        if 'close_min' in scaler and 'close_max' in scaler:
+            scaler_min, scaler_max = float(scaler['close_min']), float(scaler['close_max'])
+        elif self.fallback_scaler:
+            scaler_min, scaler_max = self.fallback_scaler
+        else:
+            raise ValueError(f"Model {name}/{version} has no close_min/close_max in scaler.json")
+        model = self.loader(os.path.join(path, MODEL_FILE))
+        return ModelHandle(name, version, path, model, scaler_min, scaler_max,
+                           scaler, _read_json(os.path.join(path, 'feature_spec.json')), self._ensemble(path))
+
+    @staticmethod
+    def _ensemble(path):
+        try:
+            return load_ensemble(path)
+        except Exception as e:
+            # e.g. gbt.pkl without scikit-learn installed: the model still serves on its own
+            print(f"Ignoring the ensemble in {path}: {e}", file=sys.stderr)
+            return None
+
+    def _reload(self, name):
+        try:
+            handle = self._load(name)
+            with self._lock:
+                self.handles[name] = handle
+        except Exception:
+            # Keep serving the previous version; the next poll retries
+            pass
+        finally:
+            with self._lock:
+                self.reloading.discard(name)
+
+    def _poll(self):
+        now = time.monotonic()
+        if now - self._last_poll < self.poll_interval:
+            return
+        self._last_poll = now
+        try:
+            self.available = {n for n in os.listdir(self.root) if os.path.isfile(os.path.join(self.root, n, 'CURRENT'))}
+        except OSError:
+            self.available = set()
+        for name, handle in list(self.handles.items()):
+            version = current_version(name, self.root)
+            if version and version != handle.version and name not in self.reloading:
+                self.reloading.add(name)
+                threading.Thread(target=self._reload, args=(name,), daemon=True).start()
+
+    def get(self, ticker=None):
+        with self._lock:
+            self._poll()
+            name = ticker.upper() if ticker and ticker.upper() in self.available else DEFAULT_NAME
+            handle = self.handles.get(name)
+            if handle is not None:
+                self.handles.move_to_end(name)
+                return handle
+
+        # First use of this model: load synchronously outside the lock
+        handle = self._load(name)
+        with self._lock:
+            handle = self.handles.setdefault(name, handle)
+            self.handles.move_to_end(name)
+            while len(self.handles) > self.max_models:
+                oldest = next(iter(self.handles))
+                if oldest == DEFAULT_NAME:
+                    self.handles.move_to_end(oldest)
+                    continue
+                self.handles.popitem(last=False)
+        return handle
+
+    def has_model(self):
+        """True when a default model (registry or legacy) can be served"""
+        return current_version(DEFAULT_NAME, self.root) is not None or (
+            self.fallback_path is not None and os.path.exists(self.fallback_path))
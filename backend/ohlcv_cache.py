@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import shutil
+import threading
+import uuid
+import numpy as np
+import pandas as pd
+
+# Cache location and policy (overridable through the environment)
+CACHE_DIR = os.environ.get('OHLCV_CACHE_DIR', os.path.join(os.path.dirname(__file__), 'cache', 'ohlcv'))
+CACHE_TTL = float(os.environ.get('OHLCV_CACHE_TTL', 15 * 60))  # seconds before asking upstream for newer bars
+CACHE_MAX_STALE = float(os.environ.get('OHLCV_CACHE_MAX_STALE', 7 * 24 * 3600))  # oldest data served when upstream fails
+CACHE_MAX_BYTES = int(float(os.environ.get('OHLCV_CACHE_MAX_MB', 512)) * 1024 * 1024)
+EVICT_INTERVAL = 60  # seconds between size checks; scanning every entry on each write is wasteful
+
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def normalize_frame(df):
+    """Bring a yfinance/CSV frame into the cached layout: naive DatetimeIndex, OHLCV float columns"""
+    if df is None or len(df) == 0:
+        return pd.DataFrame(columns=COLUMNS, index=pd.DatetimeIndex([]), dtype=np.float64)
+    df = df.copy()
+    if isinstance(df.columns, pd.MultiIndex):
+        # yf.download returns (field, ticker) columns
+        df.columns = df.columns.get_level_values(0)
+    df.index = pd.DatetimeIndex(pd.to_datetime(df.index))
+    if df.index.tz is not None:
+        # Keep the exchange-local wall clock; daily bars only care about the date
+        df.index = df.index.tz_localize(None)
+    df = df.reindex(columns=COLUMNS).astype(np.float64)
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+    return df
+
+
+class OHLCVCache:
+    """
+    On-disk OHLCV cache keyed by ticker and interval.
+
+    Every entry is a directory with `dates.<gen>.npy` (int64 ns), `values.<gen>.npy`
+    (float64 [n, 5]) and `meta.json`, which names the current generation. Arrays are
+    opened memory-mapped; a store writes a new generation and then replaces meta.json, so
+    a mapped file is never overwritten (Windows refuses to replace mapped files) and
+    several predictor processes can share one cache directory. Stale entries are refreshed by
+    fetching only the bars after the last cached date; the least recently used entries
+    are evicted once the cache grows past `max_bytes`.
+    """
+
+    def __init__(self, root=CACHE_DIR, ttl=CACHE_TTL, max_stale=CACHE_MAX_STALE, max_bytes=CACHE_MAX_BYTES):
+        self.root = root
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._last_evict = 0.0
+
+    def _entry_dir(self, ticker, interval):
+        safe = ''.join(c if c.isalnum() or c in '-_.^=' else '_' for c in ticker.upper())
+        return os.path.join(self.root, f"{safe}_{interval}")
+
+    def _read_meta(self, entry):
+        try:
+            with open(os.path.join(entry, 'meta.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, entry, meta):
+        tmp = os.path.join(entry, f"meta.json.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(entry, 'meta.json'))
+
+    def load(self, ticker, interval='1d'):
+        """Return (DataFrame, meta) for a cached entry, or (None, None) when absent/corrupt"""
+        entry = self._entry_dir(ticker, interval)
+        meta = self._read_meta(entry)
+        if meta is None or 'generation' not in meta:
+            return None, None
+        # A generation removed after meta.json was read (a newer store) counts as a miss,
+        # and so does any disagreement between the two arrays
+        try:
+            dates = np.load(os.path.join(entry, f"dates.{meta['generation']}.npy"), mmap_mode='r')
+            values = np.load(os.path.join(entry, f"values.{meta['generation']}.npy"), mmap_mode='r')
+        except (OSError, ValueError):
+            return None, None
+        if values.ndim != 2 or values.shape != (len(dates), len(COLUMNS)):
+            return None, None
+        # copy=False keeps the frame backed by the memory map
+        df = pd.DataFrame(values, index=pd.DatetimeIndex(np.asarray(dates).astype('datetime64[ns]')), columns=COLUMNS,
+                          copy=False)
+        return df, meta
+
+    def store(self, ticker, interval, df, merge=True):
+        """Merge `df` into the cached entry (newer rows win) and return the merged frame"""
+        entry = self._entry_dir(ticker, interval)
+        with self._lock:
+            cached, _ = self.load(ticker, interval) if merge else (None, None)
+            merged = normalize_frame(df)
+            if cached is not None and len(cached) > 0:
+                merged = pd.concat([cached, merged])
+                merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+
+            os.makedirs(entry, exist_ok=True)
+            # Unique per store, so processes refreshing the same ticker never share a file
+            generation = uuid.uuid4().hex[:16]
+            suffix = f"{os.getpid()}.{threading.get_ident()}.tmp"
+            for name, arr in ((f"dates.{generation}.npy", merged.index.values.astype('datetime64[ns]').astype(np.int64)),
+                              (f"values.{generation}.npy", merged.to_numpy(dtype=np.float64))):
+                tmp = os.path.join(entry, f"{name}.{suffix}")
+                with open(tmp, 'wb') as f:
+                    np.save(f, arr)
+                os.replace(tmp, os.path.join(entry, name))
+
+            now = time.time()
+            self._write_meta(entry, {
+                'ticker': ticker.upper(),
+                'interval': interval,
+                'rows': int(len(merged)),
+                'generation': generation,
+                'fetched_at': now,
+                'last_access': now,
+            })
+            self._remove_old_generations(entry, generation)
+        if time.time() - self._last_evict > EVICT_INTERVAL:
+            self.evict()
+        return merged
+
+    def _remove_old_generations(self, entry, generation):
+        """Delete array files of other generations; files still mapped somewhere are retried next store"""
+        for name in os.listdir(entry):
+            if name.endswith('.npy') and name.split('.')[-2:-1] != [generation]:
+                try:
+                    os.remove(os.path.join(entry, name))
+                except OSError:
+                    pass
+
+    def touch(self, ticker, interval, meta):
+        # LRU bookkeeping only needs coarse timestamps; avoid a write on every hit
+        if time.time() - meta.get('last_access', 0) < EVICT_INTERVAL:
+            return
+        meta = dict(meta, last_access=time.time())
+        try:
+            self._write_meta(self._entry_dir(ticker, interval), meta)
+        except OSError:
+            pass
+
+    def get(self, ticker, interval, fetch_fn, min_rows=60):
+        """
+        Return cached bars for `ticker`, refreshing through `fetch_fn(start)` when stale.
+
+        `fetch_fn(None)` must return a full history; `fetch_fn(start)` only the bars from
+        `start` (a date) onwards. When upstream fails, cached data younger than
+        `max_stale` is served instead of raising.
+        """
+        cached, meta = self.load(ticker, interval)
+        if cached is None or len(cached) == 0:
+            return self.store(ticker, interval, fetch_fn(None))
+
+        age = time.time() - meta.get('fetched_at', 0)
+        if age < self.ttl and len(cached) >= min_rows:
+            self.touch(ticker, interval, meta)
+            return cached
+
+        try:
+            if len(cached) < min_rows:
+                newer = fetch_fn(None)
+            else:
+                # Re-request the last cached bar too: it may have been an incomplete session
+                newer = fetch_fn(cached.index[-1].date())
+        except Exception:
+            if age < self.max_stale:
+                self.touch(ticker, interval, meta)
+                return cached
+            raise
+        return self.store(ticker, interval, newer)
+
+    def entries(self):
+        """Yield (entry_dir, size_bytes, last_access) for every cached entry"""
+        if not os.path.isdir(self.root):
+            return
+        for name in os.listdir(self.root):
+            entry = os.path.join(self.root, name)
+            if not os.path.isdir(entry):
+                continue
+            meta = self._read_meta(entry) or {}
+            size = 0
+            for f in os.listdir(entry):
+                try:
+                    size += os.path.getsize(os.path.join(entry, f))
+                except OSError:
+                    pass
+            yield entry, size, meta.get('last_access', 0)
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        self._last_evict = time.time()
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        for entry, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+
+# Shared instance used by predict.py
+default_cache = OHLCVCache()
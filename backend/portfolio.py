@@ -0,0 +1,228 @@
+import numpy as np
+
+# Portfolio allocation over the predictions of a whole universe, in NumPy only:
+#
+#   expected returns   predicted close / last close - 1 over the forecast horizon
+#   covariance         daily log returns of the close histories on a shared calendar, shrunk
+#                      towards a scaled identity (Ledoit-Wolf), scaled to the horizon; Monte
+#                      Carlo prediction spreads, when given, are added to its diagonal
+#   allocation         long-only, fully invested: mean-variance with a per-asset cap, or
+#                      equal risk contributions (risk parity)
+#   rebalancing        trades below a no-trade band are skipped and turnover can be capped
+#
+# Every step is a handful of [T, N] / [N, N] array operations, so a 1,000+ asset universe
+# is allocated in well under a second.
+
+METHODS = ('mean-variance', 'risk-parity')
+LOOKBACK = 252  # daily returns used for the covariance
+RISK_AVERSION = 10.0
+MAX_WEIGHT = 0.1
+MIN_OBSERVATIONS = 20  # assets with fewer returns in the lookback are left out
+MAX_ITERATIONS = 1000
+TOLERANCE = 1e-7  # largest weight change between iterations at convergence
+
+
+def return_matrix(histories, lookback=LOOKBACK):
+    """
+    [T, N] daily log returns over the last `lookback` sessions of the union calendar of
+    `histories`, a list of (dates, closes) per asset. Returns of sessions an asset did not
+    trade are NaN.
+    """
+    calendar = np.unique(np.concatenate([np.asarray(dates)[-(lookback + 1):] for dates, _ in histories]))
+    calendar = calendar[-(lookback + 1):]
+    closes = np.full((len(calendar), len(histories)), np.nan)
+    for i, (dates, values) in enumerate(histories):
+        dates, values = np.asarray(dates), np.asarray(values, dtype=np.float64)
+        recent = dates >= calendar[0]
+        closes[np.searchsorted(calendar, dates[recent]), i] = values[recent]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.diff(np.log(closes), axis=0)
+
+
+def shrunk_covariance(returns):
+    """
+    Ledoit-Wolf covariance of [T, N] returns, shrunk towards a scaled identity so it stays
+    well conditioned when N exceeds T. Missing returns count as the asset's mean.
+    Returns (covariance, shrinkage intensity).
+    """
+    X = returns - np.nanmean(returns, axis=0)
+    X = np.where(np.isnan(X), 0.0, X)
+    T, N = X.shape
+    S = X.T @ X / T
+    mu = np.trace(S) / N
+    d2 = (np.sum(S * S) - 2 * mu * np.trace(S) + mu * mu * N) / N
+    b2 = (np.sum(np.sum(X * X, axis=1) ** 2) - T * np.sum(S * S)) / (N * T * T)
+    shrinkage = float(min(1.0, max(0.0, b2 / d2))) if d2 > 0 else 1.0
+    covariance = (1.0 - shrinkage) * S
+    covariance[np.diag_indices(N)] += shrinkage * mu
+    return covariance, shrinkage
+
+
+def project_capped_simplex(v, cap):
+    """Euclidean projection of [N] `v` onto {w : sum(w) = 1, 0 <= w <= cap}"""
+    # Bisect the shift tau in w = clip(v - tau, 0, cap) until the active set settles, then
+    # solve for tau exactly on it
+    lo, hi = v.min() - cap, v.max()
+    for _ in range(40):
+        tau = 0.5 * (lo + hi)
+        if np.clip(v - tau, 0.0, cap).sum() > 1.0:
+            lo = tau
+        else:
+            hi = tau
+    shifted = v - 0.5 * (lo + hi)
+    free = (shifted > 0.0) & (shifted < cap)
+    if free.any():
+        capped = np.count_nonzero(shifted >= cap)
+        tau = (v[free].sum() - (1.0 - cap * capped)) / np.count_nonzero(free)
+        return np.clip(v - tau, 0.0, cap)
+    return np.clip(shifted, 0.0, cap)
+
+
+def _largest_eigenvalue(matrix, iterations=50):
+    x = np.full(len(matrix), 1.0 / np.sqrt(len(matrix)))
+    value = 0.0
+    for _ in range(iterations):
+        y = matrix @ x
+        value = float(np.linalg.norm(y))
+        if value == 0.0:
+            break
+        x = y / value
+    return value
+
+
+def mean_variance(expected, covariance, risk_aversion=RISK_AVERSION, max_weight=MAX_WEIGHT):
+    """
+    Maximize expected'w - risk_aversion / 2 * w'Cw over long-only, fully invested weights
+    with w <= max_weight, by accelerated projected gradient with adaptive restarts.
+    Returns (weights, iterations, converged).
+    """
+    n = len(expected)
+    cap = max(max_weight, 1.0 / n)
+    step = 1.0 / max(risk_aversion * _largest_eigenvalue(covariance), 1e-12)
+    w = project_capped_simplex(np.full(n, 1.0 / n), cap)
+    y, t = w, 1.0
+    for iteration in range(1, MAX_ITERATIONS + 1):
+        gradient = risk_aversion * (covariance @ y) - expected
+        nxt = project_capped_simplex(y - step * gradient, cap)
+        if np.abs(nxt - w).max() < TOLERANCE:
+            return nxt, iteration, True
+        if gradient @ (nxt - w) > 0:
+            # Momentum is carrying the iterate uphill: restart from plain gradient steps
+            t = 1.0
+        t_next = 0.5 * (1.0 + np.sqrt(1.0 + 4.0 * t * t))
+        y = nxt + (t - 1.0) / t_next * (nxt - w)
+        w, t = nxt, t_next
+    return w, MAX_ITERATIONS, False
+
+
+def risk_parity(covariance):
+    """
+    Long-only weights whose contributions w_i (Cw)_i to portfolio variance are equal.
+    Every asset jumps to its closed-form best response to the others (the coordinate step
+    of the convex risk-budgeting problem), all at once. Returns (weights, iterations, converged).
+    """
+    n = len(covariance)
+    variance = np.diag(covariance)
+    x = 1.0 / np.sqrt(variance)
+    # Risk budgets of 1/n sum to a total variance of 1 at the solution; start on that scale
+    x /= np.sqrt(x @ covariance @ x)
+    weights = x / x.sum()
+    for iteration in range(1, MAX_ITERATIONS + 1):
+        # Solve variance_i x_i^2 + others_i x_i - 1/n = 0 for x_i > 0
+        others = covariance @ x - variance * x
+        x = 0.5 * (x + (np.sqrt(others * others + 4.0 * variance / n) - others) / (2.0 * variance))
+        nxt = x / x.sum()
+        if np.abs(nxt - weights).max() < TOLERANCE:
+            return nxt, iteration, True
+        weights = nxt
+    return weights, MAX_ITERATIONS, False
+
+
+def rebalance(target, current, band=0.0, max_turnover=None, cap=1.0):
+    """
+    Weights to move to from `current` (normalized to sum to 1 when it holds anything).
+    Trades smaller than `band` are skipped and the weight they leave over or short goes to
+    the assets that do trade, without lifting any past `cap`; when those cannot absorb it,
+    every trade is made. With `max_turnover`, all trades are then scaled down so one-way
+    turnover stays within it. A `current` that holds nothing is all cash: the target is
+    bought outright, since buying from cash sells nothing and is not limited by the band
+    or turnover cap.
+    """
+    if not current.sum() > 0:
+        return target, current, 0.5 * np.abs(target).sum()
+    current = current / current.sum()
+    weights = np.where(np.abs(target - current) < band, current, target)
+    trading = weights != current
+    residual = 1.0 - weights.sum()
+    if residual > 0:
+        headroom = np.where(trading, np.maximum(cap - weights, 0.0), 0.0)
+        weights = weights + headroom * (residual / headroom.sum()) if headroom.sum() >= residual else target
+    elif residual < 0:
+        traded = np.where(trading, weights, 0.0)
+        weights = weights - traded * (-residual / traded.sum()) if traded.sum() >= -residual else target
+    turnover = 0.5 * np.abs(weights - current).sum()
+    if max_turnover is not None and turnover > max_turnover:
+        weights = current + (weights - current) * (max_turnover / turnover)
+        turnover = max_turnover
+    return weights, current, turnover
+
+
+def allocate(tickers, last_close, predicted, histories, method='mean-variance', horizon=1, prediction_std=None,
+             risk_aversion=RISK_AVERSION, max_weight=MAX_WEIGHT, current=None, band=0.0, max_turnover=None,
+             lookback=LOOKBACK):
+    """
+    Allocate over `tickers` given their last and predicted closes and close `histories`
+    ((dates, closes) per ticker). `prediction_std` (per-ticker Monte Carlo spread in price
+    terms, NaN where unknown) adds forecast uncertainty to the risk model. `current` maps
+    tickers to held weights; positions outside `tickers` are ignored and the rest are
+    rescaled to sum to 1, which is what `trades` are relative to.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown allocation method '{method}' (expected one of {', '.join(METHODS)})")
+    last_close = np.asarray(last_close, dtype=np.float64)
+    expected = np.asarray(predicted, dtype=np.float64) / last_close - 1.0
+
+    returns = return_matrix(histories, lookback)
+    observed = np.sum(~np.isnan(returns), axis=0)
+    keep = (observed >= MIN_OBSERVATIONS) & np.isfinite(expected)
+    excluded = [t for t, k in zip(tickers, keep) if not k]
+    tickers = [t for t, k in zip(tickers, keep) if k]
+    if not tickers:
+        raise ValueError("No asset has enough price history to allocate over.")
+    expected, returns, last_close = expected[keep], returns[:, keep], last_close[keep]
+
+    covariance, shrinkage = shrunk_covariance(returns)
+    covariance *= horizon
+    if prediction_std is not None:
+        spread = np.asarray(prediction_std, dtype=np.float64)[keep] / last_close
+        covariance[np.diag_indices(len(tickers))] += np.where(np.isfinite(spread), spread * spread, 0.0)
+
+    if method == 'mean-variance':
+        target, iterations, converged = mean_variance(expected, covariance, risk_aversion, max_weight)
+        cap = max(max_weight, 1.0 / len(tickers))
+    else:
+        target, iterations, converged = risk_parity(covariance)
+        cap = 1.0
+
+    # Without `current` (or with nothing held in `tickers`) the target is bought from cash
+    held = np.array([float((current or {}).get(t, 0.0)) for t in tickers])
+    weights, held, turnover = rebalance(target, held, band, max_turnover, cap)
+    risk = covariance @ weights
+    variance = float(weights @ risk)
+    order = np.argsort(-weights)
+    return {
+        'method': method,
+        'assets': len(tickers),
+        'excluded': excluded,
+        'horizon': horizon,
+        'expectedReturn': float(expected @ weights),
+        'volatility': float(np.sqrt(variance)),
+        'shrinkage': shrinkage,
+        'iterations': iterations,
+        'converged': converged,
+        'turnover': float(turnover),
+        # Largest positions first; zero weights are left out
+        'weights': {tickers[i]: float(weights[i]) for i in order if weights[i] > 1e-6},
+        'riskContributions': {tickers[i]: float(weights[i] * risk[i] / variance) for i in order if weights[i] > 1e-6},
+        'trades': {tickers[i]: float(weights[i] - held[i]) for i in order if abs(weights[i] - held[i]) > 1e-6},
+    }
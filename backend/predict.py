@@ -1,419 +1,945 @@
+import time
+IMPORT_STARTED = time.perf_counter()
 import os
 import sys
 import json
-import time
 import argparse
 import numpy as np
-import tensorflow as tf
-import yfinance as yf
 import warnings
-import requests
 import pandas as pd
-import pandas_ta as ta
+import threading
 import traceback
-from datetime import datetime, timedelta
-from data_source import fetch_data_from_sheet, is_supported_ticker
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import data_source
+from batcher import MicroBatcher
+from model_registry import ModelRegistry, REGISTRY_DIR
+from result_cache import ResultCache, result_key, RESULT_CACHE_SIZE, RESULT_CACHE_DB
+from indicators import IndicatorEngine, IndicatorRollout, compute_features, rollout_state_from_closes
+from featurize import normalize_features
+from feature_store import FeatureStore, FEATURE_STORE_DIR
+import frames
+import portfolio
+import timings
+from timings import StageTimings
+
+# Module import cost (numpy, pandas, data sources); reported once per process
+IMPORT_MS = (time.perf_counter() - IMPORT_STARTED) * 1000.0
 
 # Suppress all warnings
 warnings.filterwarnings('ignore')
 
-# Constants for retry mechanism
-MAX_RETRIES = 3
-RETRY_DELAY = 2  # seconds between retries
-
-def create_custom_session():
-    """Create a custom requests session with browser-like headers"""
-    session = requests.Session()
-    
-    # Headers that mimic a common browser request
-    session.headers.update({
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.9',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-        'DNT': '1'  # Do Not Track
-    })
-    
-    return session
-
-# Suppress tensorflow logging
-tf.get_logger().setLevel('ERROR')
+class PredictionError(Exception):
+    """Error with an ERROR_* prefixed message that is reported back to the caller as-is"""
+
+
+# Per-ticker streaming indicator state, shared by every request this process serves
+indicator_engine = IndicatorEngine(window=60)
+
+# Precomputed feature rows written by feature_store.py; tickers it holds skip fetch and indicators
+feature_store = FeatureStore(FEATURE_STORE_DIR) if FEATURE_STORE_DIR else None
 
 # Function to ensure clean JSON output
 def print_json(data):
     # Clear any buffered output
     sys.stdout.flush()
-    # Print JSON and flush immediately
-    print(json.dumps(data), flush=True)
+    # Print JSON and flush immediately (NumPy series become lists)
+    print(json.dumps(data, default=frames.json_default), flush=True)
 
 
-def fetch_stock_data(ticker_symbol):
+def crash_payload(e):
+    """Build the structured critical-crash payload understood by model.js"""
+    return {
+        "error_code": "500_CRITICAL_PYTHON_CRASH",
+        "message": str(e),
+        "traceback": traceback.format_exc()
+    }
+
+
+def fetch_price_history(ticker_symbol):
+    """Return (normalized ticker, DataFrame of Close prices) with at least 60 rows"""
     try:
         if not ticker_symbol or not isinstance(ticker_symbol, str):
-            print_json({
-                "error": "ERROR_DATA_FETCH: Invalid ticker symbol provided."
-            })
-            return None
+            raise PredictionError("ERROR_DATA_FETCH: Invalid ticker symbol provided.")
 
         # Standardize ticker format
         ticker_symbol = ticker_symbol.strip().upper()
 
-        df = None
-        last_error = None
-
-        # Try mock/Google Sheets data source first
-        if is_supported_ticker(ticker_symbol):
-            try:
-                df = fetch_data_from_sheet(ticker_symbol)
-            except Exception as e:
-                last_error = f"Mock/Sheets error: {str(e)}"
-
-        # If not supported by mock, or mock failed, try yfinance as fallback
-        if df is None or df.empty or 'Close' not in df.columns:
-            # Try a robust progressive fetch strategy to guarantee enough trading days
-            # 1) Try period shortcuts (180d, 365d, max)
-            # 2) If insufficient, try explicit start/end windows with increasing lookback days
-            periods_to_try = ["180d", "365d", "max"]
-            days_back_options = [180, 270, 365, 540, 720]
-            session = None
-            try:
-                session = create_custom_session()
-                ticker_obj = yf.Ticker(ticker_symbol, session=session)
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore")
-                    info = ticker_obj.info
-                    if not info or not isinstance(info, dict) or 'regularMarketPrice' not in info:
-                        last_error = f"YFinance info check failed for '{ticker_symbol}'"
-
-                # Try the simple period-based calls first
-                for period in periods_to_try:
-                    try:
-                        cand = ticker_obj.history(
-                            period=period,
-                            interval="1d",
-                            actions=False,
-                            timeout=10
-                        )
-                        if cand is not None and not cand.empty and 'Close' in cand.columns:
-                            # quick check: prefer at least 60 trading days (minimum required for model input)
-                            if len(cand.dropna(subset=['Close'])) >= 60:
-                                df = cand
-                                break
-                            else:
-                                # keep candidate as fallback but continue trying larger window
-                                df = cand
-                    except Exception as pe:
-                        last_error = f"YFinance history error ({period}): {str(pe)}"
-                        continue
-
-                # If period-based attempts didn't yield enough rows, try explicit start/end windows
-                if df is None or df.dropna(subset=['Close']).shape[0] < 60:
-                    end = datetime.utcnow().date()
-                    for days in days_back_options:
-                        try:
-                            start = end - timedelta(days=days)
-                            # Prefer yf.download for a direct CSV-like fetch which can be more reliable
-                            try:
-                                cand2 = yf.download(ticker_symbol, start=start.isoformat(), end=end.isoformat(), interval="1d", progress=False, threads=False)
-                            except Exception:
-                                # Fallback to Ticker.history if download fails
-                                cand2 = ticker_obj.history(start=start.isoformat(), end=end.isoformat(), interval="1d", actions=False, timeout=10)
-
-                            if cand2 is not None and not cand2.empty and 'Close' in cand2.columns:
-                                if len(cand2.dropna(subset=['Close'])) >= 60:
-                                    df = cand2
-                                    break
-                                else:
-                                    # keep as fallback and try a larger window
-                                    df = cand2
-                        except Exception as pe2:
-                            last_error = f"YFinance history error (start/end {days}d): {str(pe2)}"
-                            continue
-            except Exception as e:
-                last_error = f"YFinance setup error: {str(e)}"
-            finally:
-                try:
-                    if session:
-                        session.close()
-                except Exception:
-                    pass
-
-        # If all data fetching attempts failed, report the error
-        if df is None or df.empty or 'Close' not in df.columns:
-            print_json({
-                "error": f"ERROR_DATA_FETCH: Failed to fetch data for '{ticker_symbol}'. Last error: {last_error}"
-            })
-            return None
-        
+        # The configured data source(s) (mock sheet, Yahoo through the OHLCV cache, local dumps, ...)
         try:
-            # Basic data validation
-            if df.empty:
-                print_json({
-                    "error": f"ERROR_DATA_FETCH: No data available for '{ticker_symbol}'"
-                })
-                return None
-
-            # Ensure closing price column exists
-            if 'Close' not in df.columns:
-                print_json({
-                    "error": f"ERROR_DATA_FETCH: No closing price data available for '{ticker_symbol}'."
-                })
-                return None
-
-            # Step 1: Clean raw price data
-            df = df[['Close']].copy()  # Extract just Close prices
-            df.dropna(inplace=True)    # Remove any NaN prices
-            
-            # Need extra history for indicator calculation
-            if len(df) < 60:  # require at least 60 days for the model input
-                print_json({
-                    "error": f"ERROR_DATA_FETCH: Insufficient price history for '{ticker_symbol}'. Need at least 60 days, got {len(df)}"
-                })
-                return None
-
-            # Step 2: Calculate technical indicators
-            try:
-                # RSI calculation (14-period)
-                df['RSI'] = ta.rsi(df['Close'], length=14)
-                
-                # MACD calculation (12,26,9)
-                macd = ta.macd(df['Close'], fast=12, slow=26, signal=9)
-                macd_col = next((col for col in macd.columns if col.startswith('MACD_')), macd.columns[0])
-                df['MACD'] = macd[macd_col]
-                
-                # Forward fill a few NaNs that might appear at edges
-                df.fillna(method='ffill', inplace=True)
-                df.fillna(method='bfill', inplace=True)
-            except Exception as e:
-                print_json({
-                    "error": f"ERROR_DATA_FETCH: Failed to calculate indicators for '{ticker_symbol}': {str(e)}"
-                })
-                return None
-
-            # Step 3: Final validation
-            if df.isnull().any().any():
-                # Still have NaNs after forward/backward fill
-                df.dropna(inplace=True)
-
-            # Verify sufficient clean data for prediction
-            if len(df) < 60:
-                print_json({
-                    "error": f"ERROR_DATA_FETCH: Insufficient clean data for '{ticker_symbol}' after TI calculation. Need at least 60 days, got {len(df)}"
-                })
-                return None
-                
-            # continue to feature extraction
+            with timings.stage('fetch'):
+                df = data_source.get_source().history(ticker_symbol)
         except Exception as e:
-            print_json({
-                "error": f"ERROR_DATA_FETCH: Unexpected error processing data for '{ticker_symbol}': {str(e)}"
-            })
-            return None
-
-        # Take last 60 rows and return as list of [Close, RSI, MACD]
-        last60 = df.tail(60)
-        features = last60[['Close', 'RSI', 'MACD']].values.tolist()
-
-        # Final validation for infinite or NaN values
-        if any(np.isinf(x) or np.isnan(x) for row in features for x in row):
-            print_json({
-                "error": f"ERROR_DATA_FETCH: Invalid data found for '{ticker_symbol}'. Some values are invalid."
-            })
-            return None
-
-        return features
-        
+            raise PredictionError(f"ERROR_DATA_FETCH: Failed to fetch data for '{ticker_symbol}'. Last error: {str(e)}")
+
+        # Step 1: Clean raw price data
+        df = df[['Close']].copy()  # Extract just Close prices
+        df.dropna(inplace=True)    # Remove any NaN prices
+
+        # Need extra history for indicator calculation
+        if len(df) < 60:  # require at least 60 days for the model input
+            raise PredictionError(f"ERROR_DATA_FETCH: Insufficient price history for '{ticker_symbol}'. Need at least 60 days, got {len(df)}")
+
+        return ticker_symbol, df
+
+    except PredictionError:
+        raise
     except Exception as e:
-        print_json({
-            "error": f"ERROR_DATA_FETCH: Unexpected error while processing data for '{ticker_symbol}': {str(e)}"
-        })
-        return None
+        raise PredictionError(f"ERROR_DATA_FETCH: Unexpected error while processing data for '{ticker_symbol}': {str(e)}")
 
 
-def main():
-    # Ensure clean start
-    sys.stdout.flush()
-    
+def history_features(ticker_symbol, df, with_state=False):
+    """
+    Last 60 rows of [Close, RSI, MACD] for a history returned by fetch_price_history.
+    With `with_state`, returns (features, IndicatorRollout state) for multi-step forecasts.
+    """
+    # Step 2: Calculate technical indicators (RSI 14, MACD 12/26/9)
+    # The engine keeps per-ticker state, so only bars newer than the last request are processed
+    state = None
     try:
-        parser = argparse.ArgumentParser()
-        parser.add_argument('--ticker', help='Stock ticker symbol (e.g., AAPL)')
-        parser.add_argument('--data', help='JSON array of 60 numbers (optional)')
-        parser.add_argument('--min', type=float, required=True, dest='scaler_min')
-        parser.add_argument('--max', type=float, required=True, dest='scaler_max')
-        parser.add_argument('--model', default=os.path.join(os.path.dirname(__file__), 'model', 'model.keras'))
-        args = parser.parse_args()
-
-        # Handle either ticker or direct data input
-        if args.ticker:
-            data = fetch_stock_data(args.ticker)
-            if data is None:
-                # Error already printed by fetch_stock_data
-                return
-        elif args.data:
-            try:
-                data = json.loads(args.data)
-            except Exception:
-                print_json({
-                    "error": "ERROR_DATA_PARSE: Invalid JSON format for input data."
-                })
-                return
-        else:
-            print_json({
-                "error": "ERROR_INVALID_INPUT: Either ticker or data must be provided."
-            })
-            return
+        with timings.stage('indicators'):
+            last60 = indicator_engine.features(ticker_symbol, df['Close'].values, df.index.values, with_state=with_state)
+        if with_state:
+            last60, state = last60
     except Exception as e:
-        print(json.dumps({
-            "error": f"ERROR_RUNTIME: Unexpected error during execution: {str(e)}"
-        }))
-        return
+        raise PredictionError(f"ERROR_DATA_FETCH: Failed to calculate indicators for '{ticker_symbol}': {str(e)}")
+
+    # Last 60 rows as a list of [Close, RSI, MACD]
+    features = last60.tolist()
+
+    # Final validation for infinite or NaN values
+    if any(np.isinf(x) or np.isnan(x) for row in features for x in row):
+        raise PredictionError(f"ERROR_DATA_FETCH: Invalid data found for '{ticker_symbol}'. Some values are invalid.")
 
+    return (features, state) if with_state else features
+
+
+def stored_window(ticker_symbol):
+    """(ticker, dates, [60, 3] rows) from the feature store, or None to fetch and compute instead"""
+    if feature_store is None or not isinstance(ticker_symbol, str):
+        return None
+    ticker_symbol = ticker_symbol.strip().upper()
+    try:
+        with timings.stage('store'):
+            window = feature_store.window(ticker_symbol, 60)
+    except Exception as e:
+        # A damaged store must not take predictions down; the fetch path still works
+        print(f"Feature store read failed for {ticker_symbol}: {e}", file=sys.stderr)
+        return None
+    return None if window is None else (ticker_symbol,) + window
+
+
+def stored_rollout_state(ticker_symbol, features):
+    """IndicatorRollout state at the last stored bar, rebuilt from the stored close column"""
+    _, rows = feature_store.series(ticker_symbol)
+    _, state = rollout_state_from_closes(rows[:, 0])
+    # The stored RSI/MACD of the last row seed the forward filled values
+    return state[:5] + (features[-1, 1], features[-1, 2])
+
+
+def fetch_stock_data(ticker_symbol):
+    ticker_symbol, df = fetch_price_history(ticker_symbol)
+    return history_features(ticker_symbol, df)
+
+
+def build_features(data):
+    """
+    Turn validated input into a [60, 3] float array of [Close, RSI, MACD].
+
+    The input `data` can be either:
+    - A list/array of 60 close prices (1D)
+    - A list/array of 60 feature tuples/lists [close, rsi, macd] (2D)
+    """
     if not isinstance(data, (list, np.ndarray)) or len(data) != 60:
-        print(json.dumps({
-            "error": f"ERROR_DATA_VALIDATION: Input must be a list of 60 numbers, got {len(data) if isinstance(data, (list, np.ndarray)) else type(data)}"
-        }))
-        return
+        raise PredictionError(f"ERROR_DATA_VALIDATION: Input must be a list of 60 numbers, got {len(data) if isinstance(data, (list, np.ndarray)) else type(data)}")
 
     try:
-        # The input `data` can be either:
-        # - A list/array of 60 close prices (1D)
-        # - A list/array of 60 feature tuples/lists [close, rsi, macd] (2D)
         features = None
 
         # Detect multivariate input (list of lists/tuples)
         if isinstance(data, (list, np.ndarray)) and len(data) > 0 and isinstance(data[0], (list, tuple, np.ndarray)):
             arr = np.array(data, dtype=np.float32)
             if arr.ndim != 2 or arr.shape[1] != 3:
-                print_json({"error": "ERROR_DATA_VALIDATION: Multivariate input must be shape [60,3]"})
-                return
+                raise PredictionError("ERROR_DATA_VALIDATION: Multivariate input must be shape [60,3]")
             features = arr
         else:
-            # Close-only input: compute RSI and MACD manually using fast numpy operations
-            close_prices = np.array(data, dtype=np.float32)
-            
+            # Close-only input: compute RSI and MACD with the vectorized indicator path
+            close_prices = np.array(data, dtype=np.float64)
+
             try:
-                # Manual RSI calculation (14-period)
-                def calculate_rsi(prices, period=14):
-                    deltas = np.diff(prices)
-                    seed = deltas[:period+1]
-                    up = seed[seed >= 0].sum()/period
-                    down = -seed[seed < 0].sum()/period
-                    rs = up/down if down != 0 else 0
-                    rsi = np.zeros_like(prices)
-                    rsi[:period] = 50.0  # Default for first values
-                    rsi[period] = 100. - 100./(1. + rs)
-                    
-                    for i in range(period+1, len(prices)):
-                        delta = deltas[i-1]
-                        if delta > 0:
-                            upval = delta
-                            downval = 0.
-                        else:
-                            upval = 0.
-                            downval = -delta
-                        
-                        up = (up*(period-1) + upval)/period
-                        down = (down*(period-1) + downval)/period
-                        rs = up/down if down != 0 else 0
-                        rsi[i] = 100. - 100./(1. + rs)
-                    
-                    return rsi
-                
-                # Manual MACD calculation (12, 26, 9)
-                def calculate_macd(prices, fast=12, slow=26):
-                    # Calculate EMAs
-                    ema_fast = pd.Series(prices).ewm(span=fast, adjust=False).mean().values
-                    ema_slow = pd.Series(prices).ewm(span=slow, adjust=False).mean().values
-                    macd_line = ema_fast - ema_slow
-                    return macd_line
-                
-                # Calculate indicators
-                rsi_values = calculate_rsi(close_prices, period=14)
-                macd_values = calculate_macd(close_prices, fast=12, slow=26)
-                
-                # Create features array
-                features = np.column_stack([
-                    close_prices,
-                    rsi_values,
-                    macd_values
-                ])
-                
+                with timings.stage('indicators'):
+                    features = compute_features(close_prices)
             except Exception as e:
-                print_json({"error": f"ERROR_DATA_VALIDATION: Failed to calculate indicators: {str(e)}"})
-                return
+                raise PredictionError(f"ERROR_DATA_VALIDATION: Failed to calculate indicators: {str(e)}")
 
             # Ensure we have exactly 60 rows
             if len(features) < 60:
-                print_json({"error": "ERROR_DATA_VALIDATION: Need 60 points for manual input after indicator calculation."})
-                return
-            
+                raise PredictionError("ERROR_DATA_VALIDATION: Need 60 points for manual input after indicator calculation.")
+
             # Take last 60 if we have more
             features = features[-60:]
-        
+
         if any(np.isnan(x) or np.isinf(x) for x in features.flatten()):
-            print(json.dumps({
-                "error": "ERROR_DATA_VALIDATION: Input contains invalid numbers (NaN or infinity)"
-            }))
-            return
+            raise PredictionError("ERROR_DATA_VALIDATION: Input contains invalid numbers (NaN or infinity)")
 
-        scaler_min = float(args.scaler_min)
-        scaler_max = float(args.scaler_max)
-        range_val = scaler_max - scaler_min
-
-        # Normalize input using fixed MinMax parameters (only normalize Close prices)
-        normalized = features.copy()
-        normalized[:, 0] = (features[:, 0] - scaler_min) / range_val
-        # RSI is already 0-100, normalize to 0-1
-        normalized[:, 1] = features[:, 1] / 100.0
-        macd_range = max(abs(features[:, 2].min()), abs(features[:, 2].max()))
-        if macd_range != 0:
-            normalized[:, 2] = features[:, 2] / (2 * macd_range) + 0.5  # Center around 0.5
-        
+    except PredictionError:
+        raise
     except ValueError as e:
-        print(json.dumps({
-            "error": f"ERROR_DATA_VALIDATION: Failed to convert values to float: {str(e)}"
-        }))
-        return
+        raise PredictionError(f"ERROR_DATA_VALIDATION: Failed to convert values to float: {str(e)}")
     except Exception as e:
-        print(json.dumps({
-            "error": f"ERROR_DATA_VALIDATION: Unexpected error during data validation: {str(e)}"
-        }))
-        return
+        raise PredictionError(f"ERROR_DATA_VALIDATION: Unexpected error during data validation: {str(e)}")
 
-    # LSTM expects shape [1, 60, 3] for [Close, RSI, MACD]
-    X = normalized.reshape(1, 60, 3)
+    return features
 
-    # Load Keras model and predict
-    model = tf.keras.models.load_model(args.model)
-    y = model.predict(X, verbose=0)
-    normalized_pred = float(y[0][0])
-    predicted = normalized_pred * range_val + scaler_min
 
-    # Extract raw series for frontend visualization from features (shape: [60,3])
-    try:
-        close_series = features[:, 0].tolist()
-        rsi_series = features[:, 1].tolist()
-        macd_series = features[:, 2].tolist()
-        last_close_val = float(close_series[-1]) if len(close_series) > 0 else None
-    except Exception:
-        # Fallback to original data when indexing fails
-        try:
-            last_close_val = float(data[-1][0]) if (isinstance(data[-1], (list, tuple)) and len(data[-1])>0) else (float(data[-1]) if len(data) > 0 else None)
-        except Exception:
-            last_close_val = None
+def build_response(features, normalized_pred, scaler_min, scaler_max, include_series=True, model_version=None,
+                   path=None, draws=None, blend=None, samples=0):
+    """Assemble the payload returned to model.js for one prediction"""
+    predicted = normalized_pred * (scaler_max - scaler_min) + scaler_min
+    last_close_val = float(features[-1, 0]) if len(features) > 0 else None
 
-    print_json({
+    response = {
         'predicted': float(predicted),
         'normalizedPred': float(normalized_pred),
         'timesteps': 60,
         'lastClose': last_close_val,
-        'series': {
-            'close': close_series,
-            'rsi': rsi_series,
-            'macd': macd_series
+    }
+    if model_version is not None:
+        response['modelVersion'] = model_version
+    if blend is not None:
+        # 'ensemble' (LSTM blended with the baselines) or 'baseline' (overload fallback)
+        response['model'] = blend['model']
+        response['components'] = blend['components']
+    if path is not None:
+        # Multi-step forecast: predicted [close, rsi, macd] rows for steps 1..horizon
+        response['horizon'] = len(path)
+        # Copies, so a cached response does not pin the whole forecast buffer
+        response['path'] = {
+            'close': path[:, 0].copy(),
+            'rsi': path[:, 1].copy(),
+            'macd': path[:, 2].copy()
+        }
+    if draws is not None:
+        # Monte Carlo dropout bands around the point prediction (and path)
+        response['uncertainty'] = uncertainty_bands(draws, scaler_min, scaler_max)
+    elif samples:
+        # Requested, but the overload fallback answered: its baselines are not sampled
+        response['uncertainty'] = None
+        response['uncertaintyUnavailable'] = "Answered by the baseline fallback under load, which has no Monte Carlo samples."
+    if include_series:
+        # Raw series for frontend visualization from features (shape: [60,3]). They stay
+        # NumPy arrays: the binary transport ships them as-is, JSON output converts them.
+        response['series'] = {
+            'close': features[:, 0],
+            'rsi': features[:, 1],
+            'macd': features[:, 2]
         }
-    })
+    return response
+
+
+def prepare_request(request):
+    """Resolve a request dict ({ticker} or {data}) into a [60, 3] feature window"""
+    ticker = request.get('ticker')
+    data = request.get('data')
+
+    # Handle either ticker or direct data input
+    if ticker:
+        data = fetch_stock_data(ticker)
+    elif data is not None:
+        if isinstance(data, str):
+            try:
+                data = json.loads(data)
+            except Exception:
+                raise PredictionError("ERROR_DATA_PARSE: Invalid JSON format for input data.")
+    else:
+        raise PredictionError("ERROR_INVALID_INPUT: Either ticker or data must be provided.")
+
+    return build_features(data)
+
+
+def model_version(handle):
+    return f"{handle.name}/{handle.version}"
+
+
+# Longest forecast path a request may ask for
+MAX_HORIZON = 60
+
+
+def parse_horizon(value):
+    """Validate a requested forecast horizon (number of future bars)"""
+    if value is None:
+        return 1
+    try:
+        horizon = int(value)
+    except (TypeError, ValueError):
+        raise PredictionError("ERROR_INVALID_INPUT: horizon must be an integer.")
+    if horizon < 1 or horizon > MAX_HORIZON:
+        raise PredictionError(f"ERROR_INVALID_INPUT: horizon must be between 1 and {MAX_HORIZON}, got {horizon}.")
+    return horizon
+
+
+# Monte Carlo dropout: `uncertainty` requests run K stochastic forward passes per window
+MC_SAMPLES = int(os.environ.get('PREDICT_MC_SAMPLES', 32))  # K when a request just asks for uncertainty
+MAX_MC_SAMPLES = 256
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def parse_samples(value):
+    """Validate the `uncertainty` option: true for MC_SAMPLES passes or a sample count; 0 means off"""
+    if value is None or value is False:
+        return 0
+    if value is True:
+        return MC_SAMPLES
+    try:
+        samples = int(value)
+    except (TypeError, ValueError):
+        raise PredictionError("ERROR_INVALID_INPUT: uncertainty must be true or a number of samples.")
+    if samples != 0 and not 2 <= samples <= MAX_MC_SAMPLES:
+        raise PredictionError(f"ERROR_INVALID_INPUT: uncertainty samples must be between 2 and {MAX_MC_SAMPLES}, got {samples}.")
+    return samples
+
+
+class DropoutSampler:
+    """
+    Model wrapper whose predict_on_batch() keeps dropout active, so every row of a batch is
+    an independent Monte Carlo sample. It is a distinct model to the MicroBatcher, so samples
+    of concurrent requests are batched together and never mixed with deterministic rows.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.rng = np.random.default_rng()
+
+    def predict_on_batch(self, X):
+        if hasattr(self.model, 'sample_on_batch'):
+            return self.model.sample_on_batch(X, self.rng)
+        # Keras: calling the model with training=True switches its Dropout layers on
+        return np.asarray(self.model(X, training=True))
+
+
+_samplers = weakref.WeakKeyDictionary()
+_samplers_lock = threading.Lock()
+
+
+def dropout_sampler(model):
+    """The DropoutSampler of a loaded model (one per model, so batches can group by it)"""
+    if not (hasattr(model, 'sample_on_batch') or callable(model)):
+        raise PredictionError("ERROR_INVALID_INPUT: uncertainty needs dropout at inference time, "
+                              "which the keras and numpy engines support but quantized TFLite models do not.")
+    with _samplers_lock:
+        sampler = _samplers.get(model)
+        if sampler is None:
+            sampler = _samplers[model] = DropoutSampler(model)
+        return sampler
+
+
+def uncertainty_bands(draws, scaler_min, scaler_max):
+    """Mean, standard deviation and quantiles of the sampled predictions in price terms"""
+    first = draws['first'] * (scaler_max - scaler_min) + scaler_min
+    bands = {
+        'samples': len(first),
+        'mean': float(first.mean()),
+        'std': float(first.std(ddof=1)),
+        'quantiles': {f"p{round(q * 100)}": float(v) for q, v in zip(QUANTILES, np.quantile(first, QUANTILES))},
+    }
+    closes = draws['closes']
+    if closes is not None:
+        # Per-step spread of the K sampled forecast paths
+        lower, upper = np.quantile(closes, (QUANTILES[0], QUANTILES[-1]), axis=0)
+        bands['path'] = {'mean': closes.mean(axis=0), 'std': closes.std(axis=0, ddof=1),
+                         'lower': lower, 'upper': upper}
+    return bands
+
+
+# Blend predictions with the baselines of model versions that publish an ensemble (ensemble.py)
+PREDICT_ENSEMBLE = os.environ.get('PREDICT_ENSEMBLE', '1') != '0'
+# Rows waiting in the batcher beyond which ensemble versions answer from their baselines alone (0 = never)
+FALLBACK_BACKLOG = int(os.environ.get('PREDICT_FALLBACK_BACKLOG', 512))
+
+
+def prepare_prediction(registry, request, result_cache=None, horizon=1, samples=0):
+    """
+    Resolve a request into a job dict: its feature window, the model handle serving it and,
+    for ticker requests, the result cache key. When the cache already holds the answer for
+    the ticker's latest bar and the current model version, `cached` is set and the
+    indicator and inference steps are skipped. Multi-step jobs also carry the indicator
+    `state` their forecast is rolled forward from.
+    """
+    ticker = request.get('ticker')
+    if not ticker:
+        features = prepare_request(request)
+        state = None
+        if horizon > 1:
+            # Only closes are given, so the indicator state comes from the window itself;
+            # the supplied RSI/MACD of the last row seed the forward filled values
+            _, state = rollout_state_from_closes(features[:, 0])
+            state = state[:5] + (features[-1, 1], features[-1, 2])
+        return {'features': features, 'state': state, 'handle': registry.get(None), 'key': None, 'cached': None}
+
+    stored = stored_window(ticker)
+    if stored is not None:
+        ticker, dates, rows = stored
+        last_time, last_close = pd.Timestamp(dates[-1]), float(rows[-1, 0])
+    else:
+        ticker, history = fetch_price_history(ticker)
+        last_time, last_close = history.index[-1], float(history['Close'].iloc[-1])
+    # Resolve the model once so normalization and inference use the same version
+    handle = registry.get(ticker)
+    key = None
+    if result_cache is not None:
+        key = result_key(ticker, last_time, last_close, model_version(handle), horizon, samples)
+        hit = result_cache.get(key)
+        if hit is not None:
+            payload, created, source = hit
+            cached = dict(payload, cache={'hit': True, 'source': source, 'ageSeconds': round(time.time() - created, 3)})
+            return {'features': None, 'state': None, 'handle': handle, 'key': key, 'cached': cached}
+    if stored is not None:
+        features = build_features(rows)
+        state = stored_rollout_state(ticker, features) if horizon > 1 else None
+    else:
+        features, state = history_features(ticker, history, with_state=True) if horizon > 1 else (
+            history_features(ticker, history), None)
+        features = build_features(features)
+    return {'features': features, 'state': state, 'handle': handle, 'key': key, 'cached': None}
+
+
+def check_deadline(deadline, stage):
+    """Give up on a request the gateway has stopped waiting for (time.monotonic() past `deadline`)"""
+    if deadline is not None and time.monotonic() > deadline:
+        raise PredictionError(f"ERROR_DEADLINE_EXCEEDED: Request deadline passed before {stage}.")
+
+
+def forecast(batcher, jobs, horizon=1, samples=0, deadline=None):
+    """
+    Predict `horizon` steps for every job. Returns [(first normalized prediction, path, draws,
+    blend)] where path is a [horizon, 3] array of predicted [close, rsi, macd] rows (None when
+    horizon is 1) and draws holds the Monte Carlo samples when `samples` > 0: 'first', the
+    [K] normalized first-step predictions, and 'closes', the [K, horizon] sampled paths.
+    blend is None unless the model version publishes an ensemble; then it names the `model`
+    that answered ('ensemble', or 'baseline' for a fallback) and the first-step closes of
+    its `components`.
+
+    Jobs served by the same model are stacked into one [B, 60 + horizon, 3] buffer; step t
+    predicts from the window view buffer[:, t:t + 60], de-normalizes the closes and
+    appends the next row, with RSI/MACD updated incrementally by an IndicatorRollout.
+    With sampling, every window is also tiled K times into a [B * K, 60 + horizon, 3]
+    buffer that goes through the model with dropout on, so each sample path rolls forward
+    on its own predictions. Every step submits all buffers before waiting, so each is one
+    batched pass. Ensemble baselines run on the same window views in one vectorized pass
+    per buffer; while the batcher backlog is over FALLBACK_BACKLOG rows they answer alone.
+    Once `deadline` has passed, no further step is submitted.
+    """
+    groups = {}
+    for i, job in enumerate(jobs):
+        groups.setdefault(id(job['handle']), []).append(i)
+
+    rolls = []
+    for rows in groups.values():
+        handle = jobs[rows[0]]['handle']
+        ensemble = handle.ensemble if PREDICT_ENSEMBLE else None
+        # Decided once per request, so a forecast path never mixes LSTM and fallback steps
+        fallback = ensemble is not None and 0 < FALLBACK_BACKLOG <= batcher.backlog
+        features = np.stack([jobs[i]['features'] for i in rows])
+        states = [jobs[i]['state'] for i in rows]
+        for k, model in ((1, handle.model), (samples, dropout_sampler(handle.model) if samples else None)):
+            if not k or (fallback and k > 1):
+                continue
+            buffer = np.empty((len(rows) * k, 60 + horizon, 3))
+            buffer[:, :60] = np.repeat(features, k, axis=0)
+            rollout = IndicatorRollout(np.repeat(states, k, axis=0)) if horizon > 1 else None
+            rolls.append({'rows': rows, 'handle': handle, 'model': None if fallback else model, 'k': k,
+                          'buffer': buffer, 'rollout': rollout, 'ensemble': ensemble, 'first': [],
+                          'components': None})
+
+    for t in range(horizon):
+        check_deadline(deadline, 'inference')
+        pending = []
+        for roll in rolls:
+            if roll['model'] is None:
+                pending.append(None)
+                continue
+            with timings.stage('normalize'):
+                normalized = normalize_features(roll['buffer'][:, t:t + 60], roll['handle'].scaler_min,
+                                                roll['handle'].scaler_max)
+            pending.append(batcher.submit_many(normalized, roll['model']))
+        waited = time.perf_counter()
+        for roll, future in zip(rolls, pending):
+            handle, buffer, ensemble = roll['handle'], roll['buffer'], roll['ensemble']
+            scale = handle.scaler_max - handle.scaler_min
+            close = None
+            if future is not None:
+                y = np.asarray(future.result(), dtype=np.float64)[:, 0]
+                # Forward pass vs time queued behind other requests in the batcher
+                compute_ms = getattr(future, 'compute_ms', 0.0)
+                timings.add('inference', compute_ms)
+                timings.add('queue', max(0.0, (time.perf_counter() - waited) * 1000.0 - compute_ms))
+                waited = time.perf_counter()
+                close = y * scale + handle.scaler_min
+            if ensemble is not None:
+                with timings.stage('baselines'):
+                    baseline = ensemble.baseline_closes(buffer[:, t:t + 60])
+                    blended = ensemble.fallback(baseline) if close is None else ensemble.combine(close, baseline)
+                if t == 0 and roll['k'] == 1:
+                    roll['components'] = (close, baseline)
+                close = blended
+                y = (close - handle.scaler_min) / scale
+            if t == 0:
+                roll['first'].extend(y.tolist())
+            if roll['rollout'] is None:
+                continue
+            rsi, macd = roll['rollout'].step(close)
+            buffer[:, 60 + t] = np.column_stack([close, rsi, macd])
+
+    results = [[None, None, None, None] for _ in jobs]
+    for roll in rolls:
+        rows, k, buffer = roll['rows'], roll['k'], roll['buffer']
+        if k == 1:
+            for row, i in enumerate(rows):
+                results[i][:2] = roll['first'][row], buffer[row, 60:] if horizon > 1 else None
+            if roll['components'] is not None:
+                lstm, baseline = roll['components']
+                names = roll['ensemble'].names
+                for row, i in enumerate(rows):
+                    components = dict(zip(names, baseline[row].tolist()))
+                    if lstm is not None:
+                        components['lstm'] = float(lstm[row])
+                    results[i][3] = {'model': 'ensemble' if lstm is not None else 'baseline',
+                                     'components': components}
+            continue
+        first = np.asarray(roll['first']).reshape(len(rows), k)
+        closes = buffer[:, 60:, 0].reshape(len(rows), k, horizon)
+        for row, i in enumerate(rows):
+            results[i][2] = {'first': first[row], 'closes': closes[row] if horizon > 1 else None}
+    return [tuple(result) for result in results]
+
+
+def finish_prediction(job, normalized_pred, result_cache=None, include_series=True, path=None, draws=None,
+                      blend=None, samples=0):
+    """Build the response for a computed prediction and store it in the result cache"""
+    handle = job['handle']
+    # Fallback answers are not cached: the next request should get the full model again
+    cacheable = result_cache is not None and job['key'] is not None and (blend is None or blend['model'] != 'baseline')
+    response = build_response(job['features'], normalized_pred, handle.scaler_min, handle.scaler_max,
+                              include_series=include_series or cacheable, model_version=model_version(handle),
+                              path=path, draws=draws, blend=blend, samples=samples)
+    if cacheable:
+        # Stored with its series so later requests can be answered either way
+        result_cache.put(job['key'], response)
+        response = dict(response, cache={'hit': False})
+        if not include_series:
+            response.pop('series', None)
+    return response
+
+
+def cached_response(job, include_series=True):
+    response = dict(job['cached'])
+    if not include_series:
+        response.pop('series', None)
+    return response
+
+
+def predict_request(batcher, registry, request, result_cache=None, deadline=None):
+    """Run the full fetch -> indicators -> normalize -> predict pipeline for one request"""
+    horizon = parse_horizon(request.get('horizon'))
+    samples = parse_samples(request.get('uncertainty'))
+    job = prepare_prediction(registry, request, result_cache, horizon, samples)
+    if job['cached'] is not None:
+        return cached_response(job)
+
+    # The batcher stacks this window with other in-flight requests for the same model
+    normalized_pred, path, draws, blend = forecast(batcher, [job], horizon, samples, deadline)[0]
+    return finish_prediction(job, normalized_pred, result_cache, path=path, draws=draws, blend=blend,
+                             samples=samples)
+
+
+def predict_batch(batcher, registry, items, executor, include_series=False, result_cache=None, horizon=1,
+                  uncertainty=None, deadline=None):
+    """
+    Predict many tickers/series at once. Histories are fetched concurrently on `executor`,
+    the valid windows are normalized as one [B, 60, 3] array per model and sent through
+    batched forward passes (one per forecast step). Failures are reported per item
+    instead of failing the batch.
+    """
+    if isinstance(items, np.ndarray) and items.ndim >= 2:
+        # Equal-length series may arrive as one [B, 60] (or [B, 60, 3]) array
+        items = list(items)
+    if not isinstance(items, list) or len(items) == 0:
+        raise PredictionError("ERROR_INVALID_INPUT: Batch must be a non-empty list of tickers or series.")
+    horizon = parse_horizon(horizon)
+    samples = parse_samples(uncertainty)
+
+    recorder = timings.current()
+
+    def prepare(item):
+        try:
+            if isinstance(item, str):
+                item = {'ticker': item}
+            elif not isinstance(item, dict):
+                item = {'data': item}
+            # Stages of every item add up in the batch request's timings
+            with timings.recording(recorder):
+                return prepare_prediction(registry, item, result_cache, horizon, samples), None
+        except PredictionError as e:
+            return None, str(e)
+        except Exception as e:
+            # e.g. a per-ticker model that fails to load
+            return None, f"ERROR_MODEL_LOAD: {str(e)}"
+
+    def item_ticker(item):
+        ticker = item if isinstance(item, str) else (item.get('ticker') if isinstance(item, dict) else None)
+        return ticker.strip().upper() if isinstance(ticker, str) else None
+
+    prepared = list(executor.map(prepare, items))
+
+    # Windows still to compute; forecast() groups them by the model that serves them
+    todo = [i for i, (job, _) in enumerate(prepared) if job is not None and job['cached'] is None]
+    predictions = dict(zip(todo, forecast(batcher, [prepared[i][0] for i in todo], horizon, samples, deadline)))
+
+    results = []
+    failed = 0
+    for i, (item, (job, error)) in enumerate(zip(items, prepared)):
+        if error is not None:
+            result = {'error': error}
+            failed += 1
+        elif job['cached'] is not None:
+            result = cached_response(job, include_series)
+        else:
+            normalized_pred, path, draws, blend = predictions[i]
+            result = finish_prediction(job, normalized_pred, result_cache, include_series, path, draws, blend, samples)
+        result['ticker'] = item_ticker(item)
+        result['index'] = i
+        results.append(result)
+
+    return {'results': results, 'count': len(results), 'failed': failed}
+
+
+def close_history(ticker_symbol, rows):
+    """(dates, closes) of the last `rows` bars, from the feature store when it is fresh"""
+    window = None
+    if feature_store is not None:
+        try:
+            with timings.stage('store'):
+                window = feature_store.window(ticker_symbol.strip().upper(), rows)
+        except Exception as e:
+            print(f"Feature store read failed for {ticker_symbol}: {e}", file=sys.stderr)
+    if window is not None:
+        return window[0], window[1][:, 0]
+    _, df = fetch_price_history(ticker_symbol)
+    df = df.iloc[-rows:]
+    return df.index.values, df['Close'].values
+
+
+def parse_option(request, name, default, requirement, valid, integer=False):
+    """Validate a numeric request option against `valid`; a missing one takes `default`"""
+    value = request.get(name)
+    if value is None:
+        return default
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        number = np.nan
+    if isinstance(value, bool) or not np.isfinite(number) or (integer and not number.is_integer()) or not valid(number):
+        raise PredictionError(f"ERROR_INVALID_INPUT: {name} must be {requirement}.")
+    return int(number) if integer else number
+
+
+def predict_portfolio(batcher, registry, request, executor, result_cache=None, deadline=None):
+    """
+    Predict a universe of tickers with predict_batch, then allocate over it (portfolio.py)
+    from the predicted returns, the tickers' close histories and, with `uncertainty`, the
+    Monte Carlo spread of every prediction. Tickers that fail are reported and left out.
+    """
+    tickers = request.get('tickers')
+    if not isinstance(tickers, list) or not tickers or not all(isinstance(t, str) for t in tickers):
+        raise PredictionError("ERROR_INVALID_INPUT: Portfolio needs a non-empty list of tickers.")
+    method = request.get('method') or 'mean-variance'
+    if method not in portfolio.METHODS:
+        raise PredictionError(f"ERROR_INVALID_INPUT: method must be one of {', '.join(portfolio.METHODS)}.")
+    # Every option is checked before any ticker is fetched or predicted
+    lookback = parse_option(request, 'lookback', portfolio.LOOKBACK,
+                            f"an integer of at least {portfolio.MIN_OBSERVATIONS + 1}",
+                            lambda v: v >= portfolio.MIN_OBSERVATIONS + 1, integer=True)
+    max_weight = parse_option(request, 'maxWeight', portfolio.MAX_WEIGHT, "above 0 and at most 1",
+                              lambda v: 0.0 < v <= 1.0)
+    risk_aversion = parse_option(request, 'riskAversion', portfolio.RISK_AVERSION, "a positive number",
+                                 lambda v: v > 0.0)
+    band = parse_option(request, 'band', 0.0, "a number between 0 and 1", lambda v: 0.0 <= v <= 1.0)
+    max_turnover = parse_option(request, 'maxTurnover', None, "a number between 0 and 1", lambda v: 0.0 <= v <= 1.0)
+    current = request.get('current')
+    if current is not None and not (isinstance(current, dict) and all(
+            isinstance(w, (int, float)) and not isinstance(w, bool) and np.isfinite(w) and w >= 0
+            for w in current.values())):
+        raise PredictionError("ERROR_INVALID_INPUT: current must map tickers to non-negative weights.")
+    horizon = parse_horizon(request.get('horizon'))
+
+    batch = predict_batch(batcher, registry, tickers, executor, result_cache=result_cache, horizon=horizon,
+                          uncertainty=request.get('uncertainty'), deadline=deadline)
+    failed = {r['ticker']: r['error'] for r in batch['results'] if 'error' in r}
+    predicted = [r for r in batch['results'] if 'error' not in r]
+
+    check_deadline(deadline, 'history')
+    recorder = timings.current()
+
+    def history(result):
+        try:
+            with timings.recording(recorder):
+                return close_history(result['ticker'], lookback + 1), None
+        except PredictionError as e:
+            return None, str(e)
+
+    histories = list(executor.map(history, predicted))
+    for result, (_, error) in zip(predicted, histories):
+        if error is not None:
+            failed[result['ticker']] = error
+    kept = [(r, h) for r, (h, e) in zip(predicted, histories) if e is None]
+    if not kept:
+        raise PredictionError("ERROR_DATA_FETCH: No ticker of the portfolio could be predicted.")
+    predicted, histories = [r for r, _ in kept], [h for _, h in kept]
+
+    # The forecast at the end of the horizon and, with uncertainty, its Monte Carlo spread;
+    # fallback answers have none and get NaN, which allocate() leaves out of the risk model
+    closes = [float(np.asarray(r['path']['close'])[-1]) if 'path' in r else r['predicted'] for r in predicted]
+    spread = None
+    if request.get('uncertainty'):
+        spread = [np.nan if r['uncertainty'] is None else
+                  float(np.asarray(r['uncertainty']['path']['std'])[-1]) if 'path' in r else r['uncertainty']['std']
+                  for r in predicted]
+
+    check_deadline(deadline, 'allocation')
+    try:
+        with timings.stage('allocate'):
+            allocation = portfolio.allocate(
+                [r['ticker'] for r in predicted], [r['lastClose'] for r in predicted], closes, histories,
+                method=method, horizon=horizon, prediction_std=spread,
+                risk_aversion=risk_aversion, max_weight=max_weight,
+                current=current, band=band, max_turnover=max_turnover, lookback=lookback)
+    except ValueError as e:
+        raise PredictionError(f"ERROR_INVALID_INPUT: {str(e)}")
+    # Assets without enough history in the lookback are left out of the allocation too
+    failed.update({t: "ERROR_DATA_FETCH: Not enough price history in the lookback." for t in allocation.pop('excluded')})
+    allocation['expected'] = {r['ticker']: c / r['lastClose'] - 1.0 for r, c in zip(predicted, closes)}
+    allocation['failed'] = failed
+    return allocation
+
+
+# Inference engines: "keras" (TensorFlow), "numpy" (lstm_numpy, no TensorFlow import), or a
+# quantized TFLite variant exported next to the model by quantize.py / data_and_train.py --quantize
+ENGINES = ('keras', 'numpy', 'tflite-float16', 'tflite-int8')
+DEFAULT_ENGINE = os.environ.get('PREDICT_ENGINE', 'keras')
+
+
+def load_model(model_path, engine=DEFAULT_ENGINE):
+    """Load the model used for inference with the selected engine"""
+    with timings.stage('modelLoad'):
+        if engine == 'numpy':
+            from lstm_numpy import NumpyLSTMModel
+            return NumpyLSTMModel.load(model_path)
+        if engine.startswith('tflite-'):
+            with timings.stage('import'):
+                from quantize import TFLiteModel
+            return TFLiteModel.load(model_path, engine.split('-', 1)[1])
+
+        # TensorFlow is only imported when the Keras engine is used
+        with timings.stage('import'):
+            import tensorflow as tf
+        # Suppress tensorflow logging
+        tf.get_logger().setLevel('ERROR')
+        return tf.keras.models.load_model(model_path)
+
+
+def predict_on_batch(model, X):
+    # predict_on_batch skips the per-call tf.data setup that predict() does
+    return model.predict_on_batch(X)
+
+
+def open_registry(model_path, scaler_min, scaler_max, registry_dir=REGISTRY_DIR, engine=DEFAULT_ENGINE):
+    """Model registry falling back to `model_path` and the CLI scaler when nothing is published"""
+    return ModelRegistry(partial(load_model, engine=engine), root=registry_dir, fallback_path=model_path,
+                         fallback_scaler=(scaler_min, scaler_max))
+
+
+# Worker transports: newline-delimited JSON, or length-prefixed binary frames (frames.py)
+TRANSPORTS = ('json', 'binary')
+
+
+def json_requests(stream):
+    """(request, error) pairs read from newline-delimited JSON"""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line), None
+        except Exception as e:
+            yield None, f"ERROR_DATA_PARSE: Invalid request line: {str(e)}"
+
+
+def frame_requests(stream):
+    """(request, error) pairs read from binary frames"""
+    while True:
+        try:
+            request = frames.read_frame(stream)
+        except frames.FrameError as e:
+            # A broken frame leaves no way to find the next one; report it and stop reading
+            yield None, f"ERROR_DATA_PARSE: Invalid request frame: {str(e)}"
+            return
+        if request is None:
+            return
+        yield request, None
+
+
+def serve(model_path, scaler_min, scaler_max, max_batch=64, batch_wait_ms=5.0, fetch_workers=8,
+          registry_dir=REGISTRY_DIR, engine=DEFAULT_ENGINE, result_cache_size=RESULT_CACHE_SIZE,
+          result_cache_db=RESULT_CACHE_DB, transport='json'):
+    """
+    Long-lived worker mode: load the model once, then answer requests from stdin until
+    EOF, as newline-delimited JSON or as binary frames (`transport`). Every response
+    echoes the request `id`.
+
+    Requests are handled concurrently on a thread pool so that slow data fetches do not
+    block each other; their feature windows meet in a MicroBatcher for inference.
+    A request with `"op": "batch"` carries an `items` list and is answered by predict_batch;
+    `"op": "portfolio"` carries `tickers` and allocation options for predict_portfolio.
+    Newly published registry versions are picked up without restarting the worker.
+    Ticker predictions are memoized per last bar and model version in a ResultCache.
+    A request's `deadlineMs` (the gateway's remaining budget) counts from when it is read;
+    past it the request is answered with ERROR_DEADLINE_EXCEEDED instead of being worked on.
+    """
+    if transport == 'binary':
+        # Frames own the real stdout; stray prints (e.g. library banners) go to stderr
+        out = sys.stdout.buffer
+        sys.stdout = sys.stderr
+        send = partial(frames.write_frame, out)
+        incoming = frame_requests(sys.stdin.buffer)
+    else:
+        send = print_json
+        incoming = json_requests(sys.stdin)
+
+    registry = open_registry(model_path, scaler_min, scaler_max, registry_dir, engine)
+    startup = StageTimings(started=IMPORT_STARTED)
+    startup.add('import', IMPORT_MS)
+    try:
+        with timings.recording(startup):
+            registry.get()
+    except Exception as e:
+        send(crash_payload(e))
+        sys.exit(1)
+
+    batcher = MicroBatcher(predict_on_batch, max_batch=max_batch, max_wait_ms=batch_wait_ms)
+    result_cache = ResultCache(result_cache_size, result_cache_db) if result_cache_size > 0 else None
+    executor = ThreadPoolExecutor(max_workers=fetch_workers)
+    # Batch requests fan out their fetches here; a separate pool avoids starving `executor`
+    fetch_executor = ThreadPoolExecutor(max_workers=fetch_workers)
+    output_lock = threading.Lock()
+
+    def handle(request_id, request, received):
+        with timings.recording(StageTimings()) as stages:
+            try:
+                budget = request.get('deadlineMs')
+                deadline = received + float(budget) / 1000.0 if budget is not None else None
+                # Waiting for a handler thread counts against the deadline too
+                check_deadline(deadline, 'processing')
+                if request.get('op') == 'batch':
+                    response = predict_batch(batcher, registry, request.get('items'), fetch_executor,
+                                             include_series=bool(request.get('includeSeries')),
+                                             result_cache=result_cache, horizon=request.get('horizon'),
+                                             uncertainty=request.get('uncertainty'), deadline=deadline)
+                elif request.get('op') == 'portfolio':
+                    response = predict_portfolio(batcher, registry, request, fetch_executor, result_cache, deadline)
+                else:
+                    response = predict_request(batcher, registry, request, result_cache, deadline)
+            except PredictionError as e:
+                response = {'error': str(e)}
+            except Exception as e:
+                response = crash_payload(e)
+        response['id'] = request_id
+        response['timings'] = stages.as_dict()
+        with output_lock:
+            send(response)
+
+    send({'ready': True, 'pid': os.getpid(), 'timings': startup.as_dict()})
+
+    for request, error in incoming:
+        if error is not None:
+            with output_lock:
+                send({'id': None, 'error': error})
+            continue
+        executor.submit(handle, request.get('id'), request, time.monotonic())
+
+    executor.shutdown(wait=True)
+    fetch_executor.shutdown(wait=True)
+
+
+def main():
+    # Ensure clean start
+    sys.stdout.flush()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ticker', help='Stock ticker symbol (e.g., AAPL)')
+    parser.add_argument('--tickers', help='Comma-separated ticker symbols for a batch prediction')
+    parser.add_argument('--data', help='JSON array of 60 numbers (optional)')
+    parser.add_argument('--min', type=float, required=True, dest='scaler_min')
+    parser.add_argument('--max', type=float, required=True, dest='scaler_max')
+    parser.add_argument('--model', default=os.path.join(os.path.dirname(__file__), 'model', 'model.keras'))
+    parser.add_argument('--registry', default=REGISTRY_DIR, help='Model registry directory; its current version wins over --model')
+    parser.add_argument('--engine', choices=ENGINES, default=DEFAULT_ENGINE,
+                        help='Inference engine; "numpy" runs the LSTM without importing TensorFlow, '
+                             '"tflite-*" serves a quantized variant from quantize.py')
+    parser.add_argument('--result-cache-size', type=int, default=RESULT_CACHE_SIZE,
+                        help='Cached ticker predictions per worker in --serve mode (0 disables the cache)')
+    parser.add_argument('--result-cache-db', default=RESULT_CACHE_DB,
+                        help='SQLite file sharing cached predictions across workers')
+    parser.add_argument('--horizon', type=int, default=1,
+                        help=f'Number of future bars to forecast recursively (1-{MAX_HORIZON})')
+    parser.add_argument('--uncertainty', type=int, default=0, metavar='K',
+                        help=f'Monte Carlo dropout samples for prediction intervals (0 = off, 2-{MAX_MC_SAMPLES})')
+    parser.add_argument('--data-source', help='Data source spec, e.g. "mock,yahoo", "local:/data/dumps" or "synthetic" (default: $DATA_SOURCE)')
+    parser.add_argument('--feature-store', help='Feature store directory written by feature_store.py (default: $FEATURE_STORE_DIR)')
+    parser.add_argument('--serve', action='store_true', help='Run as a persistent worker reading requests from stdin')
+    parser.add_argument('--transport', choices=TRANSPORTS, default='json',
+                        help='--serve wire format: newline-delimited JSON or binary frames (see frames.py)')
+    parser.add_argument('--max-batch', type=int, default=64, help='Largest inference batch in --serve mode')
+    parser.add_argument('--batch-wait-ms', type=float, default=5.0, help='How long to wait for more requests before running a batch')
+    parser.add_argument('--fetch-workers', type=int, default=8, help='Concurrent requests handled in --serve mode')
+    args = parser.parse_args()
+
+    if args.data_source:
+        data_source.set_source(args.data_source)
+    if args.feature_store:
+        global feature_store
+        feature_store = FeatureStore(args.feature_store)
+
+    if args.serve:
+        serve(args.model, args.scaler_min, args.scaler_max,
+              max_batch=args.max_batch, batch_wait_ms=args.batch_wait_ms, fetch_workers=args.fetch_workers,
+              registry_dir=args.registry, engine=args.engine,
+              result_cache_size=args.result_cache_size, result_cache_db=args.result_cache_db,
+              transport=args.transport)
+        return
+
+    # Models load lazily: per-ticker version, default, or the legacy file
+    registry = open_registry(args.model, args.scaler_min, args.scaler_max, args.registry, args.engine)
+    batcher = MicroBatcher(predict_on_batch, max_batch=args.max_batch, max_wait_ms=0)
+
+    # A one-shot run pays the module imports as part of its request
+    stages = StageTimings(started=IMPORT_STARTED)
+    stages.add('import', IMPORT_MS)
+    with timings.recording(stages):
+        try:
+            if args.tickers:
+                tickers = [t for t in args.tickers.split(',') if t.strip()]
+                with ThreadPoolExecutor(max_workers=args.fetch_workers) as executor:
+                    response = predict_batch(batcher, registry, tickers, executor, horizon=args.horizon,
+                                             uncertainty=args.uncertainty)
+            else:
+                response = predict_request(batcher, registry, {'ticker': args.ticker, 'data': args.data,
+                                                               'horizon': args.horizon,
+                                                               'uncertainty': args.uncertainty})
+        except PredictionError as e:
+            response = {"error": str(e)}
+    response['timings'] = stages.as_dict()
+    print_json(response)
 
 
 if __name__ == '__main__':
@@ -421,13 +947,7 @@ if __name__ == '__main__':
         main()
     except Exception as e:
         # Capture full traceback and print a single structured JSON error
-        full_trace = traceback.format_exc()
-        message = str(e)
-        payload = {
-            "error_code": "500_CRITICAL_PYTHON_CRASH",
-            "message": message,
-            "traceback": full_trace
-        }
+        payload = crash_payload(e)
         # Use print_json to ensure consistent, flushed JSON output
         try:
             print_json(payload)
@@ -435,4 +955,4 @@ if __name__ == '__main__':
             # Fallback to raw print if print_json fails
             print(json.dumps(payload))
         # Exit with non-zero code to signal failure to caller
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -0,0 +1,256 @@
+const readline = require('readline');
+const { spawn } = require('child_process');
+const frames = require('./frames');
+
+const RESPAWN_DELAY = 1000; // ms to wait before restarting a crashed worker
+// Priority lanes, highest first: interactive requests are always dispatched before batch work
+const LANES = ['interactive', 'batch'];
+
+// A single long-lived `predict.py --serve` process. Requests are written to stdin as
+// newline-delimited JSON or binary frames (options.transport) and matched to responses by `id`.
+class PredictorWorker {
+  constructor(pool, index) {
+    this.pool = pool;
+    this.index = index;
+    this.ready = false;
+    this.inFlight = new Map();
+    this.process = null;
+    this.stderrTail = '';
+  }
+
+  start() {
+    const { pythonExe, args, transport = 'json' } = this.pool.options;
+    this.ready = false;
+    this.stderrTail = '';
+    this.binary = transport === 'binary';
+    this.process = spawn(pythonExe, [...args, '--serve', '--transport', transport], { stdio: ['pipe', 'pipe', 'pipe'] });
+    console.log(`Predictor worker ${this.index} started with PID: ${this.process.pid}`);
+
+    if (this.binary) {
+      const reader = new frames.FrameReader();
+      this.process.stdout.on('data', (chunk) => {
+        for (const message of reader.push(chunk)) this.handleMessage(message);
+      });
+    } else {
+      const lines = readline.createInterface({ input: this.process.stdout });
+      lines.on('line', (line) => this.handleLine(line.trim()));
+    }
+
+    this.process.stderr.on('data', (data) => {
+      // Keep only the tail of stderr for crash diagnostics
+      this.stderrTail = (this.stderrTail + data.toString()).slice(-4000);
+    });
+
+    this.process.on('exit', (code) => this.handleExit(code));
+    this.process.on('error', (err) => {
+      this.failAll(new Error(`ERROR_PROCESS_SPAWN: Failed to start Python process: ${err.message}`));
+    });
+  }
+
+  handleLine(line) {
+    if (!line) return;
+    let parsed;
+    try {
+      parsed = JSON.parse(line);
+    } catch (e) {
+      // Stray non-JSON output (e.g. library banners) is ignored
+      return;
+    }
+    this.handleMessage(parsed);
+  }
+
+  handleMessage(parsed) {
+    if (!parsed || typeof parsed !== 'object') return;
+    if (parsed.ready) {
+      this.ready = true;
+      if (this.pool.options.onReady) this.pool.options.onReady(this, parsed);
+      this.pool.drain();
+      return;
+    }
+
+    const pending = this.inFlight.get(parsed.id);
+    if (!pending) {
+      // A worker-level crash payload has no id; it is followed by the process exit
+      if (parsed.error_code) this.startupError = parsed;
+      return;
+    }
+    this.inFlight.delete(parsed.id);
+    clearTimeout(pending.timeoutId);
+    pending.resolve(parsed);
+    this.pool.drain();
+  }
+
+  handleExit(code) {
+    this.ready = false;
+    const crash = this.startupError;
+    this.startupError = null;
+    if (crash) {
+      // Surface the structured crash (e.g. model failed to load) to every waiter
+      this.failAll(null, crash);
+    } else {
+      this.failAll(new Error(`ERROR_PYTHON_FAILURE: Process exited with code ${code}\n${this.stderrTail}`));
+    }
+    if (!this.pool.closed) {
+      setTimeout(() => this.start(), RESPAWN_DELAY);
+    }
+  }
+
+  failAll(err, payload) {
+    for (const pending of this.inFlight.values()) {
+      clearTimeout(pending.timeoutId);
+      if (payload) pending.resolve(payload);
+      else pending.reject(err);
+    }
+    this.inFlight.clear();
+    if (payload) this.pool.failQueued(payload);
+  }
+
+  send(job) {
+    job.worker = this;
+    this.inFlight.set(job.id, job);
+    // The remaining budget travels with the request so the worker can give up on it as well
+    const message = { ...job.request, id: job.id, deadlineMs: Math.max(0, job.deadline - Date.now()) };
+    this.process.stdin.write(this.binary ? frames.encode(message) : JSON.stringify(message) + '\n');
+  }
+
+  stop() {
+    if (this.process) this.process.kill();
+  }
+}
+
+// Fixed-size pool of predictor workers. Each worker keeps the model in memory,
+// so a request only pays for data fetch and a forward pass.
+//
+// Admission control: concurrency is bounded by size * maxInFlight, and requests beyond that
+// wait in a bounded queue per priority lane (options.maxQueue[lane]). A full lane rejects at
+// once with ERROR_OVERLOADED; a request still queued when its deadline passes is shed with
+// ERROR_DEADLINE_EXCEEDED. Batch work never holds more than options.batchConcurrency worker
+// slots, so interactive requests find room even while a large batch is running.
+class PredictorPool {
+  constructor(options) {
+    this.options = options;
+    this.workers = [];
+    this.queues = Object.fromEntries(LANES.map(lane => [lane, []]));
+    this.nextId = 1;
+    this.closed = false;
+  }
+
+  start() {
+    for (let i = 0; i < this.options.size; i++) {
+      const worker = new PredictorWorker(this, i);
+      this.workers.push(worker);
+      worker.start();
+    }
+  }
+
+  // Resolves with the parsed worker response (which may itself carry an error).
+  // `timeout` is the request's deadline in ms from now; `lane` one of LANES.
+  request(request, { timeout = this.options.requestTimeout, lane = 'interactive' } = {}) {
+    if (this.closed) {
+      return Promise.reject(new Error('ERROR_POOL_CLOSED: Predictor pool has been shut down.'));
+    }
+    const queue = this.queues[lane];
+    if (!queue) {
+      return Promise.reject(new Error(`ERROR_INVALID_INPUT: Unknown priority lane '${lane}'.`));
+    }
+    const maxQueue = (this.options.maxQueue || {})[lane];
+    if (maxQueue !== undefined && queue.length >= maxQueue) {
+      this.shed(lane, 'queue_full');
+      return Promise.reject(new Error(`ERROR_OVERLOADED: The ${lane} queue is full (${queue.length} requests waiting); retry later.`));
+    }
+    return new Promise((resolve, reject) => {
+      const startTime = Date.now();
+      const job = { id: this.nextId++, request, resolve, reject, worker: null, lane, startTime, deadline: startTime + timeout };
+      job.timeoutId = setTimeout(() => {
+        const elapsed = ((Date.now() - startTime) / 1000).toFixed(1);
+        if (!job.worker) {
+          queue.splice(queue.indexOf(job), 1);
+          this.expire(job);
+          return;
+        }
+        console.error(`Python script timeout after ${elapsed}s`);
+        // A late answer for this id is simply dropped by the worker
+        job.worker.inFlight.delete(job.id);
+        reject(new Error(`ERROR_TIMEOUT: Python script execution timed out after ${elapsed} seconds`));
+        this.drain();
+      }, timeout);
+      queue.push(job);
+      this.drain();
+    });
+  }
+
+  // Never reached a worker: shed without spending any Python time on it
+  expire(job) {
+    clearTimeout(job.timeoutId);
+    this.shed(job.lane, 'deadline');
+    const elapsed = ((Date.now() - job.startTime) / 1000).toFixed(1);
+    job.reject(new Error(`ERROR_DEADLINE_EXCEEDED: Request waited ${elapsed}s in the ${job.lane} queue without a free worker.`));
+  }
+
+  shed(lane, reason) {
+    if (this.options.onShed) this.options.onShed(lane, reason);
+  }
+
+  queued(lane) {
+    return lane ? this.queues[lane].length : LANES.reduce((sum, name) => sum + this.queues[name].length, 0);
+  }
+
+  inFlight(lane) {
+    let count = 0;
+    for (const worker of this.workers) {
+      for (const job of worker.inFlight.values()) if (!lane || job.lane === lane) count += 1;
+    }
+    return count;
+  }
+
+  // Hand queued jobs to the least busy ready workers, highest priority lane first
+  drain() {
+    const maxInFlight = this.options.maxInFlight;
+    for (const lane of LANES) {
+      const queue = this.queues[lane];
+      let laneInFlight = lane === 'batch' ? this.inFlight(lane) : 0;
+      while (queue.length > 0) {
+        if (lane === 'batch' && laneInFlight >= this.options.batchConcurrency) break;
+        let target = null;
+        for (const worker of this.workers) {
+          if (!worker.ready || worker.inFlight.size >= maxInFlight) continue;
+          if (!target || worker.inFlight.size < target.inFlight.size) target = worker;
+        }
+        if (!target) return;
+        const job = queue.shift();
+        if (job.deadline <= Date.now()) {
+          // Its timer has not fired yet, but the budget is already spent
+          this.expire(job);
+          continue;
+        }
+        if (this.options.onDispatch) this.options.onDispatch(lane, Date.now() - job.startTime);
+        target.send(job);
+        laneInFlight += 1;
+      }
+    }
+  }
+
+  failQueued(payload) {
+    // Only fail queued work when no worker is able to come up
+    if (this.workers.some(worker => worker.ready)) return;
+    for (const lane of LANES) {
+      for (const job of this.queues[lane].splice(0)) {
+        clearTimeout(job.timeoutId);
+        job.resolve(payload);
+      }
+    }
+  }
+
+  close() {
+    this.closed = true;
+    for (const worker of this.workers) worker.stop();
+    for (const lane of LANES) {
+      for (const job of this.queues[lane].splice(0)) {
+        clearTimeout(job.timeoutId);
+        job.reject(new Error('ERROR_POOL_CLOSED: Predictor pool has been shut down.'));
+      }
+    }
+  }
+}
+
+module.exports = { PredictorPool, LANES };
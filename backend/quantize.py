@@ -0,0 +1,185 @@
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+import threading
+import numpy as np
+
+# Quantized TFLite variants of a trained model, written next to its model.keras:
+#   model_float16.tflite  float16 weights (half the size), float32 compute
+#   model_int8.tflite     int8 weights with dynamic-range quantized LSTM/Dense kernels
+# predict.py serves them with `--engine tflite-float16` / `--engine tflite-int8`.
+# Conversion needs TensorFlow; serving only needs a TFLite interpreter.
+
+MODES = ('float16', 'int8')
+# A variant passes parity when its test RMSE is at most this much worse than the float model...
+MAX_RMSE_INCREASE = 0.02
+# ...and it loses at most this many percentage points of directional accuracy
+MAX_DA_DROP = 1.0
+
+
+def tflite_path(model_path, mode):
+    """Location of the `mode` variant for a model file"""
+    return os.path.join(os.path.dirname(model_path), f"model_{mode}.tflite")
+
+
+def convert(model, mode):
+    """Quantized TFLite flatbuffer (bytes) for a loaded Keras model"""
+    if mode not in MODES:
+        raise ValueError(f"Unknown quantization mode '{mode}', expected one of {', '.join(MODES)}")
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    # Optimize.DEFAULT alone is dynamic-range quantization: int8 weights, float activations
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    return converter.convert()
+
+
+def write_variant(content, model_path, mode):
+    path = tflite_path(model_path, mode)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(content)
+    os.replace(tmp, path)
+    return path
+
+
+def _interpreter_class():
+    # The standalone runtimes keep TensorFlow out of the predictor workers
+    for module in ('ai_edge_litert.interpreter', 'tflite_runtime.interpreter'):
+        try:
+            return importlib.import_module(module).Interpreter
+        except ImportError:
+            continue
+    try:
+        import tensorflow as tf
+    except ImportError:
+        raise RuntimeError("No TFLite interpreter available; install ai-edge-litert or tflite-runtime")
+    return tf.lite.Interpreter
+
+
+class TFLiteModel:
+    """
+    Drop-in stand-in for the Keras model in predict.py backed by a TFLite interpreter.
+    Batches are zero-padded to the next power of two so a worker only re-allocates
+    tensors for a handful of distinct batch sizes.
+    """
+
+    def __init__(self, path=None, content=None, num_threads=None):
+        self.path = path
+        kwargs = {'model_content': content} if content is not None else {'model_path': path}
+        self.interpreter = _interpreter_class()(num_threads=num_threads, **kwargs)
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.batch = None
+        # One interpreter holds one set of tensors; calls from several threads take turns
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, model_path, mode):
+        path = tflite_path(model_path, mode)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{os.path.basename(path)} not found next to {model_path}; "
+                                    f"run `python quantize.py --model {model_path} --modes {mode}`")
+        return cls(path)
+
+    def predict_on_batch(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        rows = len(X)
+        bucket = 1 << max(0, rows - 1).bit_length()
+        if bucket != rows:
+            X = np.concatenate([X, np.zeros((bucket - rows,) + X.shape[1:], dtype=np.float32)])
+        with self._lock:
+            if self.batch != bucket:
+                self.interpreter.resize_tensor_input(self.input['index'], list(X.shape))
+                self.interpreter.allocate_tensors()
+                self.batch = bucket
+            self.interpreter.set_tensor(self.input['index'], X)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self.output['index'])[:rows].copy()
+
+    def predict(self, X, verbose=0, batch_size=1024):
+        """Same signature subset as keras.Model.predict"""
+        X = np.asarray(X, dtype=np.float32)
+        return np.concatenate([self.predict_on_batch(X[i:i + batch_size]) for i in range(0, len(X), batch_size)])
+
+
+def _evaluate(predict_fn, X, y, scaler_min, scaler_max, batch_size):
+    start = time.perf_counter()
+    pred = np.concatenate([np.asarray(predict_fn(X[i:i + batch_size]), dtype=np.float64)[:, 0]
+                           for i in range(0, len(X), batch_size)])
+    elapsed = time.perf_counter() - start
+    scale = scaler_max - scaler_min
+    pred_price, true_price = pred * scale + scaler_min, y * scale + scaler_min
+    last = X[:, -1, 0].astype(np.float64)
+    return pred, {
+        'rmse': float(np.sqrt(np.mean((pred_price - true_price) ** 2))),
+        'mae': float(np.mean(np.abs(pred_price - true_price))),
+        'directionalAccuracy': float(np.mean(np.sign(pred - last) == np.sign(y - last)) * 100),
+        'msPerWindow': elapsed * 1000.0 / max(1, len(X)),
+    }
+
+
+def parity_report(model, variants, X, y, scaler_min, scaler_max, batch_size=256):
+    """
+    Accuracy of each quantized variant ({mode: flatbuffer bytes}) against the float model on
+    normalized test windows X [n, 60, 3] with normalized next-close targets y [n].
+    """
+    reference, baseline = _evaluate(model.predict_on_batch, X, y, scaler_min, scaler_max, batch_size)
+    report = {'samples': int(len(X)), 'float32': baseline, 'variants': {}}
+    for mode, content in variants.items():
+        quantized = TFLiteModel(content=content)
+        pred, metrics = _evaluate(quantized.predict_on_batch, X, y, scaler_min, scaler_max, batch_size)
+        diff = np.abs(pred - reference)
+        metrics.update({
+            'sizeBytes': len(content),
+            'maxAbsDiff': float(diff.max()) if len(diff) else 0.0,
+            'meanAbsDiff': float(diff.mean()) if len(diff) else 0.0,
+            'rmseIncrease': metrics['rmse'] / baseline['rmse'] - 1.0 if baseline['rmse'] else 0.0,
+            'directionalAccuracyDrop': baseline['directionalAccuracy'] - metrics['directionalAccuracy'],
+        })
+        metrics['ok'] = bool(metrics['rmseIncrease'] <= MAX_RMSE_INCREASE and
+                             metrics['directionalAccuracyDrop'] <= MAX_DA_DROP)
+        report['variants'][mode] = metrics
+    return report
+
+
+def export_variants(model, modes):
+    """{mode: flatbuffer} for every mode that converts; failures are reported and skipped"""
+    variants = {}
+    for mode in modes:
+        try:
+            variants[mode] = convert(model, mode)
+        except Exception as e:
+            print(f"TFLite {mode} export skipped or failed: {e}")
+    return variants
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export quantized TFLite variants of a model and check parity.')
+    parser.add_argument('--model', default=os.path.join(os.path.dirname(__file__), 'model', 'model.keras'))
+    parser.add_argument('--modes', default=','.join(MODES), help='Comma-separated variants to export')
+    parser.add_argument('--samples', type=int, default=2048, help='Random windows compared against the float model')
+    args = parser.parse_args()
+
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(args.model)
+    variants = export_variants(model, [m.strip() for m in args.modes.split(',') if m.strip()])
+    for mode, content in variants.items():
+        print(f"Wrote {write_variant(content, args.model, mode)}", file=sys.stderr)
+
+    # Without the training split, compare on random windows in the normalized input range
+    _, steps, features = model.input_shape
+    X = np.random.default_rng(0).random((args.samples, steps, features), dtype=np.float32)
+    report = parity_report(model, variants, X, X[:, -1, 0], 0.0, 1.0)
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if all(v['ok'] for v in report['variants'].values()) else 1)
+
+
+if __name__ == '__main__':
+    main()
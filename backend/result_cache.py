@@ -0,0 +1,90 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from frames import json_default
+
+# Prediction results keyed by (ticker, last bar, model version). A prediction cannot change
+# until a new bar arrives or a new model is published, so identical dashboard refreshes
+# are answered without rerunning indicators and inference.
+RESULT_CACHE_SIZE = int(os.environ.get('PREDICT_RESULT_CACHE_SIZE', 2048))
+RESULT_CACHE_DB = os.environ.get('PREDICT_RESULT_CACHE_DB') or None  # shared SQLite file across workers
+RESULT_CACHE_MAX_AGE = 24 * 3600  # SQLite rows older than this are pruned
+PRUNE_INTERVAL = 600
+
+
+def result_key(ticker, last_time, last_close, model_version, horizon=1, samples=0):
+    """
+    Cache key for a ticker prediction. The last close is part of the key because the
+    newest bar of an open session is revised until the session closes. `samples` is the
+    Monte Carlo dropout sample count of a request with uncertainty bands.
+    """
+    key = f"{ticker}|{last_time}|{last_close!r}|{model_version}"
+    if horizon != 1:
+        key = f"{key}|h{horizon}"
+    return key if not samples else f"{key}|mc{samples}"
+
+
+class ResultCache:
+    """
+    Thread-safe in-memory LRU of response payloads with an optional SQLite table shared by
+    every predictor process. Memory misses fall through to SQLite and are promoted.
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_SIZE, db_path=RESULT_CACHE_DB, max_age=RESULT_CACHE_MAX_AGE):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.max_age = max_age
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._last_prune = 0.0
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            # WAL lets several workers read while one writes
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, payload TEXT NOT NULL, created REAL NOT NULL)')
+
+    def get(self, key):
+        """Return (payload, created, source) or None"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry[0], entry[1], 'memory'
+            if self._db is None:
+                return None
+            try:
+                row = self._db.execute('SELECT payload, created FROM results WHERE key = ?', (key,)).fetchone()
+            except sqlite3.Error:
+                return None
+            if row is None:
+                return None
+            payload = json.loads(row[0])
+            self._remember(key, payload, row[1])
+            return payload, row[1], 'sqlite'
+
+    def put(self, key, payload):
+        created = time.time()
+        with self._lock:
+            self._remember(key, payload, created)
+            if self._db is None:
+                return
+            try:
+                self._db.execute('INSERT OR REPLACE INTO results (key, payload, created) VALUES (?, ?, ?)',
+                                 (key, json.dumps(payload, default=json_default), created))
+                if created - self._last_prune > PRUNE_INTERVAL:
+                    self._last_prune = created
+                    self._db.execute('DELETE FROM results WHERE created < ?', (created - self.max_age,))
+            except sqlite3.Error:
+                # The shared table is an optimization; a locked or broken DB must not fail predictions
+                pass
+
+    def _remember(self, key, payload, created):
+        self.entries[key] = (payload, created)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
@@ -0,0 +1,243 @@
+const express = require('express');
+const { loadModel, predictBatch } = require('./model');
+const metrics = require('./metrics');
+
+// Live prediction feed over Server-Sent Events. Clients subscribe to tickers with
+// GET /api/stream?tickers=AAPL,MSFT and receive a `prediction` event whenever a ticker's
+// prediction changes (a new bar arrived or a new model version was published).
+// One scheduler refreshes the union of all subscribed tickers with a single batch
+// request per tick, so every client watching a ticker shares the same computation.
+
+const REFRESH_MS = Number(process.env.PREDICT_FEED_INTERVAL_MS) || 30000; // how often subscribed tickers are re-checked
+const HEARTBEAT_MS = 15000; // keeps proxies from closing idle streams
+const MAX_STREAM_TICKERS = 50; // per subscription
+const MAX_FEED_TICKERS = 1000; // across all subscriptions, matches the batch endpoint limit
+const TICKER_PATTERN = /^[A-Z0-9.\-^=]{1,15}$/;
+
+async function predictTickers(tickers, options) {
+  await loadModel();
+  return predictBatch(tickers, options);
+}
+
+class PredictionFeed {
+  constructor({ refreshMs = REFRESH_MS, predict = predictTickers } = {}) {
+    this.refreshMs = refreshMs;
+    this.predict = predict;
+    this.subscribers = new Map(); // ticker -> Set of clients
+    this.latest = new Map(); // ticker -> last published { event, data }
+    this.timer = null;
+    this.refreshing = null;
+    this.rerun = false;
+    this.pendingTimer = null;
+  }
+
+  tickers() {
+    return [...this.subscribers.keys()];
+  }
+
+  clientCount() {
+    const clients = new Set();
+    for (const set of this.subscribers.values()) for (const client of set) clients.add(client);
+    return clients.size;
+  }
+
+  // client: { send(event, data) }. Returns an unsubscribe function.
+  subscribe(client, tickers) {
+    // Checked for the whole request up front, so a rejected client is never left subscribed
+    const added = new Set(tickers.filter(ticker => !this.subscribers.has(ticker))).size;
+    if (this.subscribers.size + added > MAX_FEED_TICKERS) {
+      throw new Error(`ERROR_INVALID_INPUT: The feed already tracks ${this.subscribers.size} of at most ${MAX_FEED_TICKERS} tickers.`);
+    }
+    const fresh = [];
+    for (const ticker of tickers) {
+      if (!this.subscribers.has(ticker)) {
+        this.subscribers.set(ticker, new Set());
+        fresh.push(ticker);
+      }
+      this.subscribers.get(ticker).add(client);
+      // Late subscribers get the current prediction right away
+      const latest = this.latest.get(ticker);
+      if (latest) client.send(latest.event, latest.data);
+    }
+
+    if (!this.timer) {
+      this.timer = setInterval(() => this.refresh(), this.refreshMs);
+    }
+    if (fresh.length > 0) this.scheduleSoon();
+
+    return () => this.unsubscribe(client, tickers);
+  }
+
+  unsubscribe(client, tickers) {
+    for (const ticker of tickers) {
+      const set = this.subscribers.get(ticker);
+      if (!set) continue;
+      set.delete(client);
+      if (set.size === 0) {
+        this.subscribers.delete(ticker);
+        this.latest.delete(ticker);
+      }
+    }
+    if (this.subscribers.size === 0 && this.timer) {
+      clearInterval(this.timer);
+      this.timer = null;
+    }
+  }
+
+  // Coalesce subscriptions arriving together into one early refresh
+  scheduleSoon() {
+    if (this.pendingTimer) return;
+    this.pendingTimer = setTimeout(() => {
+      this.pendingTimer = null;
+      this.refresh();
+    }, 50);
+  }
+
+  // One batch request (concurrent fetches + batched inference in a worker) for every subscribed ticker
+  async refresh() {
+    if (this.refreshing) {
+      // A tick is already running; run once more when it finishes so new tickers are not missed
+      this.rerun = true;
+      return this.refreshing;
+    }
+    const tickers = this.tickers();
+    if (tickers.length === 0) return null;
+
+    this.refreshing = (async () => {
+      feedRefreshes.inc();
+      let result;
+      try {
+        result = await this.predict(tickers, { includeSeries: false });
+      } catch (err) {
+        this.broadcast(tickers, 'error', { error: err.message });
+        return;
+      }
+      for (const item of result.results) {
+        if (this.subscribers.has(item.ticker)) this.publish(item);
+      }
+    })();
+
+    try {
+      await this.refreshing;
+    } finally {
+      this.refreshing = null;
+    }
+    if (this.rerun) {
+      this.rerun = false;
+      return this.refresh();
+    }
+    return null;
+  }
+
+  // Push a batch result item unless it matches what subscribers already have
+  publish(item) {
+    const previous = this.latest.get(item.ticker);
+    let update;
+    if (item.error) {
+      if (previous && previous.event === 'error' && previous.data.error === item.error) return;
+      update = { event: 'error', data: { ticker: item.ticker, error: item.error } };
+    } else {
+      // Unchanged bar and model give the same prediction: nothing to push
+      if (previous && previous.event === 'prediction' && previous.data.prediction === item.predicted &&
+          previous.data.lastClose === item.lastClose && previous.data.modelVersion === (item.modelVersion || null)) return;
+      update = {
+        event: 'prediction',
+        data: {
+          ticker: item.ticker,
+          prediction: item.predicted,
+          lastClose: item.lastClose,
+          modelVersion: item.modelVersion || null,
+          updatedAt: new Date().toISOString(),
+        },
+      };
+    }
+    this.latest.set(item.ticker, update);
+    this.broadcast([item.ticker], update.event, update.data);
+  }
+
+  broadcast(tickers, event, data) {
+    // A client subscribed to several of `tickers` still gets the event once
+    const clients = new Set();
+    for (const ticker of tickers) {
+      for (const client of this.subscribers.get(ticker) || []) clients.add(client);
+    }
+    for (const client of clients) client.send(event, data);
+  }
+
+  close() {
+    clearInterval(this.timer);
+    clearTimeout(this.pendingTimer);
+    this.timer = null;
+    this.subscribers.clear();
+    this.latest.clear();
+  }
+}
+
+const feedRefreshes = metrics.register(new metrics.Counter(
+  'predict_feed_refreshes_total', 'Batched refreshes run by the streaming prediction feed.'));
+
+const feed = new PredictionFeed();
+
+metrics.register(new metrics.Gauge('predict_feed_subscriptions', 'Streaming feed clients and tickers.', () => [
+  [{ kind: 'clients' }, feed.clientCount()],
+  [{ kind: 'tickers' }, feed.subscribers.size],
+]));
+
+function parseTickers(value) {
+  const tickers = [...new Set(String(value || '').split(',').map(t => t.trim().toUpperCase()).filter(Boolean))];
+  if (tickers.length === 0) {
+    throw new Error('ERROR_INVALID_INPUT: Query must include tickers, e.g. ?tickers=AAPL,MSFT');
+  }
+  if (tickers.length > MAX_STREAM_TICKERS) {
+    throw new Error(`ERROR_INVALID_INPUT: At most ${MAX_STREAM_TICKERS} tickers are allowed per stream.`);
+  }
+  const invalid = tickers.filter(t => !TICKER_PATTERN.test(t));
+  if (invalid.length > 0) {
+    throw new Error(`ERROR_INVALID_INPUT: Invalid ticker symbol(s): ${invalid.join(', ')}`);
+  }
+  return tickers;
+}
+
+const router = express.Router();
+
+// GET /api/stream?tickers=AAPL,MSFT — text/event-stream of `prediction` and `error` events
+router.get('/api/stream', (req, res) => {
+  let tickers;
+  try {
+    tickers = parseTickers(req.query.tickers);
+  } catch (err) {
+    const [code, ...rest] = err.message.split(':');
+    return res.status(400).json({ error: rest.join(':').trim(), code });
+  }
+
+  res.set({
+    'Content-Type': 'text/event-stream',
+    'Cache-Control': 'no-cache',
+    Connection: 'keep-alive',
+    'X-Accel-Buffering': 'no',
+  });
+  res.flushHeaders();
+
+  const client = {
+    send(event, data) {
+      res.write(`event: ${event}\ndata: ${JSON.stringify(data)}\n\n`);
+    },
+  };
+  client.send('subscribed', { tickers, refreshMs: feed.refreshMs });
+
+  let unsubscribe;
+  try {
+    unsubscribe = feed.subscribe(client, tickers);
+  } catch (err) {
+    client.send('error', { error: err.message });
+    return res.end();
+  }
+  const heartbeat = setInterval(() => res.write(': ping\n\n'), HEARTBEAT_MS);
+
+  req.on('close', () => {
+    clearInterval(heartbeat);
+    unsubscribe();
+  });
+});
+
+module.exports = { router, feed, PredictionFeed };
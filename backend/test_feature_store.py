@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Checks for feature_store.py on seeded random-walk closes: appends to the published
+# generation, rewrites into a new one, readers that still hold the previous generation,
+# and reopening a store (including a full `ingest` run on the synthetic data source).
+# Run with `python backend/test_feature_store.py`.
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import feature_store as fs
+from indicators import compute_features
+
+SEED = 0
+
+
+def history(n=300, seed=SEED):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2023-01-02', periods=n).values
+    return dates, 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, n)))
+
+
+def publish(root, entries):
+    """Replace the manifest like `ingest` does; its mtime always moves so readers re-read it"""
+    manifest = dict(fs.empty_manifest(), tickers=dict(entries))
+    path = os.path.join(root, fs.MANIFEST)
+    previous = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+    mtime = max(os.stat(path).st_mtime_ns, previous + 1)
+    os.utime(path, ns=(mtime, mtime))
+
+
+def expected_rows(closes):
+    # Features are computed on the float32 closes the store keeps
+    return compute_features(closes.astype(np.float32).astype(np.float64)).astype(np.float32)
+
+
+def files(root, ticker):
+    return sorted(os.listdir(os.path.join(root, ticker)))
+
+
+def check_append(root):
+    dates, closes = history()
+    first = fs.ingest_ticker(root, 'AAA', None, dates[:250], closes[:250])
+    publish(root, {'AAA': first})
+    reader = fs.FeatureStore(root)
+    before = np.array(reader.series('AAA')[1])
+
+    appended = fs.ingest_ticker(root, 'AAA', first, dates[:260], closes[:260])
+    assert appended['generation'] == first['generation'] and appended['rows'] == 260, appended
+    # Unpublished rows stay invisible, and the published ones are not touched
+    old_dates, old_rows = reader.series('AAA')
+    assert len(old_dates) == 250 and np.array_equal(old_rows, before)
+    publish(root, {'AAA': appended})
+    new_dates, new_rows = reader.series('AAA')
+    assert np.array_equal(new_dates, dates[:260].astype('datetime64[ns]'))
+    assert np.allclose(new_rows, expected_rows(closes[:260]), rtol=1e-5, atol=1e-5)
+    # Nothing new: same files, only the check time moves
+    again = fs.ingest_ticker(root, 'AAA', appended, dates[:260], closes[:260])
+    assert {k: v for k, v in again.items() if k != 'updatedAt'} == {k: v for k, v in appended.items()
+                                                                    if k != 'updatedAt'}
+    return appended
+
+
+def check_rewrite(root, entry):
+    dates, closes = history()
+    reader = fs.FeatureStore(root)
+    old_dates, old_rows = reader.series('AAA')
+    snapshot = np.array(old_rows)
+
+    # The last bar was revised (still trading at the previous run): a new generation
+    revised = closes[:260].copy()
+    revised[-1] *= 1.01
+    rewritten = fs.ingest_ticker(root, 'AAA', entry, dates[:260], revised)
+    assert rewritten['generation'] == entry['generation'] + 1, rewritten
+    assert len(files(root, 'AAA')) == 4
+    # Until published, readers keep reading the old generation unchanged
+    assert np.array_equal(reader.series('AAA')[1], snapshot)
+
+    # A reader that read the old manifest just before the swap maps files that are then gone
+    stale = fs.FeatureStore(root)
+    stale_manifest = stale.manifest()
+    publish(root, {'AAA': rewritten})
+    fs.remove_stale_generations(root, 'AAA', rewritten['generation'])
+    assert files(root, 'AAA') == sorted(os.path.basename(p) for p in fs._paths(root, 'AAA', rewritten['generation']))
+    pending = [stale_manifest]
+    current = stale.manifest
+    stale.manifest = lambda: pending.pop() if pending else current()
+    assert np.isclose(stale.series('AAA')[1][-1, 0], np.float32(revised[-1]))
+
+    # Arrays mapped before the swap still hold the old generation's rows
+    assert np.array_equal(old_rows, snapshot) and len(old_dates) == 260
+    new_rows = reader.series('AAA')[1]
+    assert np.isclose(new_rows[-1, 0], np.float32(revised[-1]))
+    assert np.allclose(new_rows, expected_rows(revised), rtol=1e-5, atol=1e-5)
+    return rewritten
+
+
+def check_reopen(root, entry):
+    dates, closes = history()
+    revised = closes[:260].copy()
+    revised[-1] *= 1.01
+    reader = fs.FeatureStore(root)
+    window_dates, window_rows = reader.window('AAA', 60)
+    assert np.array_equal(window_dates, dates[200:260].astype('datetime64[ns]'))
+    assert np.allclose(window_rows, expected_rows(revised)[-60:], rtol=1e-5, atol=1e-5)
+    assert reader.window('AAA', 261) is None and reader.series('BBB') is None
+    assert fs.FeatureStore(root, max_age=0.0).window('AAA', 60) is None
+
+
+def check_ingest(root):
+    # Two runs over the synthetic source: the second appends or finds nothing new, and only the
+    # published generation's files are left
+    for _ in range(2):
+        failed = fs.ingest(['AAA', 'BBB'], root, years=1, source_spec='synthetic', workers=2)
+        assert not failed, failed
+        manifest = fs.load_manifest(root)
+        for ticker in ('AAA', 'BBB'):
+            generation = manifest['tickers'][ticker]['generation']
+            assert files(root, ticker) == sorted(os.path.basename(p) for p in fs._paths(root, ticker, generation))
+    reader = fs.FeatureStore(root)
+    assert sorted(reader.tickers()) == ['AAA', 'BBB']
+    for ticker in ('AAA', 'BBB'):
+        dates, rows = reader.series(ticker)
+        assert len(dates) == manifest['tickers'][ticker]['rows'] and np.all(np.diff(dates) > np.timedelta64(0))
+        assert np.allclose(rows, expected_rows(rows[:, 0].astype(np.float64)), rtol=1e-5, atol=1e-5)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        entry = check_append(root)
+        entry = check_rewrite(root, entry)
+        check_reopen(root, entry)
+    with tempfile.TemporaryDirectory() as root:
+        check_ingest(root)
+    print('OK: feature store append, rewrite, stale readers and reopen')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Parity checks for indicators.py: the vectorized batch path against a pandas reference of
+# what predict.py computed with pandas_ta (ta.rsi(length=14), ta.macd(12, 26, 9), then
+# ffill/bfill), and the streaming paths (IndicatorState commit/preview, IndicatorEngine,
+# IndicatorRollout) against the batch path. When pandas_ta is installed its output is
+# checked too. Run with `python backend/test_indicators.py`.
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from indicators import (compute_features, IndicatorState, IndicatorEngine, IndicatorRollout,
+                        rollout_state_from_closes, RSI_LENGTH, MACD_FAST, MACD_SLOW, MACD_SIGNAL)
+
+SEED = 0
+TOLERANCE = 1e-8
+
+
+def random_closes(n, seed=SEED):
+    rng = np.random.default_rng(seed)
+    closes = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, n)))
+    # A flat stretch, where RSI is undefined and gets forward filled
+    closes[n // 2:n // 2 + 20] = closes[n // 2]
+    return closes
+
+
+def reference_features(closes):
+    """pandas_ta's RSI (Wilder RMA) and SMA-seeded MACD EMAs, filled like the original predict.py"""
+    close = pd.Series(closes)
+    delta = close.diff()
+    up = delta.clip(lower=0).ewm(alpha=1.0 / RSI_LENGTH, adjust=False).mean()
+    down = (-delta).clip(lower=0).ewm(alpha=1.0 / RSI_LENGTH, adjust=False).mean()
+
+    def ema(series, length):
+        seeded = series.copy()
+        seeded.iloc[:length - 1] = np.nan
+        seeded.iloc[length - 1] = series.iloc[:length].mean()
+        return seeded.ewm(span=length, adjust=False).mean()
+
+    df = pd.DataFrame({'Close': close, 'RSI': 100.0 * up / (up + down),
+                       'MACD': ema(close, MACD_FAST) - ema(close, MACD_SLOW)})
+    return df.ffill().bfill().to_numpy()
+
+
+def pandas_ta_features(closes):
+    import pandas_ta as ta
+    df = pd.DataFrame({'Close': closes})
+    df['RSI'] = ta.rsi(df['Close'], length=RSI_LENGTH)
+    macd = ta.macd(df['Close'], fast=MACD_FAST, slow=MACD_SLOW, signal=MACD_SIGNAL)
+    df['MACD'] = macd[next(col for col in macd.columns if col.startswith('MACD_'))]
+    return df.ffill().bfill().to_numpy()
+
+
+def assert_close(actual, expected, what):
+    diff = np.nanmax(np.abs(np.asarray(actual) - np.asarray(expected)))
+    assert np.array_equal(np.isnan(actual), np.isnan(expected)) and diff <= TOLERANCE, f"{what}: max diff {diff:.3g}"
+
+
+def check_batch():
+    for n in (60, 300, 1000):
+        closes = random_closes(n)
+        assert_close(compute_features(closes), reference_features(closes), f"batch vs reference (n={n})")
+    # A [B, T] stack gives every row what it gets alone
+    stack = np.stack([random_closes(300, seed) for seed in range(4)])
+    batch = compute_features(stack)
+    for row, closes in zip(batch, stack):
+        assert_close(row, compute_features(closes), "stacked batch")
+
+
+def check_pandas_ta():
+    try:
+        import pandas_ta  # noqa: F401
+    except ImportError:
+        print("SKIPPED: pandas_ta is not installed; checked against the pandas reference only")
+        return
+    for n in (60, 300):
+        closes = random_closes(n)
+        assert_close(compute_features(closes), pandas_ta_features(closes), f"batch vs pandas_ta (n={n})")
+
+
+def check_commit_preview():
+    # Seeded from the batch path at several points, then fed bar by bar
+    closes = random_closes(400)
+    timestamps = np.arange(len(closes))
+    for start in (2, 30, 61, 250, 399):
+        state = IndicatorState.from_history(closes[:start], timestamps[:start])
+        for i in range(start - 1, len(closes) - 1):
+            state.commit(float(closes[i]), timestamps[i])
+        assert_close(state.preview(float(closes[-1])), compute_features(closes)[-60:], f"commit/preview from {start}")
+    # With exactly one window of history, warm-up gaps are back filled like the batch path
+    short = random_closes(60)
+    state = IndicatorState.from_history(short, np.arange(60))
+    assert_close(state.preview(float(short[-1])), compute_features(short), "preview of a 60-bar history")
+
+
+def check_engine():
+    # Growing histories resume from the cached state; an adjusted history (dividends and
+    # splits rescale every earlier close) forces a rebuild
+    closes = random_closes(400)
+    timestamps = np.arange(len(closes))
+    engine = IndicatorEngine(window=60)
+    for end in (100, 101, 150, 400):
+        assert_close(engine.features('T', closes[:end], timestamps[:end]), compute_features(closes[:end])[-60:],
+                     f"engine at {end}")
+    revised = closes.copy()
+    revised[:-1] *= 0.98
+    assert_close(engine.features('T', revised, timestamps), compute_features(revised)[-60:], "engine after revision")
+
+
+def check_rollout():
+    # Rolling forward over known closes reproduces the batch indicators of the longer series
+    closes = random_closes(400)
+    steps = 10
+    history, future = closes[:-steps], closes[-steps:]
+    for state_from in ('engine', 'closes'):
+        if state_from == 'engine':
+            _, state = IndicatorEngine(window=60).features('T', history, np.arange(len(history)), with_state=True)
+        else:
+            _, state = rollout_state_from_closes(history)
+        rollout = IndicatorRollout([state])
+        expected = compute_features(closes)[-steps:]
+        for t in range(steps):
+            rsi, macd = rollout.step(future[t:t + 1])
+            assert_close([rsi[0], macd[0]], expected[t, 1:], f"rollout ({state_from}) step {t + 1}")
+
+
+def main():
+    checks = [check_batch, check_pandas_ta, check_commit_preview, check_engine, check_rollout]
+    for check in checks:
+        check()
+    print(f"OK: {len(checks)} indicator checks passed")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
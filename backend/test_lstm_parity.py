@@ -0,0 +1,123 @@
+import os
+import sys
+import json
+import tempfile
+import numpy as np
+
+# Parity checks for the NumPy inference engine. The engine is always checked against a
+# step-by-step reference LSTM written in plain NumPy, on random weights of the training
+# architecture; with TensorFlow installed, the training architecture is also built with a
+# fixed seed, exported and compared with the Keras outputs.
+# Run with `python backend/test_lstm_parity.py`.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lstm_numpy import NumpyLSTMModel, WEIGHTS_FILE
+
+SEED = 0
+TOLERANCE = 1e-4
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def reference_lstm(x, kernel, recurrent_kernel, bias, return_sequences):
+    """One sample and one timestep at a time, straight from the LSTM equations (Keras gate order i, f, c, o)"""
+    outputs = []
+    for sample in x:
+        h = np.zeros(recurrent_kernel.shape[0])
+        c = np.zeros_like(h)
+        sequence = []
+        for x_t in sample:
+            i, f, g, o = np.split(x_t @ kernel + h @ recurrent_kernel + bias, 4)
+            c = _sigmoid(f) * c + _sigmoid(i) * np.tanh(g)
+            h = _sigmoid(o) * np.tanh(c)
+            sequence.append(h)
+        outputs.append(sequence if return_sequences else h)
+    return np.array(outputs)
+
+
+def random_layers(rng, features=3):
+    """Specs and random weights of the training architecture (LSTM 64 -> LSTM 32 -> Dense 1)"""
+    def lstm(inputs, units, return_sequences):
+        spec = {'type': 'lstm', 'units': units, 'activation': 'tanh', 'recurrent_activation': 'sigmoid',
+                'return_sequences': return_sequences}
+        return spec, [rng.normal(0, 0.3, (inputs, 4 * units)), rng.normal(0, 0.3, (units, 4 * units)),
+                      rng.normal(0, 0.1, 4 * units)]
+    dropout = ({'type': 'dropout', 'rate': 0.2}, [])
+    return [lstm(features, 64, True), dropout, lstm(64, 32, False), dropout,
+            ({'type': 'dense', 'units': 1, 'activation': 'linear'}, [rng.normal(0, 0.3, (32, 1)), np.zeros(1)])]
+
+
+def check_reference():
+    """NumPy engine vs the step-by-step reference, no TensorFlow needed"""
+    rng = np.random.default_rng(SEED)
+    layers = random_layers(rng)
+    X = rng.normal(0.5, 0.3, (16, 60, 3))
+    expected = X
+    for spec, weights in layers:
+        if spec['type'] == 'lstm':
+            expected = reference_lstm(expected, *weights, spec['return_sequences'])
+        elif spec['type'] == 'dense':
+            expected = expected @ weights[0] + weights[1]
+    model = NumpyLSTMModel(layers, dtype=np.float64)
+    diff = float(np.abs(model.predict(X) - expected).max())
+    if diff > 1e-10:
+        print(f"FAILED: max |numpy - reference| = {diff:.3g}")
+        return False
+    # Same weights in float32, as served, and reloaded from an exported weights.npz
+    with tempfile.TemporaryDirectory() as directory:
+        arrays = {f"layer{i}_{j}": w for i, (_, weights) in enumerate(layers) for j, w in enumerate(weights)}
+        np.savez(os.path.join(directory, WEIGHTS_FILE), spec=np.array(json.dumps([spec for spec, _ in layers])),
+                 **arrays)
+        served = NumpyLSTMModel.load(os.path.join(directory, 'model.keras'))
+    diff32 = float(np.abs(served.predict(X) - expected).max())
+    if diff32 > TOLERANCE:
+        print(f"FAILED: max |float32 numpy - reference| = {diff32:.3g} exceeds {TOLERANCE}")
+        return False
+    # Dropout is only active when sampling: predictions repeat exactly, samples do not
+    samples = served.sample_on_batch(np.repeat(X[:1], 64, axis=0), np.random.default_rng(SEED))
+    if not np.array_equal(served.predict(X), served.predict(X)) or np.allclose(samples, samples[0]):
+        print("FAILED: dropout is applied to predictions or missing from Monte Carlo samples")
+        return False
+    print(f"OK: NumPy engine matches the reference LSTM (float64 {diff:.2g}, float32 {diff32:.2g})")
+    return True
+
+
+def check_keras():
+    """NumPy engine vs Keras on the training architecture; skipped without TensorFlow"""
+    try:
+        import tensorflow as tf
+        from data_and_train import build_lstm_model
+    except ImportError as e:
+        print(f"SKIPPED: Keras parity, TensorFlow is not available ({e})")
+        return True
+    from lstm_numpy import export_weights, weights_path, parity_report
+
+    tf.keras.utils.set_random_seed(SEED)
+    with tempfile.TemporaryDirectory() as directory:
+        model_path = os.path.join(directory, 'model.keras')
+        # Same [Close, RSI, MACD] input the served models take
+        model = build_lstm_model(input_timesteps=60, input_features=3)
+        model.save(model_path)
+        export_weights(model, weights_path(model_path))
+        report = parity_report(model_path, samples=256, seed=SEED, tolerance=TOLERANCE)
+
+    print(json.dumps(report))
+    if not report['ok']:
+        print(f"FAILED: max |numpy - keras| = {report['maxAbsDiff']:.3g} exceeds {TOLERANCE}")
+        return False
+    print('OK: NumPy engine matches Keras')
+    return True
+
+
+def main():
+    # Both checks run, so one failure does not hide the other
+    results = [check_reference(), check_keras()]
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import os
+import sys
+import numpy as np
+
+# Checks for portfolio requests, rebalancing and allocation (portfolio.py) on fixed
+# weights and seeded random-walk histories; no model or market data needed. Run with `python backend/test_portfolio.py`.
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import portfolio
+import predict
+
+SEED = 0
+
+
+def histories(n, sessions=300, seed=SEED):
+    rng = np.random.default_rng(seed)
+    dates = np.arange(np.datetime64('2020-01-01'), np.datetime64('2020-01-01') + sessions)
+    closes = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.01 + 0.02 * rng.random(n), (sessions, n)), axis=0))
+    return [(dates, closes[:, i]) for i in range(n)]
+
+
+def one_way(weights, current):
+    return 0.5 * np.abs(weights - current).sum()
+
+
+def check_option_validation():
+    # Malformed options are rejected before any ticker is fetched (batcher, registry and
+    # executor are never touched)
+    invalid = [
+        {'lookback': 'x'}, {'lookback': portfolio.MIN_OBSERVATIONS}, {'lookback': 60.5}, {'lookback': True},
+        {'maxWeight': 'a'}, {'maxWeight': 0}, {'maxWeight': 1.5},
+        {'riskAversion': 'z'}, {'riskAversion': -1}, {'riskAversion': float('nan')},
+        {'band': [0.1]}, {'band': -0.01},
+        {'maxTurnover': 'all'}, {'maxTurnover': -0.1}, {'maxTurnover': {}},
+        {'current': [0.5]}, {'current': {'AAA': 'x'}}, {'current': {'AAA': -0.2}},
+    ]
+    for options in invalid:
+        try:
+            predict.predict_portfolio(None, None, dict(tickers=['AAA'], **options), None)
+        except predict.PredictionError as e:
+            assert str(e).startswith('ERROR_INVALID_INPUT:'), (options, str(e))
+        else:
+            raise AssertionError(f"{options} was accepted")
+
+
+def check_band():
+    # Every trade within the band: nothing moves
+    current = np.array([0.48, 0.32, 0.2])
+    weights, _, turnover = portfolio.rebalance(np.array([0.5, 0.3, 0.2]), current, band=0.05)
+    assert np.allclose(weights, current) and turnover == 0.0
+    # The skipped asset keeps its weight and the overshoot comes off the assets that trade
+    current = np.array([0.4, 0.38, 0.22])
+    weights, _, _ = portfolio.rebalance(np.array([0.6, 0.2, 0.2]), current, band=0.03)
+    assert weights[2] == current[2] and np.isclose(weights.sum(), 1.0)
+    assert np.allclose(weights[:2], np.array([0.6, 0.2]) * 0.78 / 0.8)
+
+
+def check_cap():
+    # The weight left over by skipped sells goes to the traders with headroom, never past the cap
+    target, current, cap = np.array([0.4, 0.4, 0.1, 0.1]), np.array([0.2, 0.3, 0.14, 0.36]), 0.4
+    weights, _, _ = portfolio.rebalance(target, current, band=0.05, cap=cap)
+    assert np.isclose(weights.sum(), 1.0) and weights.max() <= cap + 1e-12, weights
+    assert weights[2] == current[2]
+    # No headroom left: every trade is made instead
+    target = np.array([0.25, 0.18, 0.18, 0.18, 0.21])
+    weights, _, _ = portfolio.rebalance(target, np.array([0.5, 0.1, 0.1, 0.1, 0.2]), band=0.1, cap=0.3)
+    assert np.allclose(weights, target)
+
+
+def check_turnover():
+    target, current = np.array([0.0, 0.5, 0.5]), np.array([1.0, 0.0, 0.0])
+    weights, _, turnover = portfolio.rebalance(target, current, max_turnover=0.1)
+    assert np.isclose(turnover, 0.1) and np.isclose(one_way(weights, current), 0.1)
+    assert np.isclose(weights.sum(), 1.0) and np.allclose(weights, [0.9, 0.05, 0.05])
+    # Unnormalized holdings are rescaled before trades are measured
+    _, held, turnover = portfolio.rebalance(target, current * 3.0, max_turnover=0.1)
+    assert np.allclose(held, current) and np.isclose(turnover, 0.1)
+
+
+def check_empty_holdings():
+    # All cash: the target is bought outright, not scaled down by the turnover cap or band
+    target = np.array([0.5, 0.3, 0.2])
+    for band, max_turnover in ((0.0, 0.2), (0.4, None), (0.1, 0.0)):
+        weights, _, turnover = portfolio.rebalance(target, np.zeros(3), band=band, max_turnover=max_turnover)
+        assert np.allclose(weights, target) and np.isclose(turnover, 0.5), (band, max_turnover, weights)
+    tickers = [f"T{i}" for i in range(12)]
+    for current in ({}, {t: 0.0 for t in tickers}, {'ELSEWHERE': 1.0}):
+        allocation = portfolio.allocate(tickers, np.full(12, 100.0), np.linspace(99.0, 103.0, 12), histories(12),
+                                        current=current, max_turnover=0.2)
+        assert np.isclose(sum(allocation['weights'].values()), 1.0), allocation['weights']
+        assert np.isclose(allocation['turnover'], 0.5)
+
+
+def check_allocate():
+    n = 25
+    tickers = [f"T{i}" for i in range(n)]
+    last = np.full(n, 100.0)
+    predicted = 100.0 * (1.0 + np.linspace(-0.01, 0.03, n))
+    mv = portfolio.allocate(tickers, last, predicted, histories(n), max_weight=0.1)
+    weights = np.array(list(mv['weights'].values()))
+    assert mv['converged'] and np.isclose(weights.sum(), 1.0) and weights.max() <= 0.1 + 1e-9, mv['weights']
+    # Risk parity: equal risk contributions on a fully invested book
+    rp = portfolio.allocate(tickers, last, predicted, histories(n), method='risk-parity')
+    contributions = np.array(list(rp['riskContributions'].values()))
+    assert rp['converged'] and np.allclose(contributions, 1.0 / n, atol=1e-4)
+    # Rebalancing from the mean-variance book: turnover cap and cap per asset both hold
+    moved = portfolio.allocate(tickers, last, predicted, histories(n), method='risk-parity', current=mv['weights'],
+                               band=0.005, max_turnover=0.15)
+    assert moved['turnover'] <= 0.15 + 1e-9 and np.isclose(sum(moved['weights'].values()), 1.0)
+    # Too short a history is excluded rather than allocated
+    short = histories(n)
+    short[0] = (short[0][0][-10:], short[0][1][-10:])
+    assert portfolio.allocate(tickers, last, predicted, short)['excluded'] == ['T0']
+
+
+def main():
+    checks = [check_option_validation, check_band, check_cap, check_turnover, check_empty_holdings, check_allocate]
+    for check in checks:
+        check()
+    print(f"OK: {len(checks)} portfolio checks passed")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import os
+import sys
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+# Overload fallback with uncertainty: an ensemble version answering from its baselines
+# alone has no Monte Carlo samples, so responses must say so (`uncertainty: None` plus a
+# reason) and portfolio requests must still allocate. Runs on synthetic prices and a
+# small random NumPy LSTM. Run with `python backend/test_predict_fallback.py`.
+
+os.environ['DATA_SOURCE'] = 'synthetic'
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import predict
+from batcher import MicroBatcher
+from ensemble import Ensemble, NaiveBaseline, EMADriftBaseline
+from lstm_numpy import NumpyLSTMModel
+from model_registry import ModelHandle
+
+SEED = 0
+TICKERS = ['AAA', 'BBB', 'CCC']
+
+
+class StaticRegistry:
+    """Serves one handle for every ticker, like a registry with a single published version"""
+
+    def __init__(self, handle):
+        self.handle = handle
+
+    def get(self, ticker=None):
+        return self.handle
+
+
+def random_model(units=8):
+    rng = np.random.default_rng(SEED)
+    return NumpyLSTMModel([
+        ({'type': 'lstm', 'units': units, 'activation': 'tanh', 'recurrent_activation': 'sigmoid',
+          'return_sequences': False},
+         [rng.normal(0, 0.3, (3, 4 * units)), rng.normal(0, 0.3, (units, 4 * units)), np.zeros(4 * units)]),
+        ({'type': 'dropout', 'rate': 0.2}, []),
+        ({'type': 'dense', 'units': 1, 'activation': 'linear'}, [rng.normal(0, 0.3, (units, 1)), np.zeros(1)]),
+    ])
+
+
+def overloaded_batcher():
+    batcher = MicroBatcher(predict.predict_on_batch, max_wait_ms=0)
+    # Nothing is submitted while falling back, so the backlog stays where it is set
+    batcher.backlog = predict.FALLBACK_BACKLOG
+    return batcher
+
+
+def make_registry():
+    ensemble = Ensemble([NaiveBaseline(), EMADriftBaseline()], weights={'lstm': 0.5, 'naive': 0.25, 'ema': 0.25},
+                        fallback_weights={'naive': 0.5, 'ema': 0.5})
+    return StaticRegistry(ModelHandle('test', 'v1', None, random_model(), 0.0, 1000.0, ensemble=ensemble))
+
+
+def check_single(batcher, registry):
+    for horizon in (1, 5):
+        response = predict.predict_request(batcher, registry, {'ticker': 'AAA', 'horizon': horizon, 'uncertainty': 8})
+        assert response['model'] == 'baseline', response.get('model')
+        assert 'uncertainty' in response and response['uncertainty'] is None
+        assert response['uncertaintyUnavailable']
+
+
+def check_batch(batcher, registry, executor):
+    batch = predict.predict_batch(batcher, registry, TICKERS, executor, horizon=3, uncertainty=True)
+    assert batch['failed'] == 0, batch
+    for result in batch['results']:
+        assert result['uncertainty'] is None and result['uncertaintyUnavailable']
+
+
+def check_portfolio(batcher, registry, executor):
+    for horizon in (1, 3):
+        allocation = predict.predict_portfolio(batcher, registry, {'tickers': TICKERS, 'horizon': horizon,
+                                                                   'uncertainty': True, 'lookback': 60}, executor)
+        assert not allocation['failed'], allocation['failed']
+        assert abs(sum(allocation['weights'].values()) - 1.0) < 1e-6, allocation['weights']
+
+
+def check_sampled_without_fallback(registry):
+    # Same requests on an idle batcher still carry their bands
+    batcher = MicroBatcher(predict.predict_on_batch, max_wait_ms=0)
+    response = predict.predict_request(batcher, registry, {'ticker': 'AAA', 'uncertainty': 8})
+    assert response['model'] == 'ensemble' and response['uncertainty']['samples'] == 8
+    assert 'uncertaintyUnavailable' not in response
+
+
+def main():
+    if predict.FALLBACK_BACKLOG <= 0:
+        print("SKIPPED: PREDICT_FALLBACK_BACKLOG is 0, so the fallback is disabled")
+        return 0
+    predict.PREDICT_ENSEMBLE = True
+    registry = make_registry()
+    batcher = overloaded_batcher()
+    with ThreadPoolExecutor(4) as executor:
+        check_single(batcher, registry)
+        check_batch(batcher, registry, executor)
+        check_portfolio(batcher, registry, executor)
+        check_sampled_without_fallback(registry)
+    print('OK: fallback answers report missing uncertainty and portfolios still allocate')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
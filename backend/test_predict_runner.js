@@ -1,51 +1,182 @@
 const { spawn } = require('child_process');
+const fs = require('fs');
 const path = require('path');
+const frames = require('./frames');
 
-(async function(){
-  const pythonExe = path.join(__dirname, '..', 'stock-env', 'Scripts', 'python.exe');
-  const scriptPath = path.join(__dirname, 'predict.py');
+const pythonExe = process.env.PYTHON_EXE || path.join(__dirname, '..', 'stock-env', 'Scripts', 'python.exe');
+
+// Run a python process, feed it `input` and resolve with { code, stdout, stderr }
+function runPython(args, input) {
+  return new Promise((resolve, reject) => {
+    const proc = spawn(pythonExe, args, { cwd: __dirname });
+    let stdout = '';
+    let stderr = '';
+
+    proc.stdout.on('data', (d) => { stdout += d.toString(); });
+    proc.stderr.on('data', (d) => { stderr += d.toString(); });
+    proc.on('close', (code) => resolve({ code, stdout, stderr }));
+    proc.on('error', reject);
+    proc.stdin.end(input);
+  });
+}
+
+function lastJsonLine(stdout, stderr) {
+  const lines = stdout.split('\n').map(l=>l.trim()).filter(Boolean);
+  const last = lines.pop();
+  if (!last) {
+    console.error('No stdout captured. Stderr:\n', stderr);
+    return null;
+  }
+  try {
+    return JSON.parse(last);
+  } catch (e) {
+    console.error('Failed to parse output:', last);
+    console.error('STDERR:', stderr);
+    return null;
+  }
+}
 
+// A missing model must come back as a structured error, not a Python crash
+async function checkPredictCli() {
   const multivariate = Array.from({length:60}, (_,i)=>[100 + i, 50, 0]);
 
   const args = [
-    scriptPath,
+    path.join(__dirname, 'predict.py'),
     '--data', JSON.stringify(multivariate),
     '--min', '50',
     '--max', '200',
     '--model', path.join(__dirname, 'model', 'nonexistent.keras')
   ];
 
-  const proc = spawn(pythonExe, args, { encoding: 'utf-8' });
-  let stdout = '';
-  let stderr = '';
-
-  proc.stdout.on('data', (d) => { stdout += d.toString(); });
-  proc.stderr.on('data', (d) => { stderr += d.toString(); });
-
-  proc.on('close', (code) => {
-    const lines = stdout.split('\n').map(l=>l.trim()).filter(Boolean);
-    const last = lines.pop();
-    console.log('Exit code:', code);
-    if (last) {
-      try {
-        const parsed = JSON.parse(last);
-        console.log('Parsed output:', parsed);
-        if (parsed.error_code === '500_CRITICAL_PYTHON_CRASH') {
-          console.error('Detected CRITICAL PYTHON CRASH');
-          console.error('Message:', parsed.message);
-          console.error('Traceback:\n', parsed.traceback);
-          process.exit(1);
-        }
-      } catch (e) {
-        console.error('Failed to parse output:', last);
-        console.error('STDERR:', stderr);
-        process.exit(1);
-      }
-    } else {
-      console.error('No stdout captured. Stderr:\n', stderr);
-      process.exit(1);
-    }
+  const { code, stdout, stderr } = await runPython(args, '');
+  console.log('Exit code:', code);
+  const parsed = lastJsonLine(stdout, stderr);
+  if (!parsed) return false;
+  console.log('Parsed output:', parsed);
+  if (parsed.error_code === '500_CRITICAL_PYTHON_CRASH') {
+    console.error('Detected CRITICAL PYTHON CRASH');
+    console.error('Message:', parsed.message);
+    console.error('Traceback:\n', parsed.traceback);
+    return false;
+  }
+  return true;
+}
+
+// Binary frames must keep a series-only batch a list of items while a 60x3 window still
+// travels as one tensor
+async function checkFrameRoundTrip() {
+  const series = Array.from({length:60}, (_,i)=>100 + i);
+  const window = Array.from({length:60}, (_,i)=>[100 + i, 50, 0]);
+  const frame = frames.encode({ op: 'batch', items: [series, series.map(v => v + 1)], data: window });
+
+  const script = [
+    'import sys, json, numpy as np, frames',
+    'm = frames.read_frame(sys.stdin.buffer)',
+    'print(json.dumps({"itemsIsList": isinstance(m["items"], list),',
+    '                  "itemShapes": [list(np.shape(i)) for i in m["items"]],',
+    '                  "dataShape": list(np.shape(m["data"])), "dataIsArray": isinstance(m["data"], np.ndarray)}))',
+  ].join('\n');
+
+  const { code, stdout, stderr } = await runPython(['-c', script], frame);
+  const parsed = lastJsonLine(stdout, stderr);
+  if (!parsed) return false;
+  console.log('Frame round trip:', parsed);
+  const ok = code === 0 && parsed.itemsIsList &&
+    JSON.stringify(parsed.itemShapes) === JSON.stringify([[60], [60]]) &&
+    parsed.dataIsArray && JSON.stringify(parsed.dataShape) === JSON.stringify([60, 3]);
+  if (!ok) {
+    console.error('Binary frame round trip changed the request layout');
+  }
+  return ok;
+}
+
+// The live feed admits a subscription only when all of its new tickers fit under the
+// feed-wide limit (MAX_FEED_TICKERS in stream.js); a rejected client is left subscribed to
+// nothing, and tickers already tracked never count against the limit
+async function checkFeedAdmission() {
+  let PredictionFeed;
+  try {
+    ({ PredictionFeed } = require('./stream'));
+  } catch (err) {
+    if (err.code !== 'MODULE_NOT_FOUND') throw err;
+    console.log(`SKIPPED: feed admission (${err.message.split('\n')[0]})`);
+    return true;
+  }
+  const limit = 1000;
+  const feed = new PredictionFeed({
+    refreshMs: 60000,
+    predict: async (tickers) => ({ results: tickers.map(ticker => ({ ticker, predicted: 101, lastClose: 100 })) }),
   });
+  const client = () => ({ events: [], send(event, data) { this.events.push({ event, data }); } });
+  const symbols = (prefix, count) => Array.from({ length: count }, (_, i) => `${prefix}${i}`);
+  const rejected = (fn) => {
+    try {
+      fn();
+      return false;
+    } catch (err) {
+      return err.message.startsWith('ERROR_INVALID_INPUT:');
+    }
+  };
+
+  const failures = [];
+  const expect = (ok, what) => { if (!ok) failures.push(what); };
+  try {
+    const a = client();
+    const unsubscribeA = feed.subscribe(a, symbols('A', limit - 10));
+    const b = client();
+    expect(rejected(() => feed.subscribe(b, [...symbols('A', 5), ...symbols('B', 11)])),
+      'a subscription past the limit is rejected');
+    expect(feed.tickers().length === limit - 10 && feed.clientCount() === 1 && !feed.subscribers.has('B0'),
+      'a rejected subscription leaves no ticker or client behind');
+    feed.subscribe(b, [...symbols('A', 5), ...symbols('B', 10)]);
+    expect(feed.tickers().length === limit && feed.clientCount() === 2, 'a subscription up to the limit is admitted');
+    const c = client();
+    expect(rejected(() => feed.subscribe(c, ['C0'])), 'a full feed rejects new tickers');
+    feed.subscribe(c, ['A1', 'B1']);
+    expect(feed.clientCount() === 3, 'a full feed still admits tickers it already tracks');
+
+    // Late subscribers get the latest prediction right away
+    await feed.refresh();
+    const d = client();
+    feed.subscribe(d, ['B2']);
+    expect(d.events.length === 1 && d.events[0].event === 'prediction' && d.events[0].data.ticker === 'B2',
+      'a late subscriber receives the latest prediction');
 
-  proc.on('error', (err) => { console.error('Spawn error:', err); process.exit(2); });
+    unsubscribeA();
+    expect(feed.tickers().length === 15 && !feed.latest.has('A10'), 'unsubscribing releases tickers nobody else watches');
+    feed.subscribe(client(), symbols('E', limit - 15));
+    expect(feed.tickers().length === limit, 'released capacity is admitted again');
+  } finally {
+    feed.close();
+  }
+  console.log('Feed admission:', failures.length ? failures : 'ok');
+  return failures.length === 0;
+}
+
+// Every backend/test_*.py script. Each exits non-zero on a failure and prints SKIPPED for
+// the checks whose optional dependency (TensorFlow, pandas_ta) is not installed.
+async function checkPythonTests() {
+  const scripts = fs.readdirSync(__dirname).filter(f => /^test_.*\.py$/.test(f)).sort();
+  let ok = true;
+  for (const script of scripts) {
+    const { code, stdout, stderr } = await runPython([path.join(__dirname, script)], '');
+    console.log(`${script} (exit ${code}):\n${stdout.trim()}`);
+    if (code !== 0) {
+      console.error(stderr);
+      ok = false;
+    }
+  }
+  return ok;
+}
+
+(async function(){
+  try {
+    // Every check runs, so one failure does not hide the others
+    const results = [await checkPredictCli(), await checkFrameRoundTrip(), await checkFeedAdmission(),
+      await checkPythonTests()];
+    process.exit(results.every(Boolean) ? 0 : 1);
+  } catch (err) {
+    console.error('Spawn error:', err);
+    process.exit(2);
+  }
 })();
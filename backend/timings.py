@@ -0,0 +1,82 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# Per-request stage timings. A request installs a StageTimings as the recorder of its
+# thread; code along the prediction path reports into whatever recorder is active, so
+# stages are measured where they happen without threading a timer through every call.
+# Without a recorder (e.g. background model reloads) the helpers do nothing.
+
+_local = threading.local()
+
+
+class StageTimings:
+    """Accumulated milliseconds per stage plus event counters; safe to share across threads"""
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.stages = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, ms):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + ms
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000.0)
+
+    def as_dict(self):
+        """{stage: ms, ..., total: ms, counts: {...}} for the response payload"""
+        with self._lock:
+            result = {name: round(ms, 3) for name, ms in self.stages.items()}
+            result['total'] = round((time.perf_counter() - self.started) * 1000.0, 3)
+            if self.counts:
+                result['counts'] = dict(self.counts)
+        return result
+
+
+def current():
+    return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def recording(timings):
+    """Make `timings` the recorder of the calling thread for the duration of the block"""
+    previous = current()
+    _local.timings = timings
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+
+@contextmanager
+def stage(name):
+    timings = current()
+    if timings is None:
+        yield
+    else:
+        with timings.stage(name):
+            yield
+
+
+def add(name, ms):
+    timings = current()
+    if timings is not None:
+        timings.add(name, ms)
+
+
+def count(name, n=1):
+    timings = current()
+    if timings is not None:
+        timings.count(name, n)
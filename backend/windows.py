@@ -0,0 +1,116 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def sliding_windows(series, look_back=60):
+    """
+    Zero-copy [n - look_back + 1, look_back, n_features] view of every window in a 2D
+    (n_samples, n_features) array. The view is read-only and shares memory with `series`.
+    """
+    series = np.asarray(series)
+    if len(series) < look_back:
+        return np.empty((0, look_back) + series.shape[1:], dtype=series.dtype)
+    # sliding_window_view puts the window axis last: [n_windows, n_features, look_back]
+    return sliding_window_view(series, look_back, axis=0).transpose(0, 2, 1)
+
+
+def create_sequences(series, look_back=60):
+    """
+    Given a 2D array (n_samples, n_features), return X of shape (n_samples-look_back, look_back, n_features)
+    and y of shape (n_samples-look_back,) where y is the close price (first column) at t+look_back.
+    X is a strided view, so nothing is copied until a batch is actually used.
+    """
+    series = np.asarray(series)
+    X = sliding_windows(series[:-1], look_back)
+    y = series[look_back:, 0]
+    return X, y
+
+
+def window_index(lengths, look_back=60):
+    """
+    (series_id, window_start) pairs for every training window across several series,
+    where each window is followed by one target row.
+    """
+    ids, starts = [], []
+    for i, n in enumerate(lengths):
+        count = max(0, n - look_back)
+        ids.append(np.full(count, i, dtype=np.int32))
+        starts.append(np.arange(count, dtype=np.int64))
+    if not ids:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.column_stack([np.concatenate(ids), np.concatenate(starts)])
+
+
+def chronological_split(index, fraction):
+    """
+    Split a window index into (head, tail) where, for every series, the first `fraction`
+    of its windows go to head and the rest to tail. Keeps time order within each series.
+    """
+    heads, tails = [], []
+    for sid in np.unique(index[:, 0]):
+        rows = index[index[:, 0] == sid]
+        cut = int(fraction * len(rows))
+        heads.append(rows[:cut])
+        tails.append(rows[cut:])
+    if not heads:
+        return index[:0], index[:0]
+    return np.concatenate(heads), np.concatenate(tails)
+
+
+def tail_split(index, count):
+    """
+    Split a window index into (head, tail) where tail holds the last `count` windows of
+    every series (a rolling validation window) and head everything before them.
+    """
+    heads, tails = [], []
+    for sid in np.unique(index[:, 0]):
+        rows = index[index[:, 0] == sid]
+        cut = max(0, len(rows) - count)
+        heads.append(rows[:cut])
+        tails.append(rows[cut:])
+    if not heads:
+        return index[:0], index[:0]
+    return np.concatenate(heads), np.concatenate(tails)
+
+
+def iter_window_batches(series_list, index, look_back=60, batch_size=256, transform=None):
+    """
+    Yield (X, y) batches for the given window index, materializing only one
+    [batch_size, look_back, n_features] array at a time. `transform(X, y)`, when given,
+    maps every batch (e.g. featurize.normalize_batch) before it is yielded.
+    """
+    views = [sliding_windows(s, look_back) for s in series_list]
+    for lo in range(0, len(index), batch_size):
+        chunk = index[lo:lo + batch_size]
+        X = np.empty((len(chunk), look_back, series_list[0].shape[1]), dtype=np.float32)
+        y = np.empty(len(chunk), dtype=np.float32)
+        for sid in np.unique(chunk[:, 0]):
+            rows = np.nonzero(chunk[:, 0] == sid)[0]
+            starts = chunk[rows, 1]
+            X[rows] = views[sid][starts]
+            y[rows] = series_list[sid][starts + look_back, 0]
+        yield transform(X, y) if transform is not None else (X, y)
+
+
+def window_dataset(series_list, index, look_back=60, batch_size=256, shuffle=False, seed=None, transform=None):
+    """
+    tf.data pipeline over the windows in `index` that builds batches lazily from the
+    strided views and prefetches them while the model trains on the previous one.
+    """
+    import tensorflow as tf
+
+    n_features = series_list[0].shape[1]
+    rng = np.random.default_rng(seed)
+
+    def generate():
+        order = rng.permutation(len(index)) if shuffle else np.arange(len(index))
+        yield from iter_window_batches(series_list, index[order], look_back, batch_size, transform)
+
+    dataset = tf.data.Dataset.from_generator(
+        generate,
+        output_signature=(
+            tf.TensorSpec(shape=(None, look_back, n_features), dtype=tf.float32),
+            tf.TensorSpec(shape=(None,), dtype=tf.float32),
+        ),
+    )
+    return dataset.prefetch(tf.data.AUTOTUNE)
@@ -1,30 +1,26 @@
 import os
 import sys
+import json
+import argparse
 import numpy as np
 import pandas as pd
-import pandas_ta as ta
 from sklearn.metrics import mean_squared_error, mean_absolute_error
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dropout, Dense
-from sklearn.preprocessing import MinMaxScaler
-import yfinance as yf
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from datetime import datetime, timedelta
 
-
-
-def create_sequences(series: np.ndarray, look_back: int = 60):
-    """
-    Given a 2D array (n_samples, n_features), create X of shape (n_samples-look_back, look_back, n_features)
-    and y of shape (n_samples-look_back,) where y is the close price at t+look_back.
-    """
-    X, y = [], []
-    for i in range(look_back, len(series)):
-        X.append(series[i - look_back:i, :])
-        y.append(series[i, 0])  # y is the close price (first column)
-    X = np.array(X)
-    y = np.array(y)
-    return X, y
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from windows import window_index, chronological_split, tail_split, window_dataset, iter_window_batches
+from featurize import load_ticker_series, normalize_batch, MIN_TRAINING_ROWS, TRAIN_DATA_SOURCE
+from feature_store import FeatureStore, FEATURE_STORE_DIR, DEFAULT_DIR as FEATURE_STORE_DEFAULT_DIR
+import model_registry
+import quantize
+from ensemble import BASELINES, fit_ensemble, load_ensemble, price_metrics
+from lstm_numpy import export_weights, weights_path
+from indicators import RSI_LENGTH, MACD_FAST, MACD_SLOW, MACD_SIGNAL
 
 
 def build_lstm_model(input_timesteps: int = 60, input_features: int = 1) -> Sequential:
@@ -39,110 +35,160 @@ def build_lstm_model(input_timesteps: int = 60, input_features: int = 1) -> Sequ
     return model
 
 
-def train_and_convert_model():
+def load_universe(tickers, years=5, workers=None, source_spec=TRAIN_DATA_SOURCE):
+    """Fetch and featurize every ticker in parallel; returns {ticker: ([n] dates, [n, 3] features)}"""
+    universe = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for ticker, dates, features, error in pool.map(load_ticker_series, tickers, [years] * len(tickers),
+                                                         [source_spec] * len(tickers)):
+            if error:
+                print(f"Skipping {ticker}: {error}")
+                continue
+            print(f"Loaded {ticker}: {len(features)} rows")
+            universe[ticker] = dates, features.astype(np.float32)
+    return universe
 
-    # 1) Real historical data: fetch 5 years of daily data for AAPL using yfinance
-    ticker = "AAPL"
-    end = datetime.utcnow().date()
-    start = end - timedelta(days=365 * 5 + 30)  # ~5 years (+buffer)
-    print(f"Fetching historical data for {ticker} from {start} to {end}...")
-    # Prefer the Ticker.history API (used in predict.py) for consistent results
-    try:
-        ticker_obj = yf.Ticker(ticker)
-        df = ticker_obj.history(period="5y", interval="1d", actions=False)
-    except Exception:
-        df = yf.download(ticker, start=start.isoformat(), end=end.isoformat(), interval="1d", progress=False)
-
-    if df is None or df.empty:
-        raise RuntimeError(f"Failed to download historical data for {ticker}. Dataframe empty.")
-    # Ensure index is sorted oldest -> newest
-    df = df.sort_index()
-    if 'Close' not in df.columns:
-        raise RuntimeError(f"Downloaded data for {ticker} does not contain a 'Close' column. Columns: {df.columns.tolist()}")
-    # Quick diagnostics
-    print(f"Downloaded {len(df)} rows. Close NaNs: {int(df['Close'].isna().sum())}")
-
-    # 2) Add technical indicators (RSI, MACD)
-    df['RSI'] = ta.rsi(df['Close'], length=14)
-    macd = ta.macd(df['Close'], fast=12, slow=26, signal=9)
-    # pandas_ta.macd may return None in some edge cases; provide a robust fallback
-    if macd is None or 'MACD_12_26_9' not in getattr(macd, 'columns', []):
-        # Fallback: compute MACD line manually (ema12 - ema26)
-        ema_fast = df['Close'].ewm(span=12, adjust=False).mean()
-        ema_slow = df['Close'].ewm(span=26, adjust=False).mean()
-        macd_line = ema_fast - ema_slow
-        signal = macd_line.ewm(span=9, adjust=False).mean()
-        # Use MACD line minus signal (histogram) as a robust indicator, but keep numerical range similar
-        df['MACD'] = macd_line - signal
+
+def load_store_universe(tickers, store, years=5):
+    """{ticker: (dates, [n, 3] features)} as zero-copy views of the feature store's last `years` of rows"""
+    universe = {}
+    start = np.datetime64(datetime.utcnow().date() - timedelta(days=365 * years), 'ns')
+    for ticker in tickers:
+        stored = store.series(ticker)
+        if stored is None:
+            print(f"Skipping {ticker}: not in the feature store (run backend/feature_store.py)")
+            continue
+        dates, features = stored
+        first = np.searchsorted(dates, start)
+        dates, features = dates[first:], features[first:]
+        if len(features) < MIN_TRAINING_ROWS:
+            print(f"Skipping {ticker}: only {len(features)} stored rows")
+            continue
+        print(f"Loaded {ticker}: {len(features)} rows")
+        universe[ticker] = dates, features
+    return universe
+
+
+def load_training_data(tickers, years=5, workers=None, data_source=TRAIN_DATA_SOURCE, feature_store=None):
+    """(tickers, [series], [dates]) for the tickers that produced usable rows, in the same order"""
+    tickers = [t.strip().upper() for t in tickers if t.strip()]
+    if feature_store:
+        print(f"Reading {years}y of features for {len(tickers)} tickers from the feature store {feature_store}...")
+        universe = load_store_universe(tickers, FeatureStore(feature_store), years)
     else:
-        df['MACD'] = macd['MACD_12_26_9']
+        print(f"Fetching {years}y of history for {len(tickers)} tickers from '{data_source}'...")
+        universe = load_universe(tickers, years, workers, data_source)
+    if not universe:
+        raise RuntimeError("No ticker produced usable training data.")
+    tickers = list(universe)
+    return tickers, [universe[t][1] for t in tickers], [universe[t][0] for t in tickers]
 
-    # Fill missing values (from indicator warmup) with forward fill then back fill
-    df = df.fillna(method='ffill').fillna(method='bfill')
 
-    # Keep only the columns we need and drop any remaining NaNs (robustness)
-    df = df[['Close', 'RSI', 'MACD']].dropna()
-    df = df.reset_index(drop=True)
+def trained_through(index, dates, tickers, look_back=60):
+    """{ticker: date of the newest target bar among the windows in `index`}"""
+    result = {}
+    for sid in np.unique(index[:, 0]):
+        last = index[index[:, 0] == sid, 1].max() + look_back
+        result[tickers[sid]] = str(np.asarray(dates[sid][last]).astype('datetime64[D]'))
+    return result
 
-    if len(df) < 200:
-        raise RuntimeError(f"Insufficient cleaned data for training (need >200 rows), got {len(df)} rows")
 
-    # 3) Data Preparation: MinMaxScaler fit on features [Close, RSI, MACD]
-    scaler = MinMaxScaler(feature_range=(0, 1))
-    features = df[['Close', 'RSI', 'MACD']].values
-    normalized = scaler.fit_transform(features)
+def predict_closes(model, series, index, look_back, close_min, close_max):
+    """(target closes, de-normalized model predictions) for the windows in `index`"""
+    normalize = partial(normalize_batch, scaler_min=close_min, scaler_max=close_max)
+    y_pred = model.predict(window_dataset(series, index, look_back, batch_size=1024, transform=normalize), verbose=0)
+    y_true = np.concatenate([y for _, y in iter_window_batches(series, index, look_back, batch_size=65536)])
+    return y_true.astype(np.float64), y_pred.flatten().astype(np.float64) * (close_max - close_min) + close_min
 
-    # Print min/max reminder for manual backend updates
-    data_min = scaler.data_min_[0]
-    data_max = scaler.data_max_[0]
-    print(f"[Scaler] data_min={data_min:.6f}, data_max={data_max:.6f}")
-    print("Reminder: update SCALER_MIN and SCALER_MAX in backend/model.js to these values.")
 
-    # 4) LSTM Data Shaping: sequences X (60, 3) and target Y (61st close)
-    look_back = 60
-    X, y = create_sequences(normalized, look_back)
-    # X shape: (samples, timesteps, features=3)
+def scaler_params(data_min, data_max, tickers, look_back=60):
+    """JSON-serializable scaler: per-feature ranges of the training data; only close_min/close_max normalize"""
+    return {
+        'features': ['Close', 'RSI', 'MACD'],
+        'data_min': [float(v) for v in data_min],
+        'data_max': [float(v) for v in data_max],
+        'close_min': float(data_min[0]),
+        'close_max': float(data_max[0]),
+        'look_back': look_back,
+        'tickers': list(tickers),
+        'trained_at': datetime.utcnow().isoformat() + 'Z',
+    }
 
-    # 5) Train/test split
-    split = int(0.8 * len(X))
-    X_train, X_test = X[:split], X[split:]
-    y_train, y_test = y[:split], y[split:]
 
-    # 6) LSTM Model Definition
-    model = build_lstm_model(input_timesteps=look_back, input_features=3)
+def save_scaler(params, target_dir):
+    """Write the scaler next to model.keras so the backend no longer hard-codes it"""
+    path = os.path.join(target_dir, 'scaler.json')
+    with open(path, 'w') as f:
+        json.dump(params, f, indent=2)
+    return path
 
-    # 7) Model Compilation and Fit: longer training run on real data
-    epochs = 50
-    batch_size = 32
-    print(f"Training model: epochs={epochs}, batch_size={batch_size}, samples={len(X_train)}")
-    model.fit(X_train, y_train, epochs=epochs, batch_size=batch_size, validation_split=0.1, verbose=1)
 
-    # 8) Evaluate on test set
-    y_pred = model.predict(X_test)
-    # De-normalize predictions and targets
-    y_pred_denorm = y_pred.flatten() * (data_max - data_min) + data_min
-    y_test_denorm = y_test * (data_max - data_min) + data_min
+def feature_spec(look_back=60):
+    """Describe the model inputs so a served version can be checked against the feature code"""
+    return {
+        'features': ['Close', 'RSI', 'MACD'],
+        'look_back': look_back,
+        'indicators': {
+            'rsi': {'length': RSI_LENGTH},
+            'macd': {'fast': MACD_FAST, 'slow': MACD_SLOW, 'signal': MACD_SIGNAL},
+        },
+        'normalization': {
+            'close': 'minmax(close_min, close_max)',
+            'rsi': 'rsi / 100',
+            'macd': 'macd / (2 * max|macd|) + 0.5 per window',
+        },
+    }
 
-    # RMSE and MAE
-    rmse = np.sqrt(mean_squared_error(y_test_denorm, y_pred_denorm))
-    mae = mean_absolute_error(y_test_denorm, y_pred_denorm)
 
-    # Directional Accuracy
-    direction_true = np.sign(np.diff(y_test_denorm))
-    direction_pred = np.sign(np.diff(y_pred_denorm))
-    da = np.mean(direction_true == direction_pred) * 100
+def save_model_artifacts(model, path, quantized=None, ensemble=None):
+    """
+    Save the Keras model, the weights.npz read by the NumPy engine, any quantized TFLite
+    variants and the blended baselines
+    """
+    model.save(path)
+    export_weights(model, weights_path(path))
+    for mode, content in (quantized or {}).items():
+        quantize.write_variant(content, path, mode)
+    if ensemble is not None:
+        ensemble.save(os.path.dirname(path))
 
-    print(f"\nModel Evaluation Metrics:")
-    print(f"RMSE: {rmse:.2f}")
-    print(f"MAE: {mae:.2f}")
-    print(f"Directional Accuracy: {da:.1f}%\n")
 
-    # 9) Prepare output dir and persist a Keras model for Python inference
+def quantization_report(model, quantized, series, test_idx, look_back, close_min, close_max, max_samples=20000):
+    """Parity of the quantized variants against the float model on (at most `max_samples`) test windows"""
+    sample = test_idx
+    if len(sample) > max_samples:
+        sample = test_idx[np.linspace(0, len(test_idx) - 1, max_samples).astype(np.int64)]
+    X, y = next(iter_window_batches(series, sample, look_back, batch_size=len(sample),
+                                    transform=partial(normalize_batch, scaler_min=close_min, scaler_max=close_max)))
+    report = quantize.parity_report(model, quantized, X, y, close_min, close_max)
+    for mode, result in report['variants'].items():
+        print(f"[Quantized {mode}] RMSE: {result['rmse']:.2f} ({result['rmseIncrease']:+.2%}), "
+              f"DA: {result['directionalAccuracy']:.1f}%, size: {result['sizeBytes'] / 1024:.0f} KiB, "
+              f"{result['msPerWindow']:.3f} ms/window vs {report['float32']['msPerWindow']:.3f}"
+              f"{'' if result['ok'] else '  <- outside parity tolerance'}")
+    return report
+
+
+def publish_model(model, name, scaler, spec, metrics, quantized=None, ensemble=None):
+    """Publish a registry version (plus the legacy files for the default model); returns its directory"""
+    version_path = model_registry.publish(
+        lambda path: save_model_artifacts(model, path, quantized, ensemble),
+        name=name,
+        scaler=scaler,
+        feature_spec=spec,
+        metrics=metrics,
+    )
+    print(f"Published model version: {version_path}")
+
+    # The default model is also written to the legacy location for older deployments
     target_dir = os.path.join(os.path.dirname(__file__), 'backend', 'model')
-    os.makedirs(target_dir, exist_ok=True)
-    keras_model_path = os.path.join(target_dir, 'model.keras')
-    model.save(keras_model_path)
-    print(f"Saved Keras model to: {keras_model_path}")
+    if name == model_registry.DEFAULT_NAME:
+        os.makedirs(target_dir, exist_ok=True)
+        keras_model_path = os.path.join(target_dir, 'model.keras')
+        save_model_artifacts(model, keras_model_path, quantized, ensemble)
+        print(f"Saved Keras model to: {keras_model_path}")
+        scaler_path = save_scaler(scaler, target_dir)
+        print(f"Saved scaler parameters to: {scaler_path}")
 
     # Optional: try to export a TFJS-compatible model if tensorflowjs is available.
     # This is non-critical for Python inference; we handle conversion errors gracefully.
@@ -151,9 +197,9 @@ def train_and_convert_model():
         model.save(temp_keras_model_path)
         try:
             import tensorflowjs as tfjs
-            # Save a TFJS model into the same target_dir
-            tfjs.converters.save_keras_model(model, target_dir)
-            print(f"Saved TFJS model to: {os.path.join(target_dir, 'model.json')}")
+            # Save a TFJS model alongside the published version
+            tfjs.converters.save_keras_model(model, version_path)
+            print(f"Saved TFJS model to: {os.path.join(version_path, 'model.json')}")
         except Exception as e:
             print(f"TFJS conversion skipped or failed: {e}")
         finally:
@@ -163,7 +209,247 @@ def train_and_convert_model():
                 pass
     except Exception as e:
         print(f"Warning: failed to create temporary h5 model or convert to TFJS: {e}")
+    return version_path
+
+
+def train_and_convert_model(tickers=("AAPL",), years=5, workers=None, epochs=50, batch_size=32,
+                            name=model_registry.DEFAULT_NAME, data_source=TRAIN_DATA_SOURCE,
+                            quantize_modes=quantize.MODES, feature_store=None,
+                            baselines=BASELINES):
+
+    # 1) Real historical data: fetch `years` of daily data per ticker in a process pool
+    # 2) ...and add technical indicators (RSI, MACD) with the same engine the backend serves with.
+    # With a feature store, both steps were done by its ingestion job and rows are memory-mapped.
+    tickers, series, dates = load_training_data(tickers, years, workers, data_source, feature_store)
+
+    # 3) Data Preparation: the close range across the universe is the scaler; windows are
+    # normalized batch by batch with the same function the predictor uses (RSI / 100, MACD per window)
+    data_min = np.min([features.min(axis=0) for features in series], axis=0)
+    data_max = np.max([features.max(axis=0) for features in series], axis=0)
+    close_min, close_max = float(data_min[0]), float(data_max[0])
+    print(f"[Scaler] close_min={close_min:.6f}, close_max={close_max:.6f}")
+    normalize = partial(normalize_batch, scaler_min=close_min, scaler_max=close_max)
+
+    # 4) LSTM Data Shaping: windows X (60, 3) and target Y (61st close)
+    # Windows are strided views built batch by batch, never one big (samples, 60, 3) tensor
+    look_back = 60
+    scaler = scaler_params(data_min, data_max, tickers, look_back)
+    index = window_index([len(s) for s in series], look_back)
+
+    # 5) Train/test split per ticker (chronological; the last 10% of training windows validate)
+    train_idx, test_idx = chronological_split(index, 0.8)
+    train_idx, val_idx = chronological_split(train_idx, 0.9)
+
+    # 6) LSTM Model Definition
+    model = build_lstm_model(input_timesteps=look_back, input_features=3)
+
+    # 7) Model Compilation and Fit: longer training run on real data
+    print(f"Training model: epochs={epochs}, batch_size={batch_size}, samples={len(train_idx)}")
+    train_ds = window_dataset(series, train_idx, look_back, batch_size, shuffle=True, transform=normalize)
+    val_ds = window_dataset(series, val_idx, look_back, batch_size, transform=normalize)
+    model.fit(train_ds, validation_data=val_ds, epochs=epochs, verbose=1)
+
+    # 8) Evaluate on test set
+    y_pred = model.predict(window_dataset(series, test_idx, look_back, batch_size=1024, transform=normalize))
+    # Targets are the raw next closes; predictions are de-normalized
+    y_test_denorm = np.concatenate([series[sid][test_idx[test_idx[:, 0] == sid, 1] + look_back, 0]
+                                    for sid in np.unique(test_idx[:, 0])]).astype(np.float64)
+    y_pred_denorm = y_pred.flatten() * (close_max - close_min) + close_min
+
+    # RMSE and MAE
+    rmse = np.sqrt(mean_squared_error(y_test_denorm, y_pred_denorm))
+    mae = mean_absolute_error(y_test_denorm, y_pred_denorm)
+
+    # Directional Accuracy (consecutive days of the same ticker only)
+    same_ticker = test_idx[1:, 0] == test_idx[:-1, 0]
+    direction_true = np.sign(np.diff(y_test_denorm))[same_ticker]
+    direction_pred = np.sign(np.diff(y_pred_denorm))[same_ticker]
+    da = np.mean(direction_true == direction_pred) * 100
+
+    print(f"\nModel Evaluation Metrics:")
+    print(f"RMSE: {rmse:.2f}")
+    print(f"MAE: {mae:.2f}")
+    print(f"Directional Accuracy: {da:.1f}%\n")
+
+    # 9) Quantized TFLite variants (served with --engine tflite-*), checked against the float model
+    metrics = {'rmse': float(rmse), 'mae': float(mae), 'directional_accuracy': float(da),
+               'test_samples': int(len(test_idx)), 'epochs': epochs, 'tickers': tickers,
+               # Where incremental runs (--incremental) pick up
+               'trained_through': trained_through(train_idx, dates, tickers, look_back)}
+    quantized = quantize.export_variants(model, quantize_modes)
+    if quantized:
+        metrics['quantization'] = quantization_report(model, quantized, series, test_idx, look_back,
+                                                      close_min, close_max)
+
+    # 10) Fast baselines (naive, EMA drift, ridge, gradient-boosted trees) fitted in parallel
+    # processes, blended with the LSTM by weights learned on the validation windows
+    ensemble = None
+    if baselines:
+        lstm_val = model.predict(window_dataset(series, val_idx, look_back, batch_size=1024, transform=normalize))
+        lstm_val = lstm_val.flatten().astype(np.float64) * (close_max - close_min) + close_min
+        ensemble, metrics['ensemble'] = fit_ensemble(
+            series, train_idx, val_idx, test_idx, lstm_val, y_pred_denorm.astype(np.float64), look_back,
+            baselines, workers)
+        for model_name, result in metrics['ensemble']['models'].items():
+            weight = metrics['ensemble']['weights'].get(model_name)
+            print(f"[{model_name}] RMSE: {result['rmse']:.2f}, MAE: {result['mae']:.2f}, "
+                  f"DA: {result['directional_accuracy']:.1f}%" + (f", weight: {weight:.3f}" if weight is not None else ''))
+
+    # 11) Publish a new registry version; running predictors hot-reload it
+    publish_model(model, name, scaler, feature_spec(look_back), metrics, quantized, ensemble)
+
+
+# Incremental runs: the newest HOLDOUT_WINDOWS windows of every ticker decide whether the
+# fine-tuned model replaces the current one and the VALIDATION_WINDOWS before them drive early
+# stopping, so the publish check is never scored on the windows that picked the weights;
+# REPLAY_RATIO older windows (at least MIN_REPLAY_WINDOWS) are mixed in per new window so the
+# model does not forget the history
+VALIDATION_WINDOWS = 20
+HOLDOUT_WINDOWS = 20
+REPLAY_RATIO = 4
+MIN_REPLAY_WINDOWS = 2048
+FINE_TUNE_EPOCHS = 5
+FINE_TUNE_LEARNING_RATE = 1e-4
+
+
+def fine_tune_model(tickers=("AAPL",), years=5, workers=None, epochs=FINE_TUNE_EPOCHS, batch_size=32,
+                    name=model_registry.DEFAULT_NAME, data_source=TRAIN_DATA_SOURCE,
+                    quantize_modes=quantize.MODES, feature_store=None,
+                    validation_windows=VALIDATION_WINDOWS, holdout_windows=HOLDOUT_WINDOWS,
+                    replay_ratio=REPLAY_RATIO):
+    """
+    Warm-start the current registry version of `name` on the windows that arrived since it
+    was trained plus a replay sample of older ones, and publish the result only when it beats
+    the current model on the rolling holdout windows. Returns the published version
+    directory, or None when the current model is kept.
+    """
+    base_version = model_registry.current_version(name)
+    if base_version is None:
+        raise RuntimeError(f"No published model for '{name}' to fine-tune; run a full training first.")
+    base_dir = model_registry.version_dir(name, base_version)
+    with open(os.path.join(base_dir, 'scaler.json')) as f:
+        base_scaler = json.load(f)
+    with open(os.path.join(base_dir, 'feature_spec.json')) as f:
+        base_spec = json.load(f)
+    with open(os.path.join(base_dir, 'metrics.json')) as f:
+        base_metrics = json.load(f)
+    look_back = base_scaler.get('look_back', 60)
+    if base_spec and base_spec != feature_spec(look_back):
+        raise RuntimeError(f"{name}/{base_version} was trained on other features; run a full training.")
+
+    tickers, series, dates = load_training_data(tickers, years, workers, data_source, feature_store)
+    # Inputs are normalized exactly as the model was trained; newer closes outside the range extrapolate
+    close_min, close_max = float(base_scaler['close_min']), float(base_scaler['close_max'])
+    normalize = partial(normalize_batch, scaler_min=close_min, scaler_max=close_max)
+
+    # New windows: targets after the newest bar the current model trained on. Versions without
+    # `trained_through` count from their training date; tickers they never saw are all new.
+    index = window_index([len(s) for s in series], look_back)
+    history_idx, holdout_idx = tail_split(index, holdout_windows)
+    history_idx, val_idx = tail_split(history_idx, validation_windows)
+    cutoffs = base_metrics.get('trained_through', {})
+    trained_at = base_scaler.get('trained_at', '')[:10] or None
+    fresh = np.ones(len(history_idx), dtype=bool)
+    for sid, ticker in enumerate(tickers):
+        cutoff = cutoffs.get(ticker) or (trained_at if ticker in base_scaler.get('tickers', []) else None)
+        if cutoff is None:
+            continue
+        rows = history_idx[:, 0] == sid
+        target_dates = np.asarray(dates[sid])[history_idx[rows, 1] + look_back].astype('datetime64[D]')
+        fresh[rows] = target_dates > np.datetime64(cutoff, 'D')
+    new_idx, old_idx = history_idx[fresh], history_idx[~fresh]
+    if len(new_idx) == 0:
+        print(f"No new bars since {name}/{base_version} was trained; nothing to fine-tune.")
+        return None
+    replay = min(len(old_idx), max(MIN_REPLAY_WINDOWS, replay_ratio * len(new_idx)))
+    rng = np.random.default_rng()
+    train_idx = np.concatenate([new_idx, old_idx[rng.choice(len(old_idx), replay, replace=False)]])
+
+    model = tf.keras.models.load_model(os.path.join(base_dir, model_registry.MODEL_FILE))
+    current = price_metrics(*predict_closes(model, series, holdout_idx, look_back, close_min, close_max), holdout_idx)
+
+    print(f"Fine-tuning {name}/{base_version}: new={len(new_idx)}, replay={replay}, validation={len(val_idx)}, "
+          f"holdout={len(holdout_idx)}")
+    # A fresh optimizer with a small learning rate nudges the weights instead of retraining them
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=FINE_TUNE_LEARNING_RATE), loss='mse')
+    early_stopping = tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=2, restore_best_weights=True)
+    train_ds = window_dataset(series, train_idx, look_back, batch_size, shuffle=True, transform=normalize)
+    val_ds = window_dataset(series, val_idx, look_back, batch_size, transform=normalize)
+    history = model.fit(train_ds, validation_data=val_ds, epochs=epochs, callbacks=[early_stopping], verbose=1)
+    candidate = price_metrics(*predict_closes(model, series, holdout_idx, look_back, close_min, close_max),
+                              holdout_idx)
+
+    print(f"[Current]   RMSE: {current['rmse']:.2f}, MAE: {current['mae']:.2f}, DA: {current['directional_accuracy']:.1f}%")
+    print(f"[Candidate] RMSE: {candidate['rmse']:.2f}, MAE: {candidate['mae']:.2f}, DA: {candidate['directional_accuracy']:.1f}%")
+    if candidate['rmse'] >= current['rmse']:
+        print(f"Keeping {name}/{base_version}: the fine-tuned model does not improve on the holdout windows.")
+        return None
+
+    metrics = dict(candidate, validation_samples=int(len(val_idx)), holdout_samples=int(len(holdout_idx)),
+                   epochs=len(history.history['loss']),
+                   tickers=tickers, trained_through=dict(cutoffs, **trained_through(new_idx, dates, tickers, look_back)),
+                   incremental={'baseVersion': base_version, 'newWindows': int(len(new_idx)),
+                                'replayWindows': int(replay), 'current': current})
+    quantized = quantize.export_variants(model, quantize_modes)
+    if quantized:
+        metrics['quantization'] = quantization_report(model, quantized, series, holdout_idx, look_back,
+                                                      close_min, close_max)
+    # The baselines do not depend on the LSTM's weights; they are carried over until the next full run
+    ensemble = load_ensemble(base_dir)
+    scaler = dict(base_scaler, tickers=list(dict.fromkeys(base_scaler.get('tickers', []) + tickers)),
+                  trained_at=datetime.utcnow().isoformat() + 'Z')
+    return publish_model(model, name, scaler, feature_spec(look_back), metrics, quantized, ensemble)
 
 
 if __name__ == '__main__':
-    train_and_convert_model()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Train the LSTM price model over a universe of tickers.')
+    parser.add_argument('--tickers', default='AAPL', help='Comma-separated ticker symbols (default: AAPL)')
+    parser.add_argument('--tickers-file', help='File with one ticker symbol per line (overrides --tickers)')
+    parser.add_argument('--years', type=int, default=5, help='Years of daily history per ticker')
+    parser.add_argument('--workers', type=int, default=None, help='Processes used to fetch and featurize tickers')
+    parser.add_argument('--epochs', type=int, default=None,
+                        help=f'Training epochs (default: 50, or {FINE_TUNE_EPOCHS} with --incremental)')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--data-source', default=os.environ.get('TRAIN_DATA_SOURCE', TRAIN_DATA_SOURCE),
+                        help='Data source spec: "yahoo", "local:/path/to/dumps" or "synthetic[:seed]"')
+    parser.add_argument('--name', default=model_registry.DEFAULT_NAME,
+                        help='Registry name to publish under: "default" or a ticker symbol for a per-ticker model')
+    parser.add_argument('--feature-store', nargs='?', const=FEATURE_STORE_DIR or FEATURE_STORE_DEFAULT_DIR,
+                        help='Train on rows ingested by backend/feature_store.py (optionally its directory) '
+                             'instead of fetching and featurizing')
+    parser.add_argument('--quantize', default=','.join(quantize.MODES),
+                        help='Comma-separated TFLite variants to export (float16, int8); empty to skip')
+    parser.add_argument('--baselines', default=','.join(BASELINES),
+                        help='Comma-separated baselines blended with the LSTM (naive, ema, ridge, gbt); empty to skip')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Fine-tune the current published model on bars that arrived since it was trained '
+                             'and publish it only if it beats that model on the newest windows')
+    parser.add_argument('--validation-windows', type=int, default=VALIDATION_WINDOWS,
+                        help='--incremental: windows per ticker before the holdout that drive early stopping')
+    parser.add_argument('--holdout-windows', type=int, default=HOLDOUT_WINDOWS,
+                        help='--incremental: newest windows per ticker held out for the publish check')
+    parser.add_argument('--replay-ratio', type=int, default=REPLAY_RATIO,
+                        help='--incremental: older windows replayed per new window')
+    args = parser.parse_args()
+
+    if args.tickers_file:
+        with open(args.tickers_file) as f:
+            universe = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    else:
+        universe = args.tickers.split(',')
+
+    # Per-ticker models are looked up by upper-case symbol
+    name = args.name if args.name == model_registry.DEFAULT_NAME else args.name.strip().upper()
+    quantize_modes = [m.strip() for m in args.quantize.split(',') if m.strip()]
+    if args.incremental:
+        fine_tune_model(universe, years=args.years, workers=args.workers,
+                        epochs=args.epochs or FINE_TUNE_EPOCHS, batch_size=args.batch_size, name=name,
+                        data_source=args.data_source, quantize_modes=quantize_modes,
+                        feature_store=args.feature_store, validation_windows=args.validation_windows,
+                        holdout_windows=args.holdout_windows, replay_ratio=args.replay_ratio)
+    else:
+        train_and_convert_model(universe, years=args.years, workers=args.workers,
+                                epochs=args.epochs or 50, batch_size=args.batch_size, name=name,
+                                data_source=args.data_source, quantize_modes=quantize_modes,
+                                feature_store=args.feature_store,
+                                baselines=[b.strip() for b in args.baselines.split(',') if b.strip()])
\ No newline at end of file